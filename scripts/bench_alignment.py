@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Speaker Alignment Benchmark for WebAudioTranscriber
+
+Times combine_transcription_with_diarization on synthetic inputs against the
+previous implementation, which rescanned every diarization turn for every
+Whisper segment. The legacy scan is quadratic, so by default it only runs on
+the smaller sizes; pass --legacy-max to change that.
+
+Usage:
+    python3 scripts/bench_alignment.py
+    python3 scripts/bench_alignment.py --sizes 1000x5000 10000x50000
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "server"))
+
+from transcribe_audio import SpeakerTurnIndex, combine_transcription_with_diarization  # noqa: E402
+
+class Turn:
+    """Minimal stand-in for pyannote.core.Segment."""
+
+    __slots__ = ("start", "end")
+
+    def __init__(self, start: float, end: float):
+        self.start = start
+        self.end = end
+
+class SyntheticAnnotation:
+    """Minimal stand-in for pyannote.core.Annotation."""
+
+    def __init__(self, tracks: List[Tuple[Turn, str]]):
+        self.tracks = tracks
+
+    def itertracks(self, yield_label: bool = False):
+        for index, (turn, label) in enumerate(self.tracks):
+            yield (turn, index, label) if yield_label else (turn, index)
+
+def make_inputs(n_segments: int, n_turns: int, n_speakers: int = 8, seed: int = 0) -> Tuple[Dict[str, Any], SyntheticAnnotation]:
+    """Generate Whisper segments and diarization turns covering the same timeline."""
+    rng = random.Random(seed)
+    duration = n_segments * 4.0
+
+    segments = []
+    t = 0.0
+    step = duration / n_segments
+    for i in range(n_segments):
+        segments.append({"start": t, "end": t + step * rng.uniform(0.6, 1.0), "text": f" segment {i}"})
+        t += step
+
+    tracks = []
+    t = 0.0
+    step = duration / n_turns
+    for _ in range(n_turns):
+        length = step * rng.uniform(0.8, 1.5)  # some turns overlap their neighbours
+        tracks.append((Turn(t, t + length), f"SPEAKER_{rng.randrange(n_speakers):02d}"))
+        t += step
+
+    whisper_result = {"text": " ".join(s["text"] for s in segments), "segments": segments}
+    return whisper_result, SyntheticAnnotation(tracks)
+
+def legacy_assign(whisper_result: Dict[str, Any], diarization) -> List[Optional[str]]:
+    """The previous first-overlapping-turn scan, kept as a reference."""
+    speakers = []
+    for segment in whisper_result["segments"]:
+        found = None
+        for turn, _, speaker in diarization.itertracks(yield_label=True):
+            if turn.end < segment["start"] or turn.start > segment["end"]:
+                continue
+            found = speaker
+            break
+        speakers.append(found)
+    return speakers
+
+def time_call(fn, *args) -> Tuple[float, Any]:
+    """Run fn with its stderr output discarded and return (seconds, result)."""
+    with contextlib.redirect_stderr(io.StringIO()):
+        start = time.perf_counter()
+        result = fn(*args)
+    return time.perf_counter() - start, result
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark speaker-to-segment alignment")
+    parser.add_argument("--sizes", nargs="+", default=["500x2500", "1000x5000", "2000x10000", "10000x50000"],
+                        help="SEGMENTSxTURNS pairs to benchmark")
+    parser.add_argument("--legacy-max", type=int, default=5 * 10**7,
+                        help="Skip the legacy scan when segments*turns exceeds this (default: 5e7)")
+    args = parser.parse_args()
+
+    print(f"{'segments':>9} {'turns':>7} {'index build':>12} {'combine':>10} {'legacy scan':>12}")
+    for size in args.sizes:
+        n_segments, n_turns = (int(part) for part in size.lower().split("x"))
+        whisper_result, annotation = make_inputs(n_segments, n_turns)
+
+        build_time, index = time_call(SpeakerTurnIndex.from_diarization, annotation)
+        combine_time, _ = time_call(combine_transcription_with_diarization, whisper_result, index)
+
+        if n_segments * n_turns <= args.legacy_max:
+            legacy_time, _ = time_call(legacy_assign, whisper_result, annotation)
+            legacy = f"{legacy_time:11.3f}s"
+        else:
+            legacy = f"{'skipped':>12}"
+
+        print(f"{n_segments:>9} {n_turns:>7} {build_time:11.3f}s {combine_time:9.3f}s {legacy}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
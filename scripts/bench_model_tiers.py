@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Model Tier Benchmark for WebAudioTranscriber
+
+Transcribes one recording with each Whisper model tier, in fp32 and with
+int8 dynamic quantization, and reports the accuracy/speed trade-off: word
+error rate against a reference transcript, real-time factor, model load
+time and peak RSS. Each tier runs in a fresh process so load time and
+memory are measured from a cold start (quantized models are prepared and
+cached on the first run, so run the script twice to see the cached load).
+
+Usage:
+    python3 scripts/bench_model_tiers.py path/to/audio.wav --reference path/to/transcript.txt
+    python3 scripts/bench_model_tiers.py path/to/audio.wav --reference transcript.txt --models tiny base small
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+from typing import Any, Dict, List
+
+SERVER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "server")
+
+# Runs in the child process: load one tier, transcribe, print a JSON report
+TIER_RUNNER = """
+import json, sys, time
+sys.path.insert(0, sys.argv[1])
+import transcribe_audio
+
+audio_path, model = sys.argv[2], sys.argv[3]
+audio, _ = transcribe_audio.load_audio(audio_path)
+started = time.time()
+transcribe_audio.get_whisper_model(model)
+load_seconds = time.time() - started
+started = time.time()
+result = transcribe_audio.transcribe_with_whisper(audio, model)
+transcribe_seconds = time.time() - started
+print(json.dumps({
+    "text": result["text"],
+    "audio_seconds": len(audio) / transcribe_audio.SAMPLE_RATE,
+    "load_seconds": load_seconds,
+    "transcribe_seconds": transcribe_seconds,
+    "peak_rss_mb": transcribe_audio.peak_rss_mb()
+}))
+"""
+
+def normalize_words(text: str) -> List[str]:
+    """Lowercase and strip punctuation so WER only counts word differences."""
+    return re.sub(r"[^a-z0-9' ]+", " ", text.lower()).split()
+
+def word_error_rate(reference: str, hypothesis: str) -> float:
+    """Word-level Levenshtein distance divided by the reference length."""
+    ref, hyp = normalize_words(reference), normalize_words(hypothesis)
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i] + [0] * len(hyp)
+        for j, hyp_word in enumerate(hyp, 1):
+            current[j] = min(
+                previous[j] + 1,  # deletion
+                current[j - 1] + 1,  # insertion
+                previous[j - 1] + (ref_word != hyp_word)  # substitution
+            )
+        previous = current
+    return previous[-1] / max(1, len(ref))
+
+def run_tier(audio_path: str, model: str) -> Dict[str, Any]:
+    """Transcribe audio_path with one model key in a fresh interpreter."""
+    completed = subprocess.run(
+        [sys.executable, "-c", TIER_RUNNER, SERVER_DIR, audio_path, model],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True
+    )
+    if completed.returncode != 0:
+        last_line = completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "no output"
+        raise RuntimeError(f"{model} failed: {last_line}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compare Whisper model tiers for accuracy and speed")
+    parser.add_argument("audio", help="Audio file to transcribe")
+    parser.add_argument("--reference", required=True, help="Text file with the reference transcript")
+    parser.add_argument("--models", nargs="+", default=["tiny", "base", "small"],
+                        help="Whisper models to compare (default: tiny base small)")
+    parser.add_argument("--no-int8", action="store_true", help="Skip the int8 quantized variants")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    args = parser.parse_args()
+
+    with open(args.reference, "r", encoding="utf-8") as f:
+        reference = f.read()
+
+    keys = []
+    for model in args.models:
+        keys.append(model)
+        if not args.no_int8:
+            keys.append(f"{model}:int8")
+
+    results = {}
+    for key in keys:
+        print(f"Running {key}...", file=sys.stderr)
+        try:
+            report = run_tier(args.audio, key)
+        except RuntimeError as e:
+            print(f"  {e}", file=sys.stderr)
+            continue
+        report["wer"] = word_error_rate(reference, report.pop("text"))
+        report["rtf"] = report["transcribe_seconds"] / report["audio_seconds"]
+        results[key] = report
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return 0
+
+    print(f"\n{'model':<14} {'WER':>7} {'RTF':>8} {'transcribe':>11} {'load':>8} {'peak MB':>8}")
+    for key, r in results.items():
+        print(
+            f"{key:<14} {r['wer']:7.2%} {r['rtf']:8.3f} {r['transcribe_seconds']:10.2f}s "
+            f"{r['load_seconds']:7.2f}s {r['peak_rss_mb']:8.0f}"
+        )
+    for model in args.models:
+        fp32, int8 = results.get(model), results.get(f"{model}:int8")
+        if fp32 and int8:
+            print(
+                f"{model}: int8 is {fp32['transcribe_seconds'] / int8['transcribe_seconds']:.2f}x faster, "
+                f"WER {int8['wer'] - fp32['wer']:+.2%}"
+            )
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+Pipeline Benchmark Suite for WebAudioTranscriber
+
+Generates synthetic recordings of controlled length, speaker count and
+silence ratio, then times each stage of the transcription pipeline on its
+own: decode (load_audio), voice activity detection, Whisper, diarization,
+combine_transcription_with_diarization and JSON serialization.
+
+By default the Whisper model and diarization pipeline are replaced by stub
+backends, so the suite runs offline on a CPU-only machine and measures the
+pipeline's own overhead. With --real, the cached models are used instead.
+
+For every stage it records latency percentiles, the real-time factor
+(processing seconds per audio second) and peak traced memory, and compares
+the median real-time factor with a baseline recorded on the same host
+(~/.cache/webaudio-transcriber/bench_baseline.json, or
+TRANSCRIBE_BENCH_BASELINE). Timings from another machine say nothing
+about this one, so the baseline is not checked in: record it with
+--update-baseline before making a change. The exit status is 1 when a
+stage is slower than its baseline by more than the tolerance.
+
+Usage:
+    python3 scripts/bench_pipeline.py
+    python3 scripts/bench_pipeline.py --scenario meeting_4spk --repeats 10
+    python3 scripts/bench_pipeline.py --update-baseline
+    python3 scripts/bench_pipeline.py --real
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+import wave
+from typing import Any, Callable, Dict, List, Tuple
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(SCRIPTS_DIR, "..", "server"))
+
+import numpy as np  # noqa: E402
+# transcribe_audio imports torch on first use; load it here so the one-off
+# import cost (see --profile-imports) doesn't land in the first timed stage
+import torch  # noqa: E402,F401
+
+import transcribe_audio  # noqa: E402
+from bench_alignment import SyntheticAnnotation, Turn  # noqa: E402
+
+BASELINE_PATH = os.environ.get(
+    "TRANSCRIBE_BENCH_BASELINE",
+    os.path.join(os.path.expanduser("~"), ".cache", "webaudio-transcriber", "bench_baseline.json")
+)
+
+# name: (duration seconds, speakers, silence ratio)
+SCENARIOS = {
+    "short_2spk": (60.0, 2, 0.2),
+    "voicemail_1spk": (120.0, 1, 0.6),
+    "meeting_4spk": (600.0, 4, 0.3),
+}
+
+STAGES = ["decode", "vad", "whisper", "diarization", "combine", "serialize"]
+
+MIN_REGRESSION_SECONDS = 0.001
+
+def synthesize_audio(
+    duration: float,
+    speakers: int,
+    silence_ratio: float,
+    sample_rate: int = transcribe_audio.SAMPLE_RATE,
+    seed: int = 0
+) -> Tuple[np.ndarray, List[Tuple[float, float, str]]]:
+    """
+    Build a speech-like signal: alternating speaker turns of harmonic tones
+    with syllable-rate amplitude modulation, separated by near-silent gaps
+    that make up silence_ratio of the recording. Returns the audio and the
+    ground-truth turns as (start, end, speaker).
+    """
+    rng = np.random.default_rng(seed)
+    total = int(duration * sample_rate)
+    audio = (rng.standard_normal(total) * 1e-3).astype(np.float32)
+    turns = []
+
+    t = 0.0
+    speaker = 0
+    while t < duration:
+        gap = rng.exponential(2.0 * silence_ratio / max(1e-6, 1 - silence_ratio)) if silence_ratio > 0 else 0.0
+        t += gap
+        length = rng.uniform(1.5, 6.0)
+        end = min(duration, t + length)
+        if end - t < 0.2:
+            break
+        start_index, end_index = int(t * sample_rate), int(end * sample_rate)
+        n = end_index - start_index
+        time_axis = np.arange(n, dtype=np.float32) / sample_rate
+        pitch = 110.0 + 45.0 * speaker
+        voice = sum(np.sin(2 * np.pi * pitch * h * time_axis) / h for h in range(1, 5))
+        envelope = 0.5 * (1 + np.sin(2 * np.pi * 4.0 * time_axis))
+        audio[start_index:end_index] += (0.2 * voice * envelope).astype(np.float32)
+        turns.append((t, end, f"SPEAKER_{speaker:02d}"))
+        speaker = (speaker + 1 + int(rng.integers(0, max(1, speakers - 1)))) % speakers if speakers > 1 else 0
+        t = end
+    return audio, turns
+
+def write_wav(path: str, audio: np.ndarray, sample_rate: int = transcribe_audio.SAMPLE_RATE) -> None:
+    """Write float audio as 16-bit PCM WAV."""
+    pcm = (np.clip(audio, -1, 1) * 32767).astype("<i2")
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(pcm.tobytes())
+
+class StubWhisperModel:
+    """Stands in for a Whisper model: one segment per ~4 s of audio."""
+
+    WORDS = "the quick brown fox jumps over the lazy dog while we discuss the quarterly numbers".split()
+
+    def transcribe(self, audio: np.ndarray, **kwargs) -> Dict[str, Any]:
+        duration = len(audio) / transcribe_audio.SAMPLE_RATE
+        segments = []
+        start = 0.0
+        while start < duration:
+            end = min(duration, start + 4.0)
+            words = [self.WORDS[(len(segments) + i) % len(self.WORDS)] for i in range(10)]
+            segments.append({"id": len(segments), "start": start, "end": end, "text": " " + " ".join(words)})
+            start = end
+        return {"text": "".join(s["text"] for s in segments), "segments": segments, "language": "en"}
+
+class StubDiarizationPipeline:
+    """Stands in for the pyannote pipeline by returning the ground-truth turns."""
+
+    def __init__(self, turns: List[Tuple[float, float, str]]):
+        self.turns = turns
+
+    def __call__(self, audio_input) -> SyntheticAnnotation:
+        return SyntheticAnnotation([(Turn(start, end), speaker) for start, end, speaker in self.turns])
+
+def install_backends(real: bool, turns: List[Tuple[float, float, str]]) -> None:
+    """Point transcribe_audio's model caches at stub backends, or leave them for the real models."""
+    model = transcribe_audio.resolve_model()
+    if real:
+        # Only use what is already downloaded
+        name = model.partition(":")[0]
+        checkpoint = os.path.join(os.path.expanduser("~"), ".cache", "whisper", f"{name}.pt")
+        if not os.path.exists(checkpoint):
+            raise SystemExit(f"--real needs the Whisper '{name}' model cached at {checkpoint}")
+        os.environ.setdefault("HF_HUB_OFFLINE", "1")
+        return
+    # Keep stub timings out of the deadline planner's measurements for this host
+    transcribe_audio._rtf_store = transcribe_audio.RtfStore(os.path.join(tempfile.gettempdir(), "bench-pipeline-rtf.json"))
+    transcribe_audio._whisper_models[model] = StubWhisperModel()
+    transcribe_audio._diarization_pipeline = StubDiarizationPipeline(turns)
+    transcribe_audio.DIARIZATION_AVAILABLE = True
+    transcribe_audio.HF_TOKEN = transcribe_audio.HF_TOKEN or "stub"
+
+def measure(fn: Callable[[], Any], repeats: int) -> Tuple[List[float], float, Any]:
+    """Run fn repeats times; return latencies, peak traced memory in MB and the last result."""
+    latencies = []
+    peak = 0
+    result = None
+    for _ in range(repeats):
+        tracemalloc.start()
+        with contextlib.redirect_stderr(io.StringIO()):
+            start = time.perf_counter()
+            result = fn()
+            latencies.append(time.perf_counter() - start)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return latencies, peak / (1 << 20), result
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+def run_scenario(name: str, duration: float, speakers: int, silence: float, repeats: int, real: bool) -> Dict[str, Dict[str, float]]:
+    """Time every pipeline stage on one synthetic recording."""
+    audio, turns = synthesize_audio(duration, speakers, silence)
+    install_backends(real, turns)
+
+    stats: Dict[str, Dict[str, float]] = {}
+
+    def record(stage: str, fn: Callable[[], Any]) -> Any:
+        latencies, peak_mb, result = measure(fn, repeats)
+        stats[stage] = {
+            "p50": percentile(latencies, 50),
+            "p90": percentile(latencies, 90),
+            "p99": percentile(latencies, 99),
+            "rtf": percentile(latencies, 50) / duration,
+            "peak_mb": peak_mb,
+        }
+        return result
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        wav_path = os.path.join(temp_dir, f"{name}.wav")
+        write_wav(wav_path, audio)
+        decoded, _ = record("decode", lambda: transcribe_audio.load_audio(wav_path))
+
+    record("vad", lambda: transcribe_audio.detect_speech(decoded))
+    whisper_result = record("whisper", lambda: transcribe_audio.transcribe_with_whisper(decoded))
+    diarization = record("diarization", lambda: transcribe_audio.perform_diarization(decoded))
+    combined = record("combine", lambda: transcribe_audio.combine_transcription_with_diarization(whisper_result, diarization))
+    record("serialize", lambda: json.dumps(combined))
+    return stats
+
+def compare(results: Dict[str, Dict[str, Dict[str, float]]], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Return a message for each stage whose median RTF regressed past the tolerance."""
+    regressions = []
+    for scenario, stages in results.items():
+        for stage, stats in stages.items():
+            reference = baseline.get(scenario, {}).get(stage)
+            if not reference:
+                continue
+            limit = reference["rtf"] * (1 + tolerance)
+            # Ignore sub-millisecond differences, which are timer noise for the fast stages
+            if stats["rtf"] > limit and stats["p50"] - reference.get("p50", 0.0) > MIN_REGRESSION_SECONDS:
+                regressions.append(
+                    f"{scenario}/{stage}: RTF {stats['rtf']:.6f} > baseline {reference['rtf']:.6f} (+{tolerance:.0%})"
+                )
+    return regressions
+
+def host_fingerprint() -> Dict[str, Any]:
+    """What a baseline's timings depend on besides the code."""
+    return {
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpus": transcribe_audio.available_cpus(),
+        "python": platform.python_version(),
+    }
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the transcription pipeline stage by stage")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="Scenario(s) to run (default: all)")
+    parser.add_argument("--duration", type=float, help="Run a custom scenario of this many seconds")
+    parser.add_argument("--speakers", type=int, default=2, help="Speakers in the custom scenario")
+    parser.add_argument("--silence", type=float, default=0.3, help="Silence ratio of the custom scenario")
+    parser.add_argument("--repeats", type=int, default=5, help="Runs per stage (default: 5)")
+    parser.add_argument("--real", action="store_true", help="Use the cached Whisper and pyannote models instead of stubs")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help=f"Baseline file for this host (default: {BASELINE_PATH})")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="Allowed RTF slowdown before failing (default: 0.5 = 50%%)")
+    parser.add_argument("--update-baseline", action="store_true", help="Write these results as the new baseline")
+    args = parser.parse_args()
+
+    if args.duration:
+        scenarios = {"custom": (args.duration, args.speakers, args.silence)}
+    else:
+        scenarios = {name: SCENARIOS[name] for name in (args.scenario or SCENARIOS)}
+
+    results = {}
+    for name, (duration, speakers, silence) in scenarios.items():
+        print(f"=== {name}: {duration:.0f}s, {speakers} speaker(s), {silence:.0%} silence ===")
+        results[name] = run_scenario(name, duration, speakers, silence, args.repeats, args.real)
+        print(f"{'stage':<12} {'p50':>9} {'p90':>9} {'p99':>9} {'RTF':>10} {'peak MB':>8}")
+        for stage in STAGES:
+            s = results[name][stage]
+            print(f"{stage:<12} {s['p50']:8.4f}s {s['p90']:8.4f}s {s['p99']:8.4f}s {s['rtf']:10.6f} {s['peak_mb']:8.1f}")
+        print()
+    print(f"Peak RSS: {transcribe_audio.peak_rss_mb():.1f} MB")
+
+    backend = "real" if args.real else "stub"
+    baseline_file: Dict[str, Any] = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline_file = json.load(f)
+
+    host = host_fingerprint()
+    if args.update_baseline:
+        if baseline_file.get("host") != host:
+            baseline_file = {"host": host}
+        baseline_file.setdefault(backend, {}).update(
+            {name: {stage: {key: float(f"{s[key]:.4g}") for key in ("rtf", "p50", "peak_mb")} for stage, s in stages.items()}
+             for name, stages in results.items()}
+        )
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline_file, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baseline updated: {args.baseline}")
+        return 0
+
+    if not baseline_file.get(backend):
+        print(f"\nNo {backend} baseline at {args.baseline}; record one on this host with --update-baseline")
+        return 0
+    if baseline_file.get("host") != host:
+        print(f"\nThe baseline at {args.baseline} was recorded on another host ({baseline_file.get('host')}); "
+              "record one on this host with --update-baseline")
+        return 0
+
+    regressions = compare(results, baseline_file.get(backend, {}), args.tolerance)
+    if regressions:
+        print("\nRegressions:")
+        for message in regressions:
+            print(f"  {message}")
+        return 1
+    print(f"\nNo regressions against the {backend} baseline")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Result Format Benchmark for WebAudioTranscriber
+
+Builds transcripts of increasing length with combine_transcription_with_diarization
+and compares the result layouts transcribe_audio.py can write: the default
+JSON with one object per segment, columnar compact JSON and columnar
+MessagePack (when the msgpack package is installed). For each it reports
+the encoded size, Python encode and decode time and, when node is on the
+PATH, the time Node takes to JSON.parse the payload and expand it back into
+segments. It also times the per-segment debug dump that used to be printed
+to stderr on every run and reports how much log text it produced.
+
+Usage:
+    python3 scripts/bench_result_format.py
+    python3 scripts/bench_result_format.py --segments 1000 10000 50000 --repeats 10
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "server"))
+
+import transcribe_audio  # noqa: E402
+from bench_alignment import make_inputs  # noqa: E402
+
+WORDS = "so the quarterly numbers look good but we still need to talk about hiring and the roadmap for next year".split()
+
+# Reads each file given on the command line, parses it `repeats` times and
+# prints the median milliseconds for parsing alone and for parsing plus
+# expanding a columnar result into segment objects, as the service does
+NODE_PARSER = """
+const fs = require('fs');
+const [repeats, ...files] = process.argv.slice(1);
+const expand = (result) => {
+  if (result.format !== 'columnar') return result;
+  const { start, end, speaker, text } = result.segments;
+  const segments = new Array(start.length);
+  for (let i = 0; i < start.length; i++) {
+    segments[i] = { speaker: result.speakers[speaker[i]], text: text[i], start: start[i], end: end[i] };
+  }
+  return { ...result, segments };
+};
+const median = (values) => values.sort((a, b) => a - b)[Math.floor(values.length / 2)];
+const report = {};
+let sink = 0;
+for (const file of files) {
+  const payload = fs.readFileSync(file, 'utf8');
+  const parse = [], total = [];
+  for (let i = 0; i < Number(repeats); i++) {
+    let start = process.hrtime.bigint();
+    const message = JSON.parse(payload);
+    parse.push(Number(process.hrtime.bigint() - start) / 1e6);
+    start = process.hrtime.bigint();
+    sink += expand(message.result).segments.length;
+    total.push(parse[parse.length - 1] + Number(process.hrtime.bigint() - start) / 1e6);
+  }
+  report[file] = { parse_ms: median(parse), total_ms: median(total) };
+}
+if (sink < 0) console.error(sink);
+console.log(JSON.stringify(report));
+"""
+
+def build_result(n_segments: int, seed: int = 0) -> Dict[str, Any]:
+    """A merged result with realistic segment text, as combine_transcription_with_diarization returns it."""
+    rng = random.Random(seed)
+    whisper_result, annotation = make_inputs(n_segments, max(1, n_segments // 3), n_speakers=4, seed=seed)
+    for segment in whisper_result["segments"]:
+        segment["start"] = round(segment["start"], 2)
+        segment["end"] = round(segment["end"], 2)
+        segment["text"] = " " + " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 18))) + "."
+    whisper_result["text"] = "".join(segment["text"] for segment in whisper_result["segments"])
+    with contextlib.redirect_stderr(io.StringIO()):
+        return transcribe_audio.combine_transcription_with_diarization(whisper_result, annotation)
+
+def median_seconds(fn: Callable[[], Any], repeats: int) -> float:
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+def decode(payload: bytes, result_format: str) -> Dict[str, Any]:
+    """Parse an encoded result message back into the segment-per-object layout."""
+    if result_format == "msgpack":
+        import msgpack
+        message = msgpack.unpackb(payload, raw=False)
+    else:
+        message = json.loads(payload)
+    return {**message, "result": transcribe_audio.from_columnar(message["result"])}
+
+def time_debug_dump(n_segments: int, repeats: int) -> Dict[str, float]:
+    """combine_transcription_with_diarization with and without the per-segment stderr dump."""
+    whisper_result, annotation = make_inputs(n_segments, max(1, n_segments // 3), n_speakers=4)
+    index = transcribe_audio.SpeakerTurnIndex.from_diarization(annotation)
+    report = {}
+    for enabled in (False, True):
+        transcribe_audio.DEBUG_OUTPUT = enabled
+        log = io.StringIO()
+        with contextlib.redirect_stderr(log):
+            seconds = median_seconds(
+                lambda: transcribe_audio.combine_transcription_with_diarization(whisper_result, index), repeats
+            )
+        report["debug" if enabled else "quiet"] = seconds
+        if enabled:
+            report["log_bytes"] = len(log.getvalue().encode("utf-8")) / repeats
+    transcribe_audio.DEBUG_OUTPUT = False
+    return report
+
+def node_parse_times(paths: List[str], repeats: int) -> Optional[Dict[str, Dict[str, float]]]:
+    if shutil.which("node") is None:
+        return None
+    completed = subprocess.run(
+        ["node", "-e", NODE_PARSER, str(repeats), *paths],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True
+    )
+    if completed.returncode != 0:
+        print(f"node failed: {completed.stderr.strip()}", file=sys.stderr)
+        return None
+    return json.loads(completed.stdout)
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compare transcription result formats")
+    parser.add_argument("--segments", nargs="+", type=int, default=[500, 5000, 20000],
+                        help="Transcript lengths in segments (a segment is ~4s of speech)")
+    parser.add_argument("--repeats", type=int, default=5, help="Runs per measurement")
+    args = parser.parse_args()
+
+    formats = [
+        result_format for result_format in transcribe_audio.RESULT_FORMATS
+        if result_format != "msgpack" or transcribe_audio._package_available("msgpack")
+    ]
+    if "msgpack" not in formats:
+        print("msgpack is not installed; skipping the MessagePack format\n")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for n_segments in args.segments:
+            result = build_result(n_segments)
+            message = {"type": "result", "result": result}
+            rows = {}
+            paths = {}
+            for result_format in formats:
+                payload = transcribe_audio.encode_result(message, result_format)
+                assert decode(payload, result_format)["result"] == result, f"{result_format} does not round-trip"
+                rows[result_format] = {
+                    "bytes": len(payload),
+                    "encode": median_seconds(lambda: transcribe_audio.encode_result(message, result_format), args.repeats),
+                    "decode": median_seconds(lambda: decode(payload, result_format), args.repeats)
+                }
+                if result_format != "msgpack":
+                    paths[result_format] = os.path.join(workdir, f"{n_segments}.{result_format}.json")
+                    with open(paths[result_format], "wb") as f:
+                        f.write(payload)
+            node = node_parse_times(list(paths.values()), args.repeats)
+
+            baseline = rows["json"]["bytes"]
+            print(f"=== {n_segments} segments ===")
+            print(f"{'format':<9} {'size':>10} {'vs json':>8} {'py encode':>10} {'py decode':>10} {'node parse':>11} {'+ expand':>9}")
+            for result_format, row in rows.items():
+                timings = node.get(paths[result_format]) if node and result_format in paths else None
+                node_columns = (
+                    f"{timings['parse_ms']:9.2f}ms {timings['total_ms']:7.2f}ms" if timings else f"{'-':>11} {'-':>9}"
+                )
+                print(
+                    f"{result_format:<9} {row['bytes'] / 1024:8.1f}KB {row['bytes'] / baseline:7.0%} "
+                    f"{row['encode'] * 1000:8.2f}ms {row['decode'] * 1000:8.2f}ms {node_columns}"
+                )
+
+            dump = time_debug_dump(n_segments, args.repeats)
+            print(
+                f"merge: {dump['quiet'] * 1000:.2f}ms quiet, {dump['debug'] * 1000:.2f}ms with the debug dump "
+                f"({dump['log_bytes'] / 1024:.1f}KB of stderr for Node to log)\n"
+            )
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
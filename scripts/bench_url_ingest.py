@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+URL Ingestion Benchmark for WebAudioTranscriber
+
+Serves an audio file from a local HTTP server and compares the streaming
+downloader in transcribe_audio.py (bytes piped into ffmpeg as they arrive)
+with the old approach of downloading to a temp file with curl and decoding
+afterwards. The server can throttle its responses and use chunked transfer
+encoding, and the script also checks that stalled and oversized downloads
+are rejected.
+
+Usage:
+    python3 scripts/bench_url_ingest.py path/to/audio.mp3 --rate 2000000
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "server"))
+
+import transcribe_audio  # noqa: E402
+
+BLOCK_SIZE = 16 * 1024
+
+def make_handler(payload: bytes, rate: int) -> type:
+    """Build a request handler serving payload at roughly rate bytes/second."""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def send_throttled(self, chunked: bool, stall_after: int = -1):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            if chunked:
+                self.send_header("Transfer-Encoding", "chunked")
+            else:
+                self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+
+            for offset in range(0, len(payload), BLOCK_SIZE):
+                if 0 <= stall_after <= offset:
+                    time.sleep(3600)
+                block = payload[offset:offset + BLOCK_SIZE]
+                if chunked:
+                    self.wfile.write(f"{len(block):x}\r\n".encode() + block + b"\r\n")
+                else:
+                    self.wfile.write(block)
+                if rate:
+                    time.sleep(len(block) / rate)
+            if chunked:
+                self.wfile.write(b"0\r\n\r\n")
+
+        def do_GET(self):
+            if self.path == "/redirect":
+                self.send_response(302)
+                self.send_header("Location", "/chunked")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+            elif self.path == "/chunked":
+                self.send_throttled(chunked=True)
+            elif self.path == "/stall":
+                self.send_throttled(chunked=True, stall_after=4 * BLOCK_SIZE)
+            else:
+                self.send_throttled(chunked=False)
+
+    return Handler
+
+def timed(fn: Callable, *args) -> Tuple[float, object]:
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+def curl_then_decode(url: str):
+    """The previous ingestion path: download fully with curl, then decode."""
+    with tempfile.NamedTemporaryFile(suffix=".audio", delete=False) as temp_file:
+        temp_path = temp_file.name
+    try:
+        subprocess.run(["curl", "-sSL", "-o", temp_path, url], check=True)
+        return transcribe_audio.decode_audio(temp_path)
+    finally:
+        os.unlink(temp_path)
+
+def expect_failure(label: str, fn: Callable, *args) -> None:
+    start = time.perf_counter()
+    try:
+        fn(*args)
+    except Exception as e:
+        print(f"{label}: rejected after {time.perf_counter() - start:.2f}s ({e})")
+    else:
+        print(f"{label}: NOT rejected")
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark streaming URL ingestion")
+    parser.add_argument("audio", help="Audio file to serve")
+    parser.add_argument("--rate", type=int, default=0, help="Throttle responses to this many bytes/second (0 = unthrottled)")
+    args = parser.parse_args()
+
+    with open(args.audio, "rb") as f:
+        payload = f.read()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(payload, args.rate))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    print(f"Serving {len(payload)} bytes at {args.rate or 'unthrottled'} bytes/s from {base}\n")
+
+    try:
+        curl_time, _ = timed(curl_then_decode, f"{base}/file")
+        stream_time, (audio, _) = timed(transcribe_audio.stream_url_audio, f"{base}/file")
+        chunked_time, _ = timed(transcribe_audio.stream_url_audio, f"{base}/redirect")
+        reuse_time, _ = timed(transcribe_audio.stream_url_audio, f"{base}/file")
+
+        print(f"\nDecoded audio length:          {len(audio) / transcribe_audio.SAMPLE_RATE:.1f}s")
+        print(f"curl to temp file, then decode: {curl_time:.2f}s")
+        print(f"Streaming download + decode:    {stream_time:.2f}s")
+        print(f"Streaming, redirect + chunked:  {chunked_time:.2f}s")
+        print(f"Streaming, pooled connection:   {reuse_time:.2f}s\n")
+
+        transcribe_audio.DOWNLOAD_IDLE_TIMEOUT = 2
+        expect_failure("Stalled download", transcribe_audio.stream_url_audio, f"{base}/stall")
+
+        transcribe_audio.MAX_DOWNLOAD_BYTES = len(payload) // 2
+        expect_failure("Oversized download", transcribe_audio.stream_url_audio, f"{base}/file")
+    finally:
+        server.shutdown()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
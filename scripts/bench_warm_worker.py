@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Warm Worker Benchmark for WebAudioTranscriber
+
+Compares per-job latency of the cold path (one transcribe_audio.py process
+per job, as the Node service does by default) with the warm path (a single
+`transcribe_audio.py --serve` process handling every job).
+
+Usage:
+    python3 scripts/bench_warm_worker.py path/to/audio.wav --jobs 5
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+SCRIPT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "server", "transcribe_audio.py")
+# Repeats of the same file would otherwise be result cache hits
+BENCH_ENV = {**os.environ, "TRANSCRIBE_CACHE": "0"}
+
+def run_cold(audio_path: str, jobs: int) -> List[float]:
+    """Spawn a fresh transcription process for every job."""
+    latencies = []
+    for _ in range(jobs):
+        start = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, SCRIPT_PATH, audio_path],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            env=BENCH_ENV
+        )
+        latencies.append(time.perf_counter() - start)
+        if result.returncode != 0:
+            raise RuntimeError(f"Cold run failed with exit code {result.returncode}")
+    return latencies
+
+def run_warm(audio_path: str, jobs: int) -> Dict[str, object]:
+    """Send every job to one long-lived worker."""
+    spawn_start = time.perf_counter()
+    worker = subprocess.Popen(
+        [sys.executable, SCRIPT_PATH, "--serve"],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+        bufsize=1,
+        env=BENCH_ENV
+    )
+    try:
+        ready = json.loads(worker.stdout.readline())
+        if ready.get("type") != "ready":
+            raise RuntimeError(f"Unexpected first message from worker: {ready}")
+        startup = time.perf_counter() - spawn_start
+
+        latencies = []
+        for job_id in range(jobs):
+            start = time.perf_counter()
+            worker.stdin.write(json.dumps({"id": job_id, "op": "transcribe", "path": audio_path}) + "\n")
+            worker.stdin.flush()
+            reply = json.loads(worker.stdout.readline())
+            latencies.append(time.perf_counter() - start)
+            if reply.get("type") != "result":
+                raise RuntimeError(f"Warm job failed: {reply}")
+
+        worker.stdin.write(json.dumps({"op": "shutdown"}) + "\n")
+        worker.stdin.flush()
+        worker.wait(timeout=30)
+        return {"startup": startup, "latencies": latencies}
+    finally:
+        if worker.poll() is None:
+            worker.kill()
+
+def summarize(latencies: List[float]) -> str:
+    """Format mean/median/min/max of a latency list."""
+    return (
+        f"mean {statistics.mean(latencies):.2f}s, "
+        f"median {statistics.median(latencies):.2f}s, "
+        f"min {min(latencies):.2f}s, max {max(latencies):.2f}s"
+    )
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compare cold-spawn and warm-worker transcription latency")
+    parser.add_argument("audio", help="Audio file to transcribe")
+    parser.add_argument("--jobs", type=int, default=5, help="Number of jobs per mode (default: 5)")
+    args = parser.parse_args()
+
+    print(f"Running {args.jobs} cold-spawn jobs...")
+    cold = run_cold(args.audio, args.jobs)
+    print(f"Running {args.jobs} warm-worker jobs...")
+    warm = run_warm(args.audio, args.jobs)
+
+    print("\n=== Per-job latency ===")
+    print(f"Cold spawn:  {summarize(cold)}")
+    print(f"Warm worker: {summarize(warm['latencies'])} (+ {warm['startup']:.2f}s one-off startup)")
+    print(f"Speedup per job: {statistics.mean(cold) / statistics.mean(warm['latencies']):.1f}x")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
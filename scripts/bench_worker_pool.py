@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Worker Pool Benchmark for WebAudioTranscriber
+
+Runs the same set of jobs under concurrent load in two ways and compares
+throughput, latency and memory:
+
+- spawn: one transcribe_audio.py process per job, as the Node service does
+  without the warm worker, with up to --concurrency running at once
+- pool: one `transcribe_audio.py --serve --workers N` process whose forked
+  workers share the loaded models, with --concurrency jobs in flight
+
+Memory is the peak combined PSS of every process involved, which counts
+pages shared copy-on-write once rather than once per process. Jobs the
+pool rejects because its queue is full are retried after a short pause.
+
+By default the real models are used. With --stub-model-mb, a stub model
+holding that many MB of weights and burning --stub-rtf CPU seconds per
+audio second stands in for Whisper, so the comparison runs offline.
+
+Usage:
+    python3 scripts/bench_worker_pool.py path/to/audio.wav --jobs 16 --concurrency 8 --workers 4
+    python3 scripts/bench_worker_pool.py path/to/audio.wav --stub-model-mb 500 --stub-rtf 0.05
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVER_DIR = os.path.join(SCRIPTS_DIR, "..", "server")
+SCRIPT_PATH = os.path.join(SERVER_DIR, "transcribe_audio.py")
+
+# Runs transcribe_audio.main() with a stub Whisper model that holds
+# model_mb of weights and burns rtf CPU seconds per audio second
+STUB_RUNNER = """
+import sys, time
+sys.path[:0] = [sys.argv[1], sys.argv[2]]
+import numpy as np
+import bench_pipeline, transcribe_audio
+
+model_mb, rtf = float(sys.argv[3]), float(sys.argv[4])
+
+class BallastModel(bench_pipeline.StubWhisperModel):
+    def __init__(self):
+        self.weights = np.ones(int(model_mb * (1 << 20)) // 4, dtype=np.float32)
+
+    def transcribe(self, audio, **kwargs):
+        busy_until = time.process_time() + rtf * len(audio) / transcribe_audio.SAMPLE_RATE
+        while time.process_time() < busy_until:
+            sum(range(1000))
+        return super().transcribe(audio, **kwargs)
+
+bench_pipeline.install_backends(False, [])
+transcribe_audio._whisper_models[transcribe_audio.resolve_model()] = BallastModel()
+sys.argv = [transcribe_audio.__file__] + sys.argv[5:]
+transcribe_audio.main()
+"""
+
+def command(args: argparse.Namespace, script_args: List[str]) -> List[str]:
+    if args.stub_model_mb:
+        return [sys.executable, "-c", STUB_RUNNER, SCRIPTS_DIR, SERVER_DIR,
+                str(args.stub_model_mb), str(args.stub_rtf), *script_args]
+    return [sys.executable, SCRIPT_PATH, *script_args]
+
+def process_tree(pid: int) -> List[int]:
+    """pid and all of its descendants."""
+    pids = [pid]
+    for current in pids:
+        try:
+            with open(f"/proc/{current}/task/{current}/children") as f:
+                pids.extend(int(child) for child in f.read().split())
+        except OSError:
+            pass
+    return pids
+
+def pss_mb(pids: List[int]) -> float:
+    """Combined proportional set size of pids in MB."""
+    total_kb = 0
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/smaps_rollup") as f:
+                for line in f:
+                    if line.startswith("Pss:"):
+                        total_kb += int(line.split()[1])
+                        break
+        except OSError:
+            pass
+    return total_kb / 1024
+
+class MemorySampler:
+    """Samples the combined PSS of a changing set of root processes and keeps the peak."""
+
+    def __init__(self, roots: Any):
+        self.roots = roots
+        self.peak = 0.0
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        while not self.stopped.wait(0.1):
+            pids = [pid for root in list(self.roots()) for pid in process_tree(root)]
+            self.peak = max(self.peak, pss_mb(pids))
+
+    def __enter__(self) -> "MemorySampler":
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stopped.set()
+        self.thread.join()
+
+def run_spawn(args: argparse.Namespace) -> Dict[str, Any]:
+    """One process per job, at most --concurrency at a time."""
+    running: Dict[int, subprocess.Popen] = {}
+    lock = threading.Lock()
+
+    def job(_: int) -> float:
+        start = time.perf_counter()
+        process = subprocess.Popen(
+            command(args, [args.audio]),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            env={**os.environ, "TRANSCRIBE_CACHE": "0"}
+        )
+        with lock:
+            running[process.pid] = process
+        stdout, _ = process.communicate()
+        with lock:
+            del running[process.pid]
+        if process.returncode != 0 or "error" in json.loads(stdout):
+            raise RuntimeError(f"Spawned job failed: {stdout[-200:]!r}")
+        return time.perf_counter() - start
+
+    def roots() -> List[int]:
+        with lock:
+            return list(running)
+
+    with MemorySampler(roots) as sampler:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            latencies = list(executor.map(job, range(args.jobs)))
+        wall = time.perf_counter() - start
+    return {"latencies": latencies, "wall": wall, "peak_pss_mb": sampler.peak, "startup": 0.0, "rejected": 0}
+
+def run_pool(args: argparse.Namespace) -> Dict[str, Any]:
+    """One --serve --workers process, with --concurrency jobs in flight."""
+    spawn_start = time.perf_counter()
+    server = subprocess.Popen(
+        command(args, ["--serve", "--workers", str(args.workers)]),
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+        bufsize=1,
+        env={**os.environ, "TRANSCRIBE_CACHE": "0"}
+    )
+    try:
+        ready = json.loads(server.stdout.readline())
+        if ready.get("type") != "ready":
+            raise RuntimeError(f"Unexpected first message from the pool: {ready}")
+        startup = time.perf_counter() - spawn_start
+
+        write_lock = threading.Lock()
+        waiting: Dict[str, Dict[str, Any]] = {}
+        health: Dict[str, Any] = {}
+
+        def send(message: Dict[str, Any]) -> None:
+            with write_lock:
+                server.stdin.write(json.dumps(message) + "\n")
+                server.stdin.flush()
+
+        def read_replies() -> None:
+            for line in server.stdout:
+                message = json.loads(line)
+                if message.get("type") == "health":
+                    health.update(message)
+                    waiting.pop(str(message.get("id")))["done"].set()
+                elif message.get("type") in ("result", "error") and str(message.get("id")) in waiting:
+                    entry = waiting[str(message["id"])]
+                    entry["reply"] = message
+                    entry["done"].set()
+
+        threading.Thread(target=read_replies, daemon=True).start()
+        rejected = 0
+
+        def job(index: int) -> float:
+            nonlocal rejected
+            start = time.perf_counter()
+            while True:
+                entry = {"done": threading.Event(), "reply": None}
+                job_id = f"{index}-{time.perf_counter_ns()}"
+                waiting[job_id] = entry
+                send({"id": job_id, "op": "transcribe", "path": args.audio})
+                entry["done"].wait()
+                del waiting[job_id]
+                reply = entry["reply"]
+                if reply.get("busy"):
+                    rejected += 1
+                    time.sleep(0.2)
+                    continue
+                if reply["type"] != "result" or reply["result"].get("error"):
+                    raise RuntimeError(f"Pool job failed: {reply}")
+                return time.perf_counter() - start
+
+        with MemorySampler(lambda: [server.pid]) as sampler:
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+                latencies = list(executor.map(job, range(args.jobs)))
+            wall = time.perf_counter() - start
+
+        waiting["health"] = {"done": threading.Event()}
+        send({"id": "health", "op": "health"})
+        waiting.get("health", {"done": threading.Event()})["done"].wait(10)
+        send({"op": "shutdown"})
+        server.wait(timeout=60)
+        return {
+            "latencies": latencies,
+            "wall": wall,
+            "peak_pss_mb": sampler.peak,
+            "startup": startup,
+            "rejected": rejected,
+            "workers": ready.get("workers"),
+            "pool": health.get("pool")
+        }
+    finally:
+        if server.poll() is None:
+            server.kill()
+
+def summarize(label: str, run: Dict[str, Any], jobs: int) -> None:
+    latencies = sorted(run["latencies"])
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    print(
+        f"{label:<6} {jobs / run['wall']:8.2f} jobs/s  latency median {statistics.median(latencies):6.2f}s "
+        f"p95 {p95:6.2f}s  peak PSS {run['peak_pss_mb']:7.0f} MB"
+        + (f"  (+{run['startup']:.1f}s startup, {run['rejected']} rejected)" if label == "pool" else "")
+    )
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compare spawn-per-request and the forked worker pool under load")
+    parser.add_argument("audio", help="Audio file to transcribe")
+    parser.add_argument("--jobs", type=int, default=16, help="Jobs per mode (default: 16)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Jobs submitted at once (default: 8)")
+    parser.add_argument("--workers", type=int, default=0, help="Pool workers (default: 0, sized by the pool)")
+    parser.add_argument("--stub-model-mb", type=float, default=0.0,
+                        help="Use a stub model holding this many MB of weights instead of the real models")
+    parser.add_argument("--stub-rtf", type=float, default=0.05,
+                        help="With --stub-model-mb, CPU seconds the stub spends per audio second")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    args = parser.parse_args()
+
+    print(f"Running {args.jobs} jobs, {args.concurrency} at a time, spawning a process per job...", file=sys.stderr)
+    spawn = run_spawn(args)
+    print(f"Running {args.jobs} jobs, {args.concurrency} at a time, on the worker pool...", file=sys.stderr)
+    pool = run_pool(args)
+
+    if args.json:
+        print(json.dumps({"spawn": spawn, "pool": pool}, indent=2))
+        return 0
+
+    print(f"\n=== {args.jobs} jobs, concurrency {args.concurrency}, {pool['workers']} pool workers ===")
+    summarize("spawn", spawn, args.jobs)
+    summarize("pool", pool, args.jobs)
+    if pool.get("pool"):
+        stats = pool["pool"]
+        print(
+            f"pool queue: max depth {stats['max_queue_depth']}/{stats['queue_size']}, "
+            f"wait p50 {stats['wait_p50']}s p95 {stats['wait_p95']}s max {stats['wait_max']}s"
+        )
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
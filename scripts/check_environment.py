@@ -3,13 +3,36 @@
 Environment Check Script for WebAudioTranscriber
 
 This script checks if all required dependencies are installed and properly configured.
+
+With --probe it also runs short microbenchmarks (ffmpeg decode throughput,
+torch matrix multiply throughput at different thread counts and worker
+splits, and the cost of each locally cached Whisper tier on a synthetic
+clip) and writes a tuning profile that transcribe_audio.py reads at
+startup. Re-run the probe after moving to different hardware or changing
+the container's CPU allowance.
+
+Usage:
+    python3 scripts/check_environment.py
+    python3 scripts/check_environment.py --probe
+    python3 scripts/check_environment.py --probe --models tiny base small medium
 """
 
+import argparse
+import datetime
+import importlib.util
+import multiprocessing
+import os
 import sys
 import subprocess
 import json
 import platform
-from typing import Dict, List, Tuple
+import shutil
+import statistics
+import tempfile
+import time
+from typing import Any, Dict, List, Tuple
+
+SERVER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "server")
 
 # Required Python packages with their minimum versions
 REQUIRED_PYTHON_PACKAGES = {
@@ -25,6 +48,23 @@
 # Required system tools
 REQUIRED_TOOLS = ["ffmpeg", "python3"]
 
+# Settings that transcribe_audio.py takes from the tuning profile or these
+# overrides; the probe measures without them
+PROBE_CLEARED_ENV = ["TRANSCRIBE_MAX_INTRA_OP_THREADS", "TRANSCRIBE_INTEROP_THREADS", "TRANSCRIBE_CHUNK_WORKERS"]
+
+# Tuning probe settings
+# Whisper base encoder MLP: audio frames x model width x hidden width
+PROBE_MATMUL_SHAPE = (1500, 512, 2048)
+PROBE_MATMUL_SECONDS = 1.0
+PROBE_CLIP_SECONDS = 30.0
+# Intra-op threads: the fewest that reach this share of the best throughput
+THREAD_SCALING_SHARE = 0.9
+# Every chunk worker holds its own model, so more workers must be this much faster
+WORKER_GAIN_REQUIRED = 1.1
+MAX_PROBE_WORKERS = 4
+# The recommended tier is the largest one that transcribes at this real-time factor or better
+RECOMMENDED_MAX_RTF = 0.25
+
 def check_python_version() -> Tuple[bool, str]:
     """Check if Python version is 3.8 or higher."""
     if sys.version_info >= (3, 8):
@@ -151,7 +191,223 @@ def print_results(results: Dict[str, List[Tuple[bool, str]]]) -> bool:
     
     return all_ok
 
-if __name__ == "__main__":
+def matmul_gflops(threads: int, seconds: float = PROBE_MATMUL_SECONDS) -> float:
+    """Float32 matrix multiply throughput of this process with the given intra-op threads."""
+    import torch
+
+    torch.set_num_threads(threads)
+    m, k, n = PROBE_MATMUL_SHAPE
+    a, b = torch.randn(m, k), torch.randn(k, n)
+    torch.mm(a, b)  # warm up the thread pool
+    runs = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        torch.mm(a, b)
+        runs += 1
+    return 2 * m * k * n * runs / (time.perf_counter() - start) / 1e9
+
+def _matmul_worker(threads: int, barrier: Any, results: Any) -> None:
+    barrier.wait()
+    results.put(matmul_gflops(threads))
+
+def parallel_gflops(workers: int, threads: int) -> float:
+    """Combined matmul throughput of worker processes running side by side."""
+    # Spawned rather than forked, so the parent's OpenMP pool doesn't leak into the workers
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(workers)
+    results = context.Queue()
+    processes = [context.Process(target=_matmul_worker, args=(threads, barrier, results)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    total = sum(results.get() for _ in processes)
+    for process in processes:
+        process.join()
+    return total
+
+def thread_candidates(cpus: int) -> List[int]:
+    """Powers of two up to cpus, plus cpus itself."""
+    candidates = []
+    threads = 1
+    while threads < cpus:
+        candidates.append(threads)
+        threads *= 2
+    return candidates + [cpus]
+
+def write_probe_clip(directory: str, seconds: float) -> Tuple[str, Any, str]:
+    """Write a synthetic speech-like clip, as MP3 when ffmpeg can encode it; returns (path, samples, format)."""
+    from bench_pipeline import synthesize_audio, write_wav
+
+    audio, _ = synthesize_audio(seconds, 2, 0.2)
+    wav_path = os.path.join(directory, "probe.wav")
+    write_wav(wav_path, audio)
+    mp3_path = os.path.join(directory, "probe.mp3")
+    encoded = subprocess.run(
+        ["ffmpeg", "-y", "-loglevel", "error", "-i", wav_path, "-codec:a", "libmp3lame", mp3_path],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    if encoded.returncode == 0:
+        return mp3_path, audio, "mp3"
+    return wav_path, audio, "wav"
+
+def decode_realtime_factor(path: str, audio_seconds: float, repeats: int = 3) -> float:
+    """Audio seconds ffmpeg decodes per wall-clock second (median of repeats)."""
+    import transcribe_audio
+
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        transcribe_audio.decode_audio(path)
+        timings.append(time.perf_counter() - start)
+    return audio_seconds / statistics.median(timings)
+
+def whisper_model_cached(name: str) -> bool:
+    """Whether Whisper's weights for name are already downloaded (the probe never downloads)."""
+    import whisper
+
+    url = getattr(whisper, "_MODELS", {}).get(name)
+    if url is None:
+        return False
+    cache_root = os.getenv("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache"))
+    return os.path.exists(os.path.join(cache_root, "whisper", os.path.basename(url)))
+
+def probe_whisper_tier(name: str, audio: Any, threads: int) -> Dict[str, float]:
+    """Cold load time and real-time factor of one Whisper model on the probe clip."""
+    import torch
+    import transcribe_audio
+
+    start = time.perf_counter()
+    transcribe_audio.get_whisper_model(name)
+    load_seconds = time.perf_counter() - start
+    torch.set_num_threads(threads)
+    start = time.perf_counter()
+    transcribe_audio.transcribe_with_whisper(audio, name)
+    rtf = (time.perf_counter() - start) * transcribe_audio.SAMPLE_RATE / len(audio)
+    transcribe_audio._whisper_models.clear()
+    return {"rtf": round(rtf, 4), "load_seconds": round(load_seconds, 2)}
+
+def run_probe(models: List[str], clip_seconds: float) -> Dict[str, Any]:
+    """Run the microbenchmarks and return the tuning profile."""
+    # transcribe_audio applies the current profile's thread settings on
+    # import; the measurements that replace them must not start from them
+    if "transcribe_audio" in sys.modules:
+        raise RuntimeError("run_probe() must run before transcribe_audio is imported")
+    os.environ["TRANSCRIBE_TUNING"] = "0"
+    for name in PROBE_CLEARED_ENV:
+        os.environ.pop(name, None)
+    sys.path.insert(0, SERVER_DIR)
+    import torch
+    import transcribe_audio
+
+    cpus = transcribe_audio.available_cpus()
+    quota = transcribe_audio.cgroup_cpu_limit()
+    print(f"Probing with {cpus} usable CPUs" + (f" (cgroup quota {quota:g})" if quota else ""))
+
+    with tempfile.TemporaryDirectory() as workdir:
+        # Synthetic clips would skew the moving averages real jobs maintain
+        transcribe_audio._rtf_store = transcribe_audio.RtfStore(os.path.join(workdir, "rtf.json"))
+
+        clip_path, audio, clip_format = write_probe_clip(workdir, clip_seconds)
+        decode_rtf = decode_realtime_factor(clip_path, clip_seconds)
+        print(f"ffmpeg decode ({clip_format}): {decode_rtf:.0f}x real time")
+
+        scaling = {}
+        for threads in thread_candidates(cpus):
+            scaling[threads] = matmul_gflops(threads)
+            print(f"matmul, {threads} threads: {scaling[threads]:.1f} GFLOPS")
+        best = max(scaling.values())
+        intra_op = min(threads for threads, gflops in scaling.items() if gflops >= THREAD_SCALING_SHARE * best)
+
+        splits = {1: scaling[min(cpus, intra_op)]}
+        for workers in (2, 4):
+            if workers > min(cpus, MAX_PROBE_WORKERS):
+                break
+            splits[workers] = parallel_gflops(workers, min(intra_op, cpus // workers))
+            print(f"matmul, {workers} workers x {min(intra_op, cpus // workers)} threads: {splits[workers]:.1f} GFLOPS")
+        chosen_workers = 1
+        for workers, gflops in sorted(splits.items()):
+            if gflops >= WORKER_GAIN_REQUIRED * splits[chosen_workers]:
+                chosen_workers = workers
+
+        tiers = {}
+        for name in models:
+            if not whisper_model_cached(name):
+                print(f"Whisper {name}: not downloaded, skipped")
+                continue
+            tiers[name] = probe_whisper_tier(name, audio, intra_op)
+            print(f"Whisper {name}: RTF {tiers[name]['rtf']:.3f}, load {tiers[name]['load_seconds']:.1f}s")
+
+    profile = {
+        "version": transcribe_audio.TUNING_PROFILE_VERSION,
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "host": {
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "cgroup_cpu_limit": quota,
+            "available_cpus": cpus,
+            "torch": torch.__version__
+        },
+        "decode": {"format": clip_format, "realtime_factor": round(decode_rtf, 1)},
+        "matmul_gflops": {str(threads): round(gflops, 2) for threads, gflops in scaling.items()},
+        "worker_gflops": {str(workers): round(gflops, 2) for workers, gflops in splits.items()},
+        # Whisper and pyannote run eager modules that never use the
+        # inter-op pool, so one thread keeps idle threads out of every worker
+        "threads": {"intra_op": intra_op, "inter_op": 1},
+        "workers": chosen_workers,
+        "tiers": tiers
+    }
+    fitting = [name for name in transcribe_audio.MODEL_LADDER if name in tiers and tiers[name]["rtf"] <= RECOMMENDED_MAX_RTF]
+    if fitting:
+        profile["recommended_model"] = fitting[0]
+    elif tiers:
+        profile["recommended_model"] = min(tiers, key=lambda name: tiers[name]["rtf"])
+    return profile
+
+def write_profile(profile: Dict[str, Any], path: str) -> None:
+    """Write the tuning profile atomically."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(profile, f, indent=2)
+        f.write("\n")
+    os.replace(temp_path, path)
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Check the WebAudioTranscriber environment")
+    parser.add_argument("--probe", action="store_true",
+                        help="Also run microbenchmarks and write a tuning profile for transcribe_audio.py")
+    parser.add_argument("--profile", help="Where to write the tuning profile "
+                        "(default: TRANSCRIBE_TUNING_PROFILE or ~/.cache/webaudio-transcriber/tuning.json)")
+    parser.add_argument("--models", nargs="+", default=["tiny", "base", "small"],
+                        help="Whisper tiers to time, if downloaded (default: tiny base small)")
+    parser.add_argument("--clip-seconds", type=float, default=PROBE_CLIP_SECONDS,
+                        help="Length of the synthetic probe clip")
+    args = parser.parse_args()
+
     results = check_environment()
     status_ok = print_results(results)
-    sys.exit(0 if status_ok else 1)
+    if not args.probe:
+        return 0 if status_ok else 1
+
+    # The probe itself needs torch, numpy and ffmpeg, but not CUDA or diarization
+    missing = [package for package in ("torch", "numpy") if importlib.util.find_spec(package) is None]
+    if shutil.which("ffmpeg") is None:
+        missing.append("ffmpeg")
+    if missing:
+        print(f"\nSkipping the tuning probe, which needs: {', '.join(missing)}")
+        return 1
+
+    print("\n=== Tuning Probe ===\n")
+    profile = run_probe(args.models, args.clip_seconds)
+    import transcribe_audio
+    path = args.profile or transcribe_audio.TUNING_PROFILE_PATH
+    write_profile(profile, path)
+    print(
+        f"\nWrote {path}: {profile['threads']['intra_op']} intra-op threads, {profile['workers']} chunk workers"
+        + (f", recommended model {profile['recommended_model']}" if "recommended_model" in profile else "")
+    )
+    return 0 if status_ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
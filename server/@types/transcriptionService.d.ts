@@ -8,10 +8,67 @@ export interface TranscriptionResult {
   }>;
   speakers?: string[];
   error?: string;
+  metrics?: TranscriptionMetrics;
+  vad?: VadSummary;
+  tier?: TierPlan;
 }
 
-export function transcribeFromUrl(url: string): Promise<TranscriptionResult>;
-export function transcribeFromFile(file: { path: string }): Promise<TranscriptionResult>;
+export interface VadSummary {
+  applied: boolean;
+  regions: number;
+  original_seconds: number;
+  speech_seconds: number;
+  trimmed_seconds: number;
+  trimmed_ratio: number;
+  estimated_speedup: number | null;
+}
+
+export interface TierPlan {
+  requested_model: string;
+  model: string;
+  final_model: string;
+  diarization: boolean;
+  budget_seconds: number;
+  estimated_seconds: number;
+  elapsed_seconds: number;
+  reason: string;
+  downgrades: Array<{ from: string; to: string; at_chunk: number; reason: string }>;
+}
+
+export interface StageSpan {
+  stage: string;
+  offset: number;
+  duration: number;
+  audio_seconds: number | null;
+  rtf: number | null;
+  peak_rss_mb: number;
+  torch_threads: number | null;
+}
+
+export interface TranscriptionMetrics {
+  total_seconds: number;
+  audio_seconds: number | null;
+  rtf: number | null;
+  peak_rss_mb: number;
+  stages: StageSpan[];
+}
+
+export interface TranscriptionSegment {
+  start: number;
+  end: number;
+  text: string;
+}
+
+export type SegmentCallback = (segment: TranscriptionSegment) => void;
+
+export type SpeechModel = 'base' | 'best';
+
+export function transcribeFromUrl(
+  url: string,
+  onSegment?: SegmentCallback,
+  speechModel?: SpeechModel
+): Promise<TranscriptionResult>;
+export function transcribeFromFile(file: { path: string }, speechModel?: SpeechModel): Promise<TranscriptionResult>;
 export function formatTranscriptionResult(result: TranscriptionResult): {
   utterances: Array<{ speaker: string; text: string; start: number; end: number }>;
   speaker_labels: boolean;
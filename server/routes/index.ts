@@ -48,7 +48,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
       const { url, options } = validatedData;
       
       // Use our custom transcription service
-      const transcriptionResult = await transcribeFromUrl(url);
+      const transcriptionResult = await transcribeFromUrl(url, undefined, options?.speechModel);
       
       if (transcriptionResult.error) {
         return res.status(400).json({ 
@@ -116,7 +116,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
       const speechModel = req.body.speechModel === "base" ? "base" : "best";
       
       // Use our custom transcription service
-      const transcriptionResult = await transcribeFromFile(req.file);
+      const transcriptionResult = await transcribeFromFile(req.file, speechModel);
       
       // Clean up temp file after transcription
       fs.unlink(req.file.path, (err) => {
@@ -1,8 +1,9 @@
 import fs from 'fs';
 import path from 'path';
-import { spawn, execSync } from 'child_process';
+import { spawn, execSync, type ChildProcessWithoutNullStreams } from 'child_process';
 import { Request, Response } from 'express';
 import * as os from 'os';
+import type { Readable } from 'stream';
 
 // Interface for transcription result
 export interface TranscriptionResult {
@@ -15,6 +16,115 @@ export interface TranscriptionResult {
   }>;
   speakers?: string[];
   error?: string;
+  metrics?: TranscriptionMetrics;
+  vad?: VadSummary;
+  tier?: TierPlan;
+}
+
+// Silence trimmed by the voice activity detector before inference
+export interface VadSummary {
+  applied: boolean;
+  regions: number;
+  original_seconds: number;
+  speech_seconds: number;
+  trimmed_seconds: number;
+  trimmed_ratio: number;
+  estimated_speedup: number | null;
+}
+
+// Whisper model and diarization setting chosen to finish within the deadline
+export interface TierPlan {
+  requested_model: string;
+  model: string;
+  final_model: string;
+  diarization: boolean;
+  budget_seconds: number;
+  estimated_seconds: number;
+  elapsed_seconds: number;
+  reason: string;
+  downgrades: Array<{ from: string; to: string; at_chunk: number; reason: string }>;
+}
+
+// One timed pipeline stage (download, decode, model_load, transcribe,
+// diarize, merge or serialize) as reported by transcribe_audio.py
+export interface StageSpan {
+  stage: string;
+  offset: number;
+  duration: number;
+  audio_seconds: number | null;
+  rtf: number | null;
+  peak_rss_mb: number;
+  torch_threads: number | null;
+}
+
+export interface TranscriptionMetrics {
+  total_seconds: number;
+  audio_seconds: number | null;
+  rtf: number | null;
+  peak_rss_mb: number;
+  stages: StageSpan[];
+}
+
+export interface TranscriptionSegment {
+  start: number;
+  end: number;
+  text: string;
+}
+
+// Called for each finished segment while a long recording is still being transcribed
+export type SegmentCallback = (segment: TranscriptionSegment) => void;
+
+// Model tier requested by the client. "base" uses the server's default
+// Whisper model (WHISPER_MODEL); "best" uses WHISPER_BEST_MODEL, which
+// defaults to the same model.
+export type SpeechModel = 'base' | 'best';
+
+function modelOption(speechModel?: SpeechModel): string | undefined {
+  return speechModel === 'best' ? 'best' : undefined;
+}
+
+// Time budget handed to transcribe_audio.py so it picks a model tier that
+// finishes before the service gives up on the request, instead of being
+// killed with all its work lost. Both sides count it from the same moment:
+// a one-shot script from its own start, a warm worker job from when it is
+// written to the worker and a pooled job from its "started" message, so
+// time spent queued is never part of it. Every run streams its segments, so
+// the script treats the budget like the timeout: each streamed chunk starts
+// it over, and only the wait for the first chunk, or for a recording too
+// short to chunk, has to fit in it.
+function deadlineSeconds(timeoutMs: number): number {
+  return Math.floor(timeoutMs / 1000);
+}
+
+// Result layout requested from transcribe_audio.py. TRANSCRIBE_RESULT_FORMAT=columnar
+// has it send each segment field as one array, which is smaller and faster
+// to parse for long transcripts; the result is expanded back here.
+function resultFormat(): 'json' | 'columnar' {
+  return process.env.TRANSCRIBE_RESULT_FORMAT === 'columnar' ? 'columnar' : 'json';
+}
+
+interface ColumnarTranscriptionResult extends Omit<TranscriptionResult, 'segments'> {
+  format: 'columnar';
+  segments?: { start: number[]; end: number[]; speaker: number[]; text: string[] };
+}
+
+function expandResult(result: TranscriptionResult | ColumnarTranscriptionResult): TranscriptionResult {
+  if (!('format' in result) || result.format !== 'columnar') {
+    return result as TranscriptionResult;
+  }
+  const { format, segments: columns, ...rest } = result;
+  if (!columns) return rest;
+  const speakers = rest.speakers ?? [];
+  const segments = new Array(columns.start.length);
+  for (let i = 0; i < segments.length; i++) {
+    segments[i] = {
+      speaker: speakers[columns.speaker[i]],
+      text: columns.text[i],
+      start: columns.start[i],
+      end: columns.end[i]
+    };
+  }
+  return { ...rest, segments };
 }
 
 // Helper to format timestamps
@@ -24,11 +134,279 @@ function formatTimestamp(seconds: number): string {
   return date.toISOString().substring(11, 19);
 }
 
-// Main transcription function using our custom Python script
-export async function transcribeAudio(audioPath: string): Promise<TranscriptionResult> {
-  return new Promise((resolve, reject) => {
-    console.log(`Processing transcription for: ${audioPath}`);
-    
+// Log one line per request with the time spent in each stage. Stages that
+// ran more than once (e.g. model_load for Whisper and pyannote) are summed.
+function logTranscriptionMetrics(label: string, stages: StageSpan[], metrics?: TranscriptionMetrics) {
+  if (stages.length === 0) return;
+  const totals = new Map<string, number>();
+  for (const span of stages) {
+    totals.set(span.stage, (totals.get(span.stage) ?? 0) + span.duration);
+  }
+  const breakdown = Array.from(totals, ([stage, seconds]) => `${stage} ${seconds.toFixed(2)}s`).join(', ');
+  const peakRss = Math.max(...stages.map((span) => span.peak_rss_mb), metrics?.peak_rss_mb ?? 0);
+  const total = metrics ? `${metrics.total_seconds.toFixed(2)}s total, ` : '';
+  const rtf = metrics?.rtf != null ? `RTF ${metrics.rtf.toFixed(3)}, ` : '';
+  console.log(`Transcription metrics for ${label}: ${total}${rtf}peak RSS ${peakRss.toFixed(0)} MB (${breakdown})`);
+}
+
+// Persistent Python worker that keeps the models loaded between jobs.
+// Enabled with TRANSCRIBE_WARM_WORKER=true; otherwise every request spawns
+// a fresh transcribe_audio.py process. With TRANSCRIBE_SERVE_WORKERS set,
+// the worker forks that many processes sharing one copy of the models and
+// queues jobs between them, rejecting new ones once its queue is full.
+//
+// A single worker runs one job at a time, so jobs wait here and are written
+// to it one by one; a pool gets every job straight away and reports when it
+// starts one. Either way a job's timeout only runs from the moment it starts.
+interface PendingJob {
+  message: string;
+  resolve: (result: TranscriptionResult) => void;
+  timer: NodeJS.Timeout | null;
+  startTimer: () => void;
+  onSegment?: SegmentCallback;
+  label: string;
+}
+
+class WarmTranscriptionWorker {
+  private process: ChildProcessWithoutNullStreams | null = null;
+  // Jobs written to the worker
+  private pending = new Map<string, PendingJob>();
+  // Jobs waiting for the worker to be ready or, with a single worker, for
+  // the running job to finish
+  private queued: Array<[string, PendingJob]> = [];
+  private ready = false;
+  private pooled = false;
+  private nextId = 0;
+  private stdoutBuffer = '';
+
+  constructor(private scriptPath: string) {}
+
+  private start(): ChildProcessWithoutNullStreams {
+    console.log('Starting warm transcription worker');
+    const worker = spawn('python3', [this.scriptPath, '--serve']);
+
+    worker.stdout.on('data', (data) => {
+      this.stdoutBuffer += data.toString();
+      let newline: number;
+      while ((newline = this.stdoutBuffer.indexOf('\n')) >= 0) {
+        const line = this.stdoutBuffer.slice(0, newline).trim();
+        this.stdoutBuffer = this.stdoutBuffer.slice(newline + 1);
+        if (line) this.handleMessage(line);
+      }
+    });
+
+    worker.stderr.on('data', (data) => {
+      console.log(`Python worker log: ${data.toString()}`);
+    });
+
+    worker.on('close', (code) => {
+      console.log(`Warm transcription worker exited with code ${code}`);
+      if (this.process === worker) {
+        const wasReady = this.ready;
+        this.detach(`Python worker exited with code ${code}`);
+        // A worker that dies before it is ready would die again; otherwise
+        // the jobs still waiting get a fresh one
+        if (!wasReady) {
+          this.failQueued(`Python worker exited with code ${code}`);
+        } else if (this.queued.length > 0) {
+          this.start();
+        }
+      }
+    });
+
+    worker.on('error', (err) => {
+      console.error(`Failed to start warm transcription worker: ${err.message}`);
+      if (this.process === worker) {
+        this.detach(err.message);
+        this.failQueued(err.message);
+      }
+    });
+
+    this.process = worker;
+    this.ready = false;
+    this.pooled = false;
+    return worker;
+  }
+
+  // Forget the current worker process and fail the jobs written to it
+  private detach(reason: string) {
+    this.process = null;
+    this.ready = false;
+    this.stdoutBuffer = '';
+    const jobs = Array.from(this.pending.values());
+    this.pending.clear();
+    failJobs(jobs, reason);
+  }
+
+  private failQueued(reason: string) {
+    const jobs = this.queued.map(([, job]) => job);
+    this.queued = [];
+    failJobs(jobs, reason);
+  }
+
+  // Write waiting jobs to the worker while it can take them
+  private dispatch() {
+    const worker = this.process;
+    if (!worker || !this.ready) return;
+    while (this.queued.length > 0 && (this.pooled || this.pending.size === 0)) {
+      const [id, job] = this.queued.shift()!;
+      this.pending.set(id, job);
+      // A pooled job may still wait in the pool's queue; its "started"
+      // message starts the timer
+      if (!this.pooled) job.startTimer();
+      worker.stdin.write(job.message + '\n');
+    }
+  }
+
+  private handleMessage(line: string) {
+    let message: any;
+    try {
+      message = JSON.parse(line);
+    } catch (error: any) {
+      console.error(`Invalid message from transcription worker: ${line}`);
+      return;
+    }
+
+    if (message.type === 'ready') {
+      const pool = message.workers ? `, ${message.workers} workers, queue of ${message.queue_size}` : '';
+      console.log(`Warm transcription worker ready (models loaded in ${message.load_time}s${pool})`);
+      this.ready = true;
+      this.pooled = Boolean(message.workers);
+      this.dispatch();
+      return;
+    }
+
+    const job = message.id !== undefined ? this.pending.get(String(message.id)) : undefined;
+    if (!job) return;
+
+    // Streamed segments show progress, so they push the timeout back
+    if (message.type === 'segment') {
+      job.startTimer();
+      job.onSegment?.({ start: message.start, end: message.end, text: message.text });
+      return;
+    }
+
+    // A pooled job waited in the queue until now; time it from here
+    if (message.type === 'started') {
+      job.startTimer();
+      return;
+    }
+
+    this.pending.delete(String(message.id));
+    if (job.timer) clearTimeout(job.timer);
+
+    if (message.type === 'result') {
+      if (message.result?.metrics) {
+        logTranscriptionMetrics(job.label, message.result.metrics.stages, message.result.metrics);
+      }
+      job.resolve(expandResult(message.result));
+    } else {
+      job.resolve({
+        text: "An error occurred in the transcription process. This is a fallback response.",
+        error: message.error || 'Unknown worker error'
+      });
+    }
+    this.dispatch();
+  }
+
+  private timeOut(id: string) {
+    const job = this.pending.get(id);
+    if (!job) return;
+    this.pending.delete(id);
+    console.error("Transcription process timed out");
+    job.resolve({
+      text: "Transcription process timed out. This is a fallback response.",
+      error: "Process timeout"
+    });
+
+    const worker = this.process;
+    if (!worker) return;
+    // The pool kills and replaces only the process running this job, so the
+    // other clients' jobs carry on
+    if (this.pooled) {
+      worker.stdin.write(JSON.stringify({ id, op: 'cancel' }) + '\n');
+      return;
+    }
+    // A single worker is stuck on this job and may not react to SIGTERM
+    // until it finishes; kill it and give the waiting jobs a fresh one
+    this.detach('Python worker was killed after a job timed out');
+    worker.kill('SIGKILL');
+    if (this.queued.length > 0) this.start();
+  }
+
+  run(
+    job: { path?: string; url?: string; model?: string; deadline?: number; format?: string },
+    timeoutMs: number,
+    onSegment?: SegmentCallback
+  ): Promise<TranscriptionResult> {
+    const id = String(++this.nextId);
+
+    return new Promise((resolve) => {
+      const pendingJob: PendingJob = {
+        message: JSON.stringify({ id, op: 'transcribe', stream: true, format: resultFormat(), ...job }),
+        resolve,
+        timer: null,
+        startTimer: () => {
+          if (pendingJob.timer) clearTimeout(pendingJob.timer);
+          pendingJob.timer = setTimeout(() => this.timeOut(id), timeoutMs);
+        },
+        onSegment,
+        label: job.path ?? job.url ?? id
+      };
+
+      this.queued.push([id, pendingJob]);
+      if (this.process) {
+        this.dispatch();
+      } else {
+        this.start();
+      }
+    });
+  }
+
+  stop() {
+    if (this.process) {
+      this.process.stdin.write(JSON.stringify({ op: 'shutdown' }) + '\n');
+      this.process.stdin.end();
+    }
+  }
+}
+
+function failJobs(jobs: PendingJob[], reason: string) {
+  for (const job of jobs) {
+    if (job.timer) clearTimeout(job.timer);
+    job.resolve({
+      text: "An error occurred in the transcription process. This is a fallback response.",
+      error: reason
+    });
+  }
+}
+
+let warmWorker: WarmTranscriptionWorker | null = null;
+
+function getWarmWorker(): WarmTranscriptionWorker | null {
+  if (process.env.TRANSCRIBE_WARM_WORKER !== 'true') {
+    return null;
+  }
+  if (!warmWorker) {
+    warmWorker = new WarmTranscriptionWorker(path.resolve(process.cwd(), 'server/transcribe_audio.py'));
+    process.once('exit', () => warmWorker?.stop());
+  }
+  return warmWorker;
+}
+
+// Run transcribe_audio.py in streaming mode. It writes one NDJSON line per
+// finished segment followed by a final {"type": "result"} line. The timeout
+// is an inactivity timeout: every streamed segment pushes it back, so long
+// recordings that keep making progress are not killed.
+//
+// Stage metrics arrive as JSON lines on an extra pipe (fd 3, announced to the
+// script through TRANSCRIBE_METRICS_FD) and are logged once per request.
+function runTranscriptionScript(
+  args: string[],
+  timeoutMs: number,
+  onSegment?: SegmentCallback
+): Promise<TranscriptionResult> {
+  return new Promise((resolve) => {
     try {
       // Get path to the Python script
       const scriptPath = path.resolve(process.cwd(), 'server/transcribe_audio.py');
@@ -50,25 +428,98 @@ export async function transcribeAudio(audioPath: string): Promise<TranscriptionR
       }
       
       // Prepare to run the Python script
-      const pythonProcess = spawn('python3', [scriptPath, audioPath]);
+      const pythonProcess = spawn('python3', [scriptPath, '--stream', '--result-format', resultFormat(), ...args], {
+        stdio: ['pipe', 'pipe', 'pipe', 'pipe'],
+        env: { ...process.env, TRANSCRIBE_METRICS_FD: '3' }
+      });
+      const metricsStream = pythonProcess.stdio[3] as Readable | null;
       
-      let outputData = '';
+      let pendingOutput = '';
+      let pendingMetrics = '';
+      const stageSpans: StageSpan[] = [];
+      let jobMetrics: TranscriptionMetrics | undefined;
+      let finalResult: TranscriptionResult | null = null;
+      let rawOutput = '';
       let errorData = '';
+      let timeout: NodeJS.Timeout;
+      
+      // Set a timeout in case the process hangs
+      const resetTimeout = () => {
+        clearTimeout(timeout);
+        timeout = setTimeout(() => {
+          pythonProcess.kill();
+          console.error("Transcription process timed out");
+          resolve({
+            text: "Transcription process timed out. This is a fallback response.",
+            error: "Process timeout"
+          });
+        }, timeoutMs);
+      };
+      resetTimeout();
       
-      // Collect standard output
-      pythonProcess.stdout.on('data', (data) => {
-        outputData += data.toString();
+      const handleLine = (line: string) => {
+        let message: any;
+        try {
+          message = JSON.parse(line);
+        } catch (error: any) {
+          rawOutput += line + '\n';
+          return;
+        }
+        if (message.type === 'segment') {
+          resetTimeout();
+          onSegment?.({ start: message.start, end: message.end, text: message.text });
+        } else if (message.type === 'result') {
+          finalResult = expandResult(message.result);
+        } else {
+          // Plain JSON object, e.g. an early error before streaming started
+          finalResult = message;
+        }
+      };
+      
+      // Collect stage metrics line by line
+      metricsStream?.on('data', (data) => {
+        pendingMetrics += data.toString();
+        let newline: number;
+        while ((newline = pendingMetrics.indexOf('\n')) >= 0) {
+          const line = pendingMetrics.slice(0, newline).trim();
+          pendingMetrics = pendingMetrics.slice(newline + 1);
+          if (!line) continue;
+          try {
+            const event = JSON.parse(line);
+            if (event.type === 'span') {
+              stageSpans.push(event);
+            } else if (event.type === 'job') {
+              jobMetrics = event;
+            }
+          } catch (error: any) {
+            console.warn(`Invalid metrics event from Python script: ${line}`);
+          }
+        }
+      });
+      
+      // Collect standard output line by line
+      pythonProcess.stdout?.on('data', (data) => {
+        pendingOutput += data.toString();
+        let newline: number;
+        while ((newline = pendingOutput.indexOf('\n')) >= 0) {
+          const line = pendingOutput.slice(0, newline).trim();
+          pendingOutput = pendingOutput.slice(newline + 1);
+          if (line) handleLine(line);
+        }
       });
       
       // Collect error output
-      pythonProcess.stderr.on('data', (data) => {
+      pythonProcess.stderr?.on('data', (data) => {
         console.log(`Python script log: ${data.toString()}`);
         errorData += data.toString();
       });
       
       // Handle process completion
       pythonProcess.on('close', (code) => {
+        clearTimeout(timeout);
         console.log(`Python script exited with code ${code}`);
+        if (pendingOutput.trim()) handleLine(pendingOutput.trim());
+        logTranscriptionMetrics(args[args.length - 1], stageSpans, jobMetrics);
         
         if (code !== 0) {
           console.error(`Python script error: ${errorData}`);
@@ -79,55 +530,38 @@ export async function transcribeAudio(audioPath: string): Promise<TranscriptionR
           });
         }
         
-        try {
-          // Parse JSON output from the Python script
-          const result = JSON.parse(outputData);
+        if (finalResult) {
           console.log("Transcription result received successfully");
-          resolve(result);
-        } catch (error: any) {
-          console.error(`Failed to parse Python script output: ${error.message}`);
-          console.error(`Raw output: ${outputData}`);
-          
-          // Handle case where output isn't valid JSON
-          if (outputData.trim()) {
-            // If there's some text output, use it as plain text
-            resolve({
-              text: outputData.trim()
-            });
-          } else {
-            // No usable output
-            resolve({
-              text: "Failed to parse transcription result. This is a fallback response.",
-              error: "Invalid output format"
-            });
-          }
+          return resolve(finalResult);
+        }
+        
+        console.error('Failed to parse Python script output');
+        console.error(`Raw output: ${rawOutput}`);
+        
+        // Handle case where output isn't valid JSON
+        if (rawOutput.trim()) {
+          // If there's some text output, use it as plain text
+          resolve({
+            text: rawOutput.trim()
+          });
+        } else {
+          // No usable output
+          resolve({
+            text: "Failed to parse transcription result. This is a fallback response.",
+            error: "Invalid output format"
+          });
         }
       });
       
       // Handle process errors
       pythonProcess.on('error', (err) => {
+        clearTimeout(timeout);
         console.error(`Failed to start Python process: ${err.message}`);
         resolve({
           text: "Failed to start transcription process. This is a fallback response.",
           error: err.message
         });
       });
-      
-      // Set a timeout in case the process hangs
-      const timeout = setTimeout(() => {
-        pythonProcess.kill();
-        console.error("Transcription process timed out");
-        resolve({
-          text: "Transcription process timed out. This is a fallback response.",
-          error: "Process timeout"
-        });
-      }, 3 * 60 * 1000); // 3 minute timeout
-      
-      // Clear the timeout if the process completes
-      pythonProcess.on('close', () => {
-        clearTimeout(timeout);
-      });
-      
     } catch (error: any) {
       console.error('Error in transcription process:', error);
       resolve({ 
@@ -138,110 +572,45 @@ export async function transcribeAudio(audioPath: string): Promise<TranscriptionR
   });
 }
 
+// Main transcription function using our custom Python script
+export async function transcribeAudio(
+  audioPath: string,
+  onSegment?: SegmentCallback,
+  speechModel?: SpeechModel
+): Promise<TranscriptionResult> {
+  const model = modelOption(speechModel);
+  const worker = getWarmWorker();
+  const timeoutMs = 3 * 60 * 1000; // 3 minute inactivity timeout
+  if (worker) {
+    console.log(`Processing transcription for: ${audioPath} (warm worker)`);
+    return worker.run({ path: audioPath, model, deadline: deadlineSeconds(timeoutMs) }, timeoutMs, onSegment);
+  }
+
+  console.log(`Processing transcription for: ${audioPath}`);
+  const modelArgs = model ? ['--model', model] : [];
+  const deadlineArgs = ['--deadline', String(deadlineSeconds(timeoutMs))];
+  return runTranscriptionScript([...modelArgs, ...deadlineArgs, audioPath], timeoutMs, onSegment);
+}
+
 // Process an audio URL
-export async function transcribeFromUrl(url: string): Promise<TranscriptionResult> {
+export async function transcribeFromUrl(
+  url: string,
+  onSegment?: SegmentCallback,
+  speechModel?: SpeechModel
+): Promise<TranscriptionResult> {
   try {
-    console.log(`Transcribing from URL: ${url}`);
-    
-    // Get path to the Python script
-    const scriptPath = path.resolve(process.cwd(), 'server/transcribe_audio.py');
-    
-    // Check if Python script exists
-    if (!fs.existsSync(scriptPath)) {
-      console.error(`Transcription script not found at: ${scriptPath}`);
-      return {
-        text: "Transcription script not found. This is a fallback response.",
-        error: "Script not found"
-      };
-    }
-    
-    // Make the script executable
-    try {
-      execSync(`chmod +x "${scriptPath}"`);
-    } catch (error: any) {
-      console.warn(`Failed to chmod script: ${error.message}, continuing anyway`);
+    const model = modelOption(speechModel);
+    const worker = getWarmWorker();
+    const timeoutMs = 5 * 60 * 1000; // 5 minute inactivity timeout
+    if (worker) {
+      console.log(`Transcribing from URL: ${url} (warm worker)`);
+      return worker.run({ url, model, deadline: deadlineSeconds(timeoutMs) }, timeoutMs, onSegment);
     }
-    
-    // Prepare to run the Python script with URL parameter
-    const pythonProcess = spawn('python3', [scriptPath, '--url', url]);
-    
-    let outputData = '';
-    let errorData = '';
-    
-    // Collect standard output
-    pythonProcess.stdout.on('data', (data) => {
-      outputData += data.toString();
-    });
-    
-    // Collect error output
-    pythonProcess.stderr.on('data', (data) => {
-      console.log(`Python script log: ${data.toString()}`);
-      errorData += data.toString();
-    });
-    
-    // Handle process completion
-    return new Promise((resolve) => {
-      pythonProcess.on('close', (code) => {
-        console.log(`Python script exited with code ${code}`);
-        
-        if (code !== 0) {
-          console.error(`Python script error: ${errorData}`);
-          // Provide a fallback response if the script failed
-          return resolve({
-            text: "An error occurred in the transcription process. This is a fallback response.",
-            error: `Python process exited with code ${code}`
-          });
-        }
-        
-        try {
-          // Parse JSON output from the Python script
-          const result = JSON.parse(outputData);
-          console.log("Transcription result received successfully");
-          resolve(result);
-        } catch (error: any) {
-          console.error(`Failed to parse Python script output: ${error.message}`);
-          console.error(`Raw output: ${outputData}`);
-          
-          // Handle case where output isn't valid JSON
-          if (outputData.trim()) {
-            // If there's some text output, use it as plain text
-            resolve({
-              text: outputData.trim()
-            });
-          } else {
-            // No usable output
-            resolve({
-              text: "Failed to parse transcription result. This is a fallback response.",
-              error: "Invalid output format"
-            });
-          }
-        }
-      });
-      
-      // Handle process errors
-      pythonProcess.on('error', (err) => {
-        console.error(`Failed to start Python process: ${err.message}`);
-        resolve({
-          text: "Failed to start transcription process. This is a fallback response.",
-          error: err.message
-        });
-      });
-      
-      // Set a timeout in case the process hangs
-      const timeout = setTimeout(() => {
-        pythonProcess.kill();
-        console.error("Transcription process timed out");
-        resolve({
-          text: "Transcription process timed out. This is a fallback response.",
-          error: "Process timeout"
-        });
-      }, 5 * 60 * 1000); // 5 minute timeout
-      
-      // Clear the timeout if the process completes
-      pythonProcess.on('close', () => {
-        clearTimeout(timeout);
-      });
-    });
+
+    console.log(`Transcribing from URL: ${url}`);
+    const modelArgs = model ? ['--model', model] : [];
+    const deadlineArgs = ['--deadline', String(deadlineSeconds(timeoutMs))];
+    return runTranscriptionScript([...modelArgs, ...deadlineArgs, '--url', url], timeoutMs, onSegment);
   } catch (error: any) {
     console.error('Error transcribing from URL:', error);
     return { 
@@ -252,10 +621,10 @@ export async function transcribeFromUrl(url: string): Promise<TranscriptionResul
 }
 
 // Process an uploaded file
-export async function transcribeFromFile(file: any): Promise<TranscriptionResult> {
+export async function transcribeFromFile(file: any, speechModel?: SpeechModel): Promise<TranscriptionResult> {
   try {
     console.log(`Transcribing from file: ${file.originalname}`);
-    return transcribeAudio(file.path);
+    return transcribeAudio(file.path, undefined, speechModel);
   } catch (error) {
     console.error('Error transcribing file:', error);
     return { 
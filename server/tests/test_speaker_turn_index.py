@@ -0,0 +1,26 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from transcribe_audio import SpeakerTurnIndex  # noqa: E402
+
+
+def test_overlapping_turns_of_one_speaker_count_once():
+    # A has two turns overlapping on 0-4 (4s of speech); B talks 4-9 (5s)
+    index = SpeakerTurnIndex([0.0, 0.0, 4.0], [4.0, 4.0, 9.0], [0, 0, 1], ["A", "B"])
+    assert index.assign([0.0], [9.0]) == ["B"]
+
+
+def test_nested_turns_cover_their_union():
+    index = SpeakerTurnIndex([0.0, 1.0, 5.0], [6.0, 2.0, 10.0], [0, 0, 1], ["A", "B"])
+    points, running, covered = index.coverage[0]
+    assert running.max() == 1.0
+    assert covered[-1] == 6.0
+    assert index.assign([0.0, 5.5], [5.5, 10.0]) == ["A", "B"]
+
+
+def test_touching_and_missing_turns():
+    index = SpeakerTurnIndex([0.0, 2.0], [2.0, 4.0], [0, 1], ["A", "B"])
+    # Zero-length segment at a boundary falls back to the earliest touching turn
+    assert index.assign([2.0, 5.0], [2.0, 6.0]) == ["A", None]
@@ -6,6 +6,8 @@
 Uses OpenAI's Whisper for transcription and pyannote.audio for speaker diarization
 """
 
+from __future__ import annotations
+
 import sys
 import os
 import json
@@ -14,86 +16,1110 @@
 import traceback
 import subprocess
 import datetime
-from typing import Dict, List, Any, Tuple, Optional
+import signal
+import hashlib
+import shutil
+import threading
+import argparse
+import multiprocessing
+from multiprocessing import shared_memory
+import http.client
+import glob
+import queue
+import select
+import socket
+import collections
+import dataclasses
+import gc
+import contextlib
+import contextvars
+import importlib
+import importlib.util
+from urllib.parse import urljoin, urlsplit
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor, wait as wait_for_futures
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, List, Any, Tuple, Optional
+
+# A --deadline counts from here, which is close to when the caller started
+# its own clock by spawning this process
+PROCESS_STARTED = time.time()
 
-# Try to import required packages with better error handling
+# Checked with spec lookups, which find a package without importing it
 REQUIRED_PACKAGES = [
     "whisper",
     "torch",
     "torchaudio",
     "numpy",
-    "pydub",
     "pyannote.audio"
 ]
 
-missing_packages = []
-for package in REQUIRED_PACKAGES:
+def _package_available(package: str) -> bool:
     try:
-        __import__(package)
-    except ImportError:
-        missing_packages.append(package)
-
-if missing_packages:
-    print(json.dumps({
-        "text": "Server error: Required Python packages are not installed.",
-        "error": f"Missing packages: {', '.join(missing_packages)}",
-        "instructions": "Please install the required packages using: pip install -r requirements.txt"
-    }), file=sys.stderr)
-    sys.exit(1)
-
-# Now safely import the packages
-import whisper
-import torch
-import numpy as np
-from pydub import AudioSegment
-
-# Try to import pyannote.audio with a fallback
-try:
-    from pyannote.audio import Pipeline
-    DIARIZATION_AVAILABLE = True
-except ImportError:
-    DIARIZATION_AVAILABLE = False
+        return importlib.util.find_spec(package) is not None
+    except ModuleNotFoundError:  # parent package of a dotted name is missing
+        return False
+
+def check_required_packages() -> None:
+    """Exit with a JSON error if a required package is not installed"""
+    missing_packages = [package for package in REQUIRED_PACKAGES if not _package_available(package)]
+    if missing_packages:
+        print(json.dumps({
+            "text": "Server error: Required Python packages are not installed.",
+            "error": f"Missing packages: {', '.join(missing_packages)}",
+            "instructions": "Please install the required packages using: pip install -r requirements.txt"
+        }), file=sys.stderr)
+        sys.exit(1)
+
+class _LazyModule:
+    """
+    Stands in for a heavy module until an attribute is first used.
+
+    torch, whisper and pyannote take seconds to import, which every run
+    used to pay up front, including cache hits and argument errors. The
+    real import now happens inside the stage that needs it, so its cost
+    shows up in that stage's span. Once imported, the module replaces the
+    proxy under its global name, so hot loops don't go through __getattr__.
+    """
+
+    def __init__(self, name: str, alias: str, on_import: Optional[Callable[[Any], None]] = None):
+        self._name = name
+        self._alias = alias
+        self._on_import = on_import
+
+    def __getattr__(self, attr: str):
+        module = importlib.import_module(self._name)
+        globals()[self._alias] = module
+        if self._on_import is not None:
+            self._on_import(module)
+        return getattr(module, attr)
+
+def _configure_torch(module) -> None:
+    """
+    Apply the thread settings as soon as torch is imported. Its defaults
+    count every core on the host, which oversubscribes containers that
+    only get a share of them.
+    """
+    module.set_num_threads(intra_op_threads(TRANSCRIBE_THREADS or available_cpus()))
+    if INTEROP_THREADS:
+        try:
+            module.set_num_interop_threads(INTEROP_THREADS)
+        except RuntimeError:  # the inter-op pool already started, e.g. the caller imported torch first
+            pass
+
+whisper = _LazyModule("whisper", "whisper")
+torch = _LazyModule("torch", "torch", on_import=_configure_torch)
+np = _LazyModule("numpy", "np")
+
+# pyannote.audio is imported only when diarization actually runs (the
+# package is installed and HF_TOKEN is set)
+DIARIZATION_AVAILABLE = _package_available("pyannote.audio")
+if not DIARIZATION_AVAILABLE:
     print("Warning: pyannote.audio not available, speaker diarization will be disabled", file=sys.stderr)
 
+def cgroup_cpu_limit() -> Optional[float]:
+    """CPUs allowed by the container's cgroup CPU quota, or None when there is no quota"""
+    try:  # cgroup v2
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()[:2]
+        return None if quota == "max" else int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:  # cgroup v1
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+            quota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            period = int(f.read())
+    except (OSError, ValueError):
+        return None
+    return quota / period if quota > 0 and period > 0 else None
+
+def available_cpus() -> int:
+    """Number of cores this process may use: its affinity mask, capped by any cgroup CPU quota"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    limit = cgroup_cpu_limit()
+    if limit is not None:
+        # Rounded down: threads beyond the quota get throttled for whole periods
+        cpus = min(cpus, max(1, int(limit)))
+    return cpus
+
+# Host tuning profile written by scripts/check_environment.py --probe. Its
+# thread, worker and model choices replace the built-in defaults below;
+# environment variables still take precedence
+TUNING_PROFILE_PATH = os.environ.get(
+    "TRANSCRIBE_TUNING_PROFILE",
+    os.path.join(os.path.expanduser("~"), ".cache", "webaudio-transcriber", "tuning.json")
+)
+TUNING_PROFILE_VERSION = 1
+# 0 ignores the profile; the probe runs this way so that the profile it
+# replaces doesn't skew its measurements
+TUNING_PROFILE_ENABLED = os.environ.get("TRANSCRIBE_TUNING", "1") != "0"
+
+def load_tuning_profile(path: str = TUNING_PROFILE_PATH) -> Dict[str, Any]:
+    """
+    Read the tuning profile, or return {} when there is none or it was
+    measured with a different number of CPUs than this process may use
+    """
+    if not TUNING_PROFILE_ENABLED:
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            profile = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        print(f"Warning: ignoring unreadable tuning profile {path}: {e}", file=sys.stderr)
+        return {}
+    if profile.get("version") != TUNING_PROFILE_VERSION:
+        print(f"Warning: ignoring tuning profile {path} with unsupported version {profile.get('version')}", file=sys.stderr)
+        return {}
+    measured_cpus = profile.get("host", {}).get("available_cpus")
+    if measured_cpus != available_cpus():
+        print(
+            f"Warning: ignoring tuning profile {path}, which was measured with {measured_cpus} CPUs "
+            f"(this process may use {available_cpus()}); run scripts/check_environment.py --probe again",
+            file=sys.stderr
+        )
+        return {}
+    return profile
+
+TUNING_PROFILE = load_tuning_profile()
+
 # Model constants
-WHISPER_MODEL = "base"  # Options: tiny, base, small, medium, large
+# Options: tiny, base, small, medium, large
+WHISPER_MODEL = os.environ.get("WHISPER_MODEL", TUNING_PROFILE.get("recommended_model", "base"))
+# Model used when a request asks for the "best" tier. Clients ask for it by
+# default, so it stays on WHISPER_MODEL unless the operator opts in to a
+# larger (slower) model
+WHISPER_BEST_MODEL = os.environ.get("WHISPER_BEST_MODEL", WHISPER_MODEL)
+MODEL_ALIASES = {"default": WHISPER_MODEL, "best": WHISPER_BEST_MODEL}
+# "int8" runs Whisper's linear layers with dynamically quantized weights on CPU
+WHISPER_QUANTIZE = os.environ.get("WHISPER_QUANTIZE", "none")
+QUANTIZE_MODES = ("none", "int8")
+# Quantized models are prepared once and kept here
+MODEL_CACHE_DIR = os.environ.get(
+    "TRANSCRIBE_MODEL_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "webaudio-transcriber", "models")
+)
 DIARIZATION_MODEL = "pyannote/speaker-diarization"
 # Using environment variable for the token
 HF_TOKEN = os.environ.get("HF_TOKEN")  # Get from environment variable
+# Both models work on 16 kHz mono audio
+SAMPLE_RATE = 16000
+# Decoded PCM is read from ffmpeg in blocks of this size (about 16 s)
+PCM_BLOCK_BYTES = 1 << 20
+# Lines of ffmpeg's stderr kept for the error message of a failed decode
+FFMPEG_STDERR_TAIL_LINES = 20
+
+# Result cache settings
+CACHE_ENABLED = os.environ.get("TRANSCRIBE_CACHE", "1") != "0"
+CACHE_DIR = os.environ.get(
+    "TRANSCRIBE_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "webaudio-transcriber", "results")
+)
+CACHE_MAX_BYTES = int(os.environ.get("TRANSCRIBE_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+# Checkpoints of long jobs, so a retry after a crash or timeout only redoes
+# the missing work
+CHECKPOINT_ENABLED = os.environ.get("TRANSCRIBE_CHECKPOINTS", "1") != "0"
+CHECKPOINT_DIR = os.environ.get(
+    "TRANSCRIBE_CHECKPOINT_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "webaudio-transcriber", "jobs")
+)
+# Shorter recordings are cheap enough to redo from scratch
+CHECKPOINT_MIN_SECONDS = float(os.environ.get("TRANSCRIBE_CHECKPOINT_MIN_SECONDS", "300"))
+# Job directories left untouched for this long are removed
+CHECKPOINT_TTL_SECONDS = float(os.environ.get("TRANSCRIBE_CHECKPOINT_TTL", str(24 * 3600)))
+
+# CPU thread budget shared by the Whisper and diarization stages
+# (0 = every core this process may run on)
+TRANSCRIBE_THREADS = int(os.environ.get("TRANSCRIBE_THREADS", "0"))
+# Most intra-op threads one torch op gets; past the point where matrix
+# multiplies stop scaling, extra threads only contend (0 = no limit)
+MAX_INTRA_OP_THREADS = int(os.environ.get(
+    "TRANSCRIBE_MAX_INTRA_OP_THREADS", TUNING_PROFILE.get("threads", {}).get("intra_op", 0)
+))
+# torch inter-op pool size (0 = torch's default)
+INTEROP_THREADS = int(os.environ.get("TRANSCRIBE_INTEROP_THREADS", TUNING_PROFILE.get("threads", {}).get("inter_op", 0)))
+
+# Chunked transcription of long recordings: audio longer than the threshold
+# is split into overlapping windows that are transcribed in a process pool
+CHUNK_THRESHOLD_SECONDS = float(os.environ.get("TRANSCRIBE_CHUNK_THRESHOLD", "600"))
+CHUNK_SECONDS = float(os.environ.get("TRANSCRIBE_CHUNK_SECONDS", "120"))
+CHUNK_OVERLAP_SECONDS = float(os.environ.get("TRANSCRIBE_CHUNK_OVERLAP", "2"))
+# 0 = derive from cores
+CHUNK_WORKERS = int(os.environ.get("TRANSCRIBE_CHUNK_WORKERS", "0"))
+# Best worker count the probe measured with every core of the host; a job
+# with a smaller thread share (e.g. in a pool worker) still gets fewer
+PROFILE_CHUNK_WORKERS = int(TUNING_PROFILE.get("workers", 0))
+# How far from the nominal boundary to look for a quiet place to cut
+CHUNK_SEARCH_SECONDS = 5.0
+
+# Serve-mode worker pool (--workers). 0 workers = as many as the core and
+# memory budget allow; 0 queue = twice the worker count. Jobs beyond the
+# queue are rejected rather than left to pile up
+SERVE_WORKERS = int(os.environ.get("TRANSCRIBE_SERVE_WORKERS", "1"))
+SERVE_QUEUE_SIZE = int(os.environ.get("TRANSCRIBE_SERVE_QUEUE", "0"))
+# Memory a pool worker needs on top of the shared model weights while it
+# runs a job (decoded audio, activations, results)
+WORKER_JOB_MEMORY_MB = float(os.environ.get("TRANSCRIBE_WORKER_MEMORY_MB", "1024"))
+# Fewest cores worth giving each pool worker
+MIN_WORKER_THREADS = 2
+
+# Voice activity detection: silences longer than VAD_MIN_SILENCE_SECONDS
+# are cut out before inference and timestamps are mapped back afterwards
+VAD_ENABLED = os.environ.get("TRANSCRIBE_VAD", "1") != "0"
+VAD_FRAME_SECONDS = 0.02
+# Frames this far above the recording's noise floor count as speech...
+VAD_MARGIN_DB = 12.0
+# ...as do quieter frames with a high zero-crossing rate (fricatives)
+VAD_ZCR_THRESHOLD = 0.25
+VAD_PADDING_SECONDS = 0.3
+VAD_MIN_SPEECH_SECONDS = 0.1
+VAD_MIN_SILENCE_SECONDS = 1.0
+# Below this fraction of trimmable silence the original audio is used as is
+VAD_MIN_TRIM_RATIO = 0.05
+
+# Deadline planning. Seconds of processing per second of audio, and model
+# load seconds, on a 4-core CPU; used until this host has measured its own
+RTF_STORE_PATH = os.environ.get(
+    "TRANSCRIBE_RTF_STORE",
+    os.path.join(os.path.expanduser("~"), ".cache", "webaudio-transcriber", "rtf.json")
+)
+PRIOR_RTF = {"tiny": 0.05, "base": 0.1, "small": 0.35, "medium": 1.0, "large": 2.0, "diarization": 0.15}
+PRIOR_LOAD_SECONDS = {"tiny": 1.0, "base": 2.0, "small": 4.0, "medium": 10.0, "large": 20.0, "diarization": 5.0}
+# Tiers timed on this host by the probe replace the generic priors
+PRIOR_RTF.update({name: tier["rtf"] for name, tier in TUNING_PROFILE.get("tiers", {}).items()})
+PRIOR_LOAD_SECONDS.update({name: tier["load_seconds"] for name, tier in TUNING_PROFILE.get("tiers", {}).items()})
+INT8_RTF_FACTOR = 0.6
+# Chunk workers share the machine, so N workers are not quite N times faster
+CHUNK_PARALLEL_EFFICIENCY = 0.7
+# Weight of the newest measurement in the moving averages
+RTF_EMA_WEIGHT = 0.3
+# Plan to finish within this share of the budget, leaving room for merging
+# and for estimates that turn out optimistic
+DEADLINE_SAFETY = 0.85
+# Whisper models from most to least accurate
+MODEL_LADDER = ["large", "medium", "small", "base", "tiny"]
+
+# URL ingestion limits. The idle timeout applies to each read, so slow but
+# steady downloads are fine while stalled ones are abandoned.
+MAX_DOWNLOAD_BYTES = int(os.environ.get("TRANSCRIBE_MAX_DOWNLOAD_BYTES", str(200 * 1024 * 1024)))
+DOWNLOAD_IDLE_TIMEOUT = float(os.environ.get("TRANSCRIBE_DOWNLOAD_IDLE_TIMEOUT", "30"))
+MAX_REDIRECTS = 5
+# Most of a response body read just to reuse its connection
+RELEASE_DRAIN_BYTES = 64 * 1024
+
+# Structured stage metrics are written as JSON lines to this file descriptor
+# when it is set (the Node service passes an extra pipe); they are also
+# returned in the result's "metrics" block
+METRICS_FD = os.environ.get("TRANSCRIBE_METRICS_FD")
+
+# Print every merged segment to stderr (also enabled with --verbose)
+DEBUG_OUTPUT = os.environ.get("TRANSCRIBE_DEBUG", "0") != "0"
+
+# Result layouts: "json" has one object per segment; "columnar" keeps each
+# segment field in one array, with speakers as indexes into "speakers", as
+# compact JSON; "msgpack" is the columnar layout encoded as MessagePack
+RESULT_FORMATS = ("json", "columnar", "msgpack")
+
+# Models are loaded once per process and reused, so a long-lived worker
+# (see serve()) only pays the load cost on its first job
+_whisper_models: Dict[str, Any] = {}
+_diarization_pipeline = None
+_result_cache = None
+_rtf_store = None
+_metrics_channel = None
+_metrics_channel_lock = threading.Lock()
 
 def format_timestamp(seconds: float) -> str:
     """Convert seconds to formatted timestamp"""
     return str(datetime.timedelta(seconds=int(seconds)))
 
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB"""
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes everywhere else
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024
+
+def _read_pcm(stream) -> np.ndarray:
+    """Read raw float32 PCM from a pipe in fixed-size blocks and join them once"""
+    blocks = []
+    while True:
+        block = stream.read(PCM_BLOCK_BYTES)
+        if not block:
+            break
+        blocks.append(block)
+    data = b"".join(blocks)
+    del blocks
+    return np.frombuffer(data, dtype=np.float32, count=len(data) // 4)
+
+def decode_audio(
+    source: str,
+    sample_rate: int = SAMPLE_RATE,
+    input_format: Optional[str] = None,
+    feed: Optional[Callable[[Any], None]] = None
+) -> np.ndarray:
+    """
+    Decode any ffmpeg-readable audio into a mono float32 array.
+
+    ffmpeg writes raw little-endian float32 PCM to a pipe, which is read
+    in blocks that are joined once at the end, so memory peaks at about
+    twice the decoded size while they are joined. When feed is given, ffmpeg reads its input
+    from stdin and feed(stdin) runs on a separate thread to supply it, so
+    decoding proceeds while the input is still arriving.
+    """
+    command = ["ffmpeg", "-nostdin", "-hide_banner", "-loglevel", "error", "-threads", "0"]
+    if input_format:
+        command += ["-f", input_format]
+    command += [
+        "-i", "pipe:0" if feed is not None else source,
+        "-f", "f32le", "-acodec", "pcm_f32le", "-ac", "1", "-ar", str(sample_rate),
+        "-"
+    ]
+    if feed is not None:
+        # -nostdin would stop ffmpeg reading its input from the pipe
+        command.remove("-nostdin")
+    try:
+        process = subprocess.Popen(
+            command,
+            stdin=subprocess.PIPE if feed is not None else None,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        )
+    except FileNotFoundError:
+        raise RuntimeError("ffmpeg is required to decode audio but was not found in PATH")
+
+    feed_errors: List[BaseException] = []
+    feeder = None
+    if feed is not None:
+        def run_feed():
+            try:
+                feed(process.stdin)
+            except BrokenPipeError:
+                pass  # ffmpeg exited early; its own error is reported below
+            except BaseException as e:
+                feed_errors.append(e)
+                process.kill()
+            finally:
+                try:
+                    process.stdin.close()
+                except OSError:
+                    pass
+        feeder = threading.Thread(target=run_feed, name="decode-feed", daemon=True)
+        feeder.start()
+
+    # stderr is drained on its own thread: if ffmpeg filled the pipe with
+    # warnings while stdout was being read, both processes would block
+    stderr_tail: collections.deque = collections.deque(maxlen=FFMPEG_STDERR_TAIL_LINES)
+    drain = threading.Thread(target=stderr_tail.extend, args=(process.stderr,), name="decode-stderr", daemon=True)
+    drain.start()
+
+    samples = _read_pcm(process.stdout)
+    process.wait()
+    drain.join()
+    if feeder is not None:
+        feeder.join()
+
+    if feed_errors:
+        raise feed_errors[0]
+    if process.returncode != 0:
+        stderr = b"".join(stderr_tail).decode(errors="replace").strip()
+        raise RuntimeError(f"Failed to decode audio: {stderr}")
+    return samples
+
 def load_audio(audio_path: str) -> Tuple[np.ndarray, int]:
-    """Load audio file using pydub and convert to format Whisper expects"""
+    """Load audio file and convert to the 16 kHz mono float32 format Whisper expects"""
     try:
         print(f"Loading audio from: {audio_path}", file=sys.stderr)
-        # Use pydub to handle different audio formats
-        audio = AudioSegment.from_file(audio_path)
-        
-        # Convert to mono and set sample rate to 16kHz for Whisper
-        audio = audio.set_channels(1)
-        audio = audio.set_frame_rate(16000)
-        
-        # Convert to numpy array
-        samples = np.array(audio.get_array_of_samples(), dtype=np.float32)
-        samples = samples / (1 << (8 * audio.sample_width - 1))  # Normalize
-        
-        return samples, audio.frame_rate
+        start_time = time.time()
+        samples = decode_audio(audio_path)
+        decode_time = time.time() - start_time
+        record_stage("decode", start_time, len(samples) / SAMPLE_RATE)
+        print(
+            f"Decoded {len(samples) / SAMPLE_RATE:.1f}s of audio in {decode_time:.2f}s "
+            f"(peak RSS {peak_rss_mb():.1f} MB)",
+            file=sys.stderr
+        )
+        return samples, SAMPLE_RATE
     except Exception as e:
         print(f"Error loading audio: {e}", file=sys.stderr)
         raise
 
-def transcribe_with_whisper(audio_path: str) -> Dict[str, Any]:
-    """Transcribe audio using OpenAI's Whisper"""
+def emit_metrics_event(event: Dict[str, Any]) -> None:
+    """Write one metrics event to the TRANSCRIBE_METRICS_FD channel, if configured"""
+    global _metrics_channel
+    if not METRICS_FD:
+        return
+    with _metrics_channel_lock:
+        try:
+            if _metrics_channel is None:
+                _metrics_channel = os.fdopen(int(METRICS_FD), "w", buffering=1)
+            _metrics_channel.write(json.dumps(event) + "\n")
+        except (OSError, ValueError) as e:
+            print(f"Warning: could not write metrics event: {e}", file=sys.stderr)
+
+class Metrics:
+    """
+    Per-job collection of stage spans.
+
+    Each span records its offset from the start of the job, duration,
+    the seconds of audio it covered and the resulting real-time factor,
+    the process's peak RSS when it finished and the torch intra-op thread
+    count it ran with. Model loads also name the model.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.audio_seconds: Optional[float] = None
+        self.spans: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def span(self, stage: str, audio_seconds: Optional[float] = None, model: Optional[str] = None):
+        started = time.time()
+        try:
+            yield
+        finally:
+            self.record(stage, started, time.time() - started, audio_seconds, model)
+
+    def record(
+        self,
+        stage: str,
+        started: float,
+        duration: float,
+        audio_seconds: Optional[float] = None,
+        model: Optional[str] = None
+    ) -> Dict[str, Any]:
+        torch_module = sys.modules.get("torch")
+        span = {
+            "stage": stage,
+            "offset": round(started - self.started, 4),
+            "duration": round(duration, 4),
+            "audio_seconds": round(audio_seconds, 3) if audio_seconds is not None else None,
+            "rtf": round(duration / audio_seconds, 6) if audio_seconds else None,
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+            "torch_threads": torch_module.get_num_threads() if torch_module is not None else None
+        }
+        if model is not None:
+            span["model"] = model
+        with self._lock:
+            self.spans.append(span)
+        emit_metrics_event({"type": "span", **span})
+        return span
+
+    def to_dict(self) -> Dict[str, Any]:
+        total = time.time() - self.started
+        return {
+            "total_seconds": round(total, 4),
+            "audio_seconds": round(self.audio_seconds, 3) if self.audio_seconds is not None else None,
+            "rtf": round(total / self.audio_seconds, 6) if self.audio_seconds else None,
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+            "stages": list(self.spans)
+        }
+
+_current_metrics: contextvars.ContextVar = contextvars.ContextVar("transcribe_metrics", default=None)
+
+@contextlib.contextmanager
+def job_metrics():
+    """Make a Metrics collector current for the enclosed job, reusing an active one"""
+    metrics = _current_metrics.get()
+    if metrics is not None:
+        yield metrics
+        return
+    metrics = Metrics()
+    token = _current_metrics.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current_metrics.reset(token)
+
+def record_stage(stage: str, started: float, audio_seconds: Optional[float] = None) -> None:
+    """Record a stage that began at started and ends now on the current job's metrics, if any"""
+    metrics = _current_metrics.get()
+    if metrics is not None:
+        metrics.record(stage, started, time.time() - started, audio_seconds)
+
+@contextlib.contextmanager
+def stage_span(stage: str, audio_seconds: Optional[float] = None, model: Optional[str] = None):
+    """Record a span for stage on the current job's metrics, if any"""
+    metrics = _current_metrics.get()
+    if metrics is None:
+        yield
+        return
+    with metrics.span(stage, audio_seconds, model):
+        yield
+
+def metrics_to_prometheus(metrics: Dict[str, Any]) -> str:
+    """Render a metrics block in the Prometheus text exposition format"""
+    gauges = [
+        ("transcribe_stage_duration_seconds", "Wall-clock duration of a pipeline stage", "duration"),
+        ("transcribe_stage_audio_seconds", "Seconds of audio covered by a pipeline stage", "audio_seconds"),
+        ("transcribe_stage_real_time_factor", "Stage duration divided by audio duration", "rtf"),
+        ("transcribe_stage_peak_rss_megabytes", "Process peak RSS when the stage finished", "peak_rss_mb"),
+        ("transcribe_stage_torch_threads", "Torch intra-op threads used by the stage", "torch_threads"),
+    ]
+    lines = []
+    for name, help_text, field in gauges:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} gauge")
+        for span in metrics.get("stages", []):
+            if span.get(field) is not None:
+                labels = f'stage="{span["stage"]}"' + (f',model="{span["model"]}"' if "model" in span else "")
+                lines.append(f"{name}{{{labels}}} {span[field]}")
+    for name, help_text, field in [
+        ("transcribe_job_duration_seconds", "Wall-clock duration of the whole job", "total_seconds"),
+        ("transcribe_job_audio_seconds", "Duration of the transcribed audio", "audio_seconds"),
+        ("transcribe_job_real_time_factor", "Job duration divided by audio duration", "rtf"),
+        ("transcribe_job_peak_rss_megabytes", "Process peak RSS at the end of the job", "peak_rss_mb"),
+    ]:
+        if metrics.get(field) is not None:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {metrics[field]}")
+    return "\n".join(lines) + "\n"
+
+def diarization_enabled() -> bool:
+    """Whether speaker diarization can run in this environment"""
+    return bool(DIARIZATION_AVAILABLE and HF_TOKEN)
+
+def available_memory_mb() -> Optional[float]:
+    """Memory this process can still use: the cgroup limit's headroom or MemAvailable, whichever is lower"""
+    candidates = []
+    for limit_path, usage_path in [
+        ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory.current"),  # cgroup v2
+        ("/sys/fs/cgroup/memory/memory.limit_in_bytes", "/sys/fs/cgroup/memory/memory.usage_in_bytes")  # v1
+    ]:
+        try:
+            with open(limit_path) as f:
+                limit = f.read().strip()
+            with open(usage_path) as f:
+                usage = int(f.read())
+        except (OSError, ValueError):
+            continue
+        if limit != "max":
+            candidates.append((int(limit) - usage) / (1 << 20))
+        break
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    candidates.append(int(line.split()[1]) / 1024)
+                    break
+    except (OSError, ValueError):
+        pass
+    return min(candidates) if candidates else None
+
+def intra_op_threads(budget: int) -> int:
+    """torch intra-op threads for a stage with budget cores, capped at MAX_INTRA_OP_THREADS"""
+    return max(1, min(budget, MAX_INTRA_OP_THREADS) if MAX_INTRA_OP_THREADS else budget)
+
+def stage_thread_budgets(run_diarization: bool) -> Tuple[int, int]:
+    """
+    Split the CPU thread budget between the Whisper and diarization stages.
+
+    WHISPER_THREADS / DIARIZATION_THREADS override the split; otherwise
+    Whisper gets the larger half when both stages run side by side.
+    """
+    total = TRANSCRIBE_THREADS or available_cpus()
+    if not run_diarization:
+        return int(os.environ.get("WHISPER_THREADS", "0")) or total, 0
+    whisper_threads = int(os.environ.get("WHISPER_THREADS", "0")) or max(1, (total + 1) // 2)
+    diarization_threads = int(os.environ.get("DIARIZATION_THREADS", "0")) or max(1, total - whisper_threads)
+    return whisper_threads, diarization_threads
+
+def hash_file(file_path: str) -> str:
+    """SHA-256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def resolve_model(model: Optional[str] = None, quantize: Optional[str] = None) -> str:
+    """
+    Turn a requested model into the key used for loading and caching it.
+
+    model is a Whisper model name or a tier alias from MODEL_ALIASES, and
+    quantize defaults to WHISPER_QUANTIZE. Keys are the model name, with
+    ":int8" appended for the quantized variant. Functions further down the
+    pipeline take such a key, with None meaning the configured default.
+    """
+    name, _, precision = (model or WHISPER_MODEL).partition(":")
+    name = MODEL_ALIASES.get(name, name)
+    precision = precision or quantize or WHISPER_QUANTIZE
+    if precision not in QUANTIZE_MODES:
+        raise ValueError(f"Unknown quantization mode: {precision} (expected one of {', '.join(QUANTIZE_MODES)})")
+    return name if precision == "none" else f"{name}:{precision}"
+
+def transcription_settings(model: Optional[str] = None, vad: Optional[bool] = None) -> Dict[str, Any]:
+    """Settings that change the transcription result, used in cache keys"""
+    name, _, precision = (model or resolve_model()).partition(":")
+    return {
+        "model": name,
+        "quantize": precision or None,
+        "vad": VAD_ENABLED if vad is None else vad,
+        "language": "en",
+        "diarization": DIARIZATION_MODEL if diarization_enabled() else None
+    }
+
+class ResultCache:
+    """
+    On-disk cache of combined transcription results.
+
+    Entries are JSON files named by a hash of the audio content and the
+    transcription settings. Writes go through a temporary file and
+    os.replace, so concurrent workers never see partial entries. Reads
+    touch the entry's mtime, and the least recently used entries are
+    evicted once the directory exceeds max_bytes. Hit/miss totals across
+    processes are kept in stats.json under a file lock.
+    """
+
+    STATS_FILE = "stats.json"
+
+    def __init__(self, directory: str = CACHE_DIR, max_bytes: int = CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(content_hash: str, settings: Dict[str, Any]) -> str:
+        """Cache key for a piece of audio transcribed with the given settings"""
+        payload = content_hash + json.dumps(settings, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached result for key, or None"""
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                result = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            self.misses += 1
+            self._record("misses")
+            return None
+        self.hits += 1
+        self._record("hits")
+        return result
+
+    def put(self, key: str, result: Dict[str, Any]) -> None:
+        """Store a result atomically, then evict down to the byte budget"""
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix=".tmp-", suffix=".json")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(result, f)
+            os.replace(temp_path, self._path(key))
+        except Exception:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            raise
+        self.evict()
+
+    def _entries(self) -> List[Tuple[float, int, str]]:
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if not entry.name.endswith(".json") or entry.name.startswith(".") or entry.name == self.STATS_FILE:
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue  # evicted by another worker
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def evict(self) -> int:
+        """Remove least recently used entries until under max_bytes; returns bytes freed"""
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        freed = 0
+        for _, size, path in sorted(entries):
+            if total - freed <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+                freed += size
+            except FileNotFoundError:
+                pass
+        return freed
+
+    def _record(self, field: str) -> None:
+        """Increment a persistent counter in stats.json"""
+        try:
+            import fcntl
+        except ImportError:
+            return  # counters stay per-process where flock is unavailable
+        path = os.path.join(self.directory, self.STATS_FILE)
+        try:
+            with open(path, "a+", encoding="utf-8") as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                f.seek(0)
+                try:
+                    stats = json.loads(f.read() or "{}")
+                except ValueError:
+                    stats = {}
+                stats[field] = stats.get(field, 0) + 1
+                f.seek(0)
+                f.truncate()
+                f.write(json.dumps(stats))
+        except OSError as e:
+            print(f"Warning: could not update cache stats: {e}", file=sys.stderr)
+
+    def stats(self) -> Dict[str, Any]:
+        """Process-local and persistent hit/miss counters plus current usage"""
+        try:
+            with open(os.path.join(self.directory, self.STATS_FILE), "r", encoding="utf-8") as f:
+                totals = json.load(f)
+        except (OSError, ValueError):
+            totals = {}
+        entries = self._entries()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "total_hits": totals.get("hits", 0),
+            "total_misses": totals.get("misses", 0),
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes
+        }
+
+def get_result_cache() -> Optional[ResultCache]:
+    """Return the process-wide result cache, or None when caching is disabled"""
+    global _result_cache
+    if not CACHE_ENABLED:
+        return None
+    if _result_cache is None:
+        try:
+            _result_cache = ResultCache()
+        except OSError as e:
+            print(f"Warning: result cache disabled: {e}", file=sys.stderr)
+            return None
+    return _result_cache
+
+class JobCheckpoint:
+    """
+    Intermediate artifacts of one job, so that a retry after a crash or
+    timeout picks up where the last attempt stopped.
+
+    Everything lives in a directory named by the audio's content hash:
+
+    - audio.f32: the decoded samples as raw float32, memory-mapped by a
+      retry instead of decoding the file again
+    - <variant>/<model>/<start>-<end>.json: the segments of each finished
+      Whisper window (a chunk, or the whole recording when not chunked),
+      with window-relative timestamps
+    - <variant>/diarization.json: the diarization turns
+
+    variant is "vad" when the models ran on VAD-trimmed audio and "full"
+    otherwise, since window bounds and turn times refer to that audio.
+    Artifacts are written through a temporary file and os.replace, so a
+    crash leaves either a complete file or none, and each write touches
+    the job directory. collect_garbage removes directories that have not
+    been touched for CHECKPOINT_TTL_SECONDS. Failing to write a checkpoint
+    only costs the retry some work, so write errors are reported and
+    otherwise ignored.
+    """
+
+    AUDIO_FILE = "audio.f32"
+    DIARIZATION_FILE = "diarization.json"
+
+    def __init__(self, content_hash: str, directory: str = CHECKPOINT_DIR):
+        self.path = os.path.join(directory, content_hash)
+        self.variant = "full"
+
+    def _write(self, relative_path: str, write: Callable[[Any], None]) -> None:
+        path = os.path.join(self.path, relative_path)
+        temp_path = None
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+            with os.fdopen(fd, "wb") as f:
+                write(f)
+            os.replace(temp_path, path)
+            os.utime(self.path)
+        except OSError as e:
+            print(f"Warning: could not write checkpoint {relative_path}: {e}", file=sys.stderr)
+            if temp_path is not None:
+                try:
+                    os.unlink(temp_path)
+                except OSError:
+                    pass
+
+    def _write_json(self, relative_path: str, value: Any) -> None:
+        self._write(relative_path, lambda f: f.write(json.dumps(value).encode("utf-8")))
+
+    def _read_json(self, relative_path: str) -> Optional[Any]:
+        try:
+            with open(os.path.join(self.path, relative_path), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def load_audio(self) -> Optional[np.ndarray]:
+        """The checkpointed samples, memory-mapped copy-on-write, or None"""
+        try:
+            return np.memmap(os.path.join(self.path, self.AUDIO_FILE), dtype=np.float32, mode="c")
+        except (OSError, ValueError):
+            return None
+
+    def save_audio(self, audio: np.ndarray) -> None:
+        self._write(self.AUDIO_FILE, np.ascontiguousarray(audio, dtype=np.float32).tofile)
+
+    def _window_path(self, model: str, start: int, end: int) -> str:
+        return os.path.join(self.variant, model.replace(":", "-"), f"{start}-{end}.json")
+
+    def load_window(self, model: str, start: int, end: int) -> Optional[List[Dict[str, Any]]]:
+        """Segments of the window [start, end) transcribed with model, or None"""
+        return self._read_json(self._window_path(model, start, end))
+
+    def has_window(self, model: str, start: int, end: int) -> bool:
+        return os.path.exists(os.path.join(self.path, self._window_path(model, start, end)))
+
+    def save_window(self, model: str, start: int, end: int, segments: List[Dict[str, Any]]) -> None:
+        self._write_json(self._window_path(model, start, end), [
+            {"start": segment["start"], "end": segment["end"], "text": segment["text"]}
+            for segment in segments
+        ])
+
+    def load_diarization(self) -> Optional[SpeakerTurnIndex]:
+        saved = self._read_json(os.path.join(self.variant, self.DIARIZATION_FILE))
+        if saved is None or saved.get("model") != DIARIZATION_MODEL:
+            return None
+        return SpeakerTurnIndex(saved["starts"], saved["ends"], saved["label_ids"], saved["labels"])
+
+    def has_diarization(self) -> bool:
+        return self.load_diarization() is not None
+
+    def save_diarization(self, index: SpeakerTurnIndex) -> None:
+        self._write_json(os.path.join(self.variant, self.DIARIZATION_FILE), {
+            "model": DIARIZATION_MODEL,
+            "starts": index.starts.tolist(),
+            "ends": index.ends.tolist(),
+            "label_ids": index.label_ids.tolist(),
+            "labels": index.labels
+        })
+
+    def remove(self) -> None:
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    @staticmethod
+    def collect_garbage(directory: str = CHECKPOINT_DIR, ttl: float = CHECKPOINT_TTL_SECONDS) -> int:
+        """Remove job directories untouched for ttl seconds; returns how many were removed"""
+        cutoff = time.time() - ttl
+        removed = 0
+        try:
+            with os.scandir(directory) as it:
+                stale = [entry.path for entry in it if entry.is_dir() and entry.stat().st_mtime < cutoff]
+        except FileNotFoundError:
+            return 0
+        for path in stale:
+            shutil.rmtree(path, ignore_errors=True)
+            removed += 1
+        return removed
+
+def open_job_checkpoint(content_hash: Optional[str]) -> Optional[JobCheckpoint]:
+    """The checkpoint for a job, or None when checkpoints are disabled; stale ones are collected first"""
+    if not CHECKPOINT_ENABLED or content_hash is None:
+        return None
+    try:
+        removed = JobCheckpoint.collect_garbage()
+    except OSError as e:
+        print(f"Warning: could not collect stale checkpoints: {e}", file=sys.stderr)
+    else:
+        if removed:
+            print(f"Removed {removed} stale job checkpoints", file=sys.stderr)
+    return JobCheckpoint(content_hash)
+
+def _ladder_name(name: str) -> Optional[str]:
+    """The MODEL_LADDER entry a Whisper model name belongs to (large-v3 -> large)"""
+    for ladder_name in MODEL_LADDER:
+        if name.startswith(ladder_name):
+            return ladder_name
+    return None
+
+class RtfStore:
+    """
+    Real-time factors and model load times measured on this host.
+
+    Observations are folded into exponential moving averages in a JSON
+    file shared by every process, updated under a file lock like the
+    result cache counters. Keys are Whisper model keys, "<model>@chunked"
+    for the effective rate of a chunked run, and "diarization". Anything
+    not measured yet falls back to PRIOR_RTF and PRIOR_LOAD_SECONDS.
+    """
+
+    def __init__(self, path: str = RTF_STORE_PATH):
+        self.path = path
+
+    def _load(self) -> Dict[str, Any]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def observe(self, kind: str, key: str, value: float) -> None:
+        """Fold one measurement of kind ("rtf" or "load_seconds") into the average for key"""
+        try:
+            import fcntl
+        except ImportError:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "a+", encoding="utf-8") as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                f.seek(0)
+                try:
+                    data = json.loads(f.read() or "{}")
+                except ValueError:
+                    data = {}
+                entry = data.setdefault(kind, {}).get(key)
+                if entry is None:
+                    entry = {"value": value, "samples": 0}
+                else:
+                    entry["value"] += RTF_EMA_WEIGHT * (value - entry["value"])
+                entry["samples"] += 1
+                entry["value"] = round(entry["value"], 6)
+                data[kind][key] = entry
+                f.seek(0)
+                f.truncate()
+                f.write(json.dumps(data, sort_keys=True))
+        except OSError as e:
+            print(f"Warning: could not update RTF store: {e}", file=sys.stderr)
+
+    def measured(self, kind: str, key: str) -> Optional[float]:
+        entry = self._load().get(kind, {}).get(key)
+        return entry["value"] if entry else None
+
+    @staticmethod
+    def _prior(priors: Dict[str, float], key: str) -> float:
+        name, _, precision = key.partition(":")
+        prior = priors.get(_ladder_name(name) or name, priors["medium"])
+        return prior * INT8_RTF_FACTOR if precision == "int8" and priors is PRIOR_RTF else prior
+
+    def rtf(self, key: str) -> float:
+        """Processing seconds per audio second for a Whisper model key or diarization"""
+        measured = self.measured("rtf", key)
+        return measured if measured is not None else self._prior(PRIOR_RTF, key)
+
+    def load_seconds(self, key: str) -> float:
+        measured = self.measured("load_seconds", key)
+        return measured if measured is not None else self._prior(PRIOR_LOAD_SECONDS, key)
+
+def get_rtf_store() -> RtfStore:
+    """Return the process-wide RTF store"""
+    global _rtf_store
+    if _rtf_store is None:
+        _rtf_store = RtfStore()
+    return _rtf_store
+
+def quantize_whisper_model(model):
+    """
+    Dynamically quantize a CPU Whisper model's linear layers to int8.
+
+    Whisper's Linear is a subclass of nn.Linear, which quantize_dynamic
+    does not match, so those layers are turned back into plain nn.Linear
+    first (the subclass only adds dtype casting for fp16 inference). The
+    convolutions and token embedding stay in fp32.
+    """
+    for module in model.modules():
+        if isinstance(module, torch.nn.Linear):
+            module.__class__ = torch.nn.Linear
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+def load_quantized_whisper_model(model_name: str):
+    """
+    Load an int8 Whisper model from MODEL_CACHE_DIR, preparing and storing
+    it on first use. Only the model dimensions and the state_dict are
+    stored, and they are read with weights_only=True into a freshly
+    quantized skeleton, so the cache file can't run code. The file name
+    includes the whisper and torch versions because neither the model code
+    nor the packed weight format is guaranteed to be stable across releases.
+    """
+    versions = f"whisper{getattr(whisper, '__version__', 'unknown')}-torch{torch.__version__.split('+')[0]}"
+    path = os.path.join(MODEL_CACHE_DIR, f"whisper-{model_name}-int8-{versions}.pt")
+    if os.path.exists(path):
+        try:
+            saved = torch.load(path, map_location="cpu", weights_only=True)
+            model = quantize_whisper_model(whisper.Whisper(whisper.ModelDimensions(**saved["dims"])))
+            model.load_state_dict(saved["state_dict"])
+            if model_name in whisper._ALIGNMENT_HEADS:
+                # A non-persistent buffer, so it isn't part of the state_dict
+                model.set_alignment_heads(whisper._ALIGNMENT_HEADS[model_name])
+            return model
+        except Exception as e:
+            print(f"Warning: discarding unreadable quantized model {path}: {e}", file=sys.stderr)
+
+    print(f"Quantizing Whisper model {model_name} to int8", file=sys.stderr)
+    model = quantize_whisper_model(whisper.load_model(model_name, device="cpu"))
     try:
-        print(f"Loading Whisper model: {WHISPER_MODEL}", file=sys.stderr)
-        model = whisper.load_model(WHISPER_MODEL)
+        os.makedirs(MODEL_CACHE_DIR, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=MODEL_CACHE_DIR, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            torch.save({"dims": dataclasses.asdict(model.dims), "state_dict": model.state_dict()}, f)
+        os.replace(temp_path, path)
+    except OSError as e:
+        print(f"Warning: could not cache quantized model: {e}", file=sys.stderr)
+    return model
+
+def get_whisper_model(model: Optional[str] = None):
+    """Return the Whisper model for a resolved model key, loading it on first use"""
+    key = model or resolve_model()
+    loaded = _whisper_models.get(key)
+    if loaded is None:
+        print(f"Loading Whisper model: {key}", file=sys.stderr)
+        name, _, precision = key.partition(":")
+        started = time.time()
+        with stage_span("model_load", model=key):
+            if precision == "int8":
+                loaded = load_quantized_whisper_model(name)
+            else:
+                loaded = whisper.load_model(name)
+        get_rtf_store().observe("load_seconds", key, time.time() - started)
+        _whisper_models[key] = loaded
+    return loaded
+
+def get_diarization_pipeline():
+    """Return the pyannote diarization pipeline, loading it on first use"""
+    global _diarization_pipeline
+    if _diarization_pipeline is None:
+        print("Loading speaker diarization model...", file=sys.stderr)
+        started = time.time()
+        with stage_span("model_load", model="diarization"):
+            from pyannote.audio import Pipeline
+            # Use the token for authenticating with Hugging Face Hub
+            _diarization_pipeline = Pipeline.from_pretrained(
+                DIARIZATION_MODEL,
+                use_auth_token=HF_TOKEN
+            )
+        get_rtf_store().observe("load_seconds", "diarization", time.time() - started)
+    return _diarization_pipeline
+
+def transcribe_with_whisper(audio: np.ndarray, model: Optional[str] = None) -> Dict[str, Any]:
+    """Transcribe decoded 16 kHz mono audio using OpenAI's Whisper"""
+    try:
+        key = model or resolve_model()
+        model = get_whisper_model(key)
         
         print("Transcribing with Whisper...", file=sys.stderr)
+        started = time.time()
         # Use word_timestamps=False as per user's script
-        result = model.transcribe(audio_path, language="en", word_timestamps=False)
+        result = model.transcribe(audio, language="en", word_timestamps=False)
+        # Chunk workers run with a slice of the threads; the chunked run as
+        # a whole is measured by ChunkedTranscriber instead
+        if not _in_chunk_worker and len(audio) >= 10 * SAMPLE_RATE:
+            get_rtf_store().observe("rtf", key, (time.time() - started) * SAMPLE_RATE / len(audio))
         
         print("Transcription complete", file=sys.stderr)
         return result
@@ -101,8 +1127,8 @@ def transcribe_with_whisper(audio_path: str) -> Dict[str, Any]:
         print(f"Error in Whisper transcription: {e}", file=sys.stderr)
         raise
 
-def perform_diarization(audio_path: str) -> Any:
-    """Perform speaker diarization using pyannote.audio"""
+def perform_diarization(audio: np.ndarray) -> Any:
+    """Perform speaker diarization on decoded 16 kHz mono audio using pyannote.audio"""
     if not DIARIZATION_AVAILABLE:
         print("Speaker diarization is not available. Missing pyannote.audio.", file=sys.stderr)
         return None
@@ -112,15 +1138,16 @@ def perform_diarization(audio_path: str) -> Any:
         return None
     
     try:
-        print("Loading speaker diarization model...", file=sys.stderr)
-        # Use the token for authenticating with Hugging Face Hub
-        pipeline = Pipeline.from_pretrained(
-            DIARIZATION_MODEL,
-            use_auth_token=HF_TOKEN
-        )
+        pipeline = get_diarization_pipeline()
         
         print("Performing speaker diarization...", file=sys.stderr)
-        diarization = pipeline(audio_path)
+        started = time.time()
+        # A (channel, time) tensor sharing memory with the decoded buffer,
+        # so pyannote does not decode the file a second time
+        waveform = torch.from_numpy(audio).unsqueeze(0)
+        diarization = pipeline({"waveform": waveform, "sample_rate": SAMPLE_RATE})
+        if len(audio) >= 10 * SAMPLE_RATE:
+            get_rtf_store().observe("rtf", "diarization", (time.time() - started) * SAMPLE_RATE / len(audio))
         print("Diarization complete", file=sys.stderr)
         return diarization
     except Exception as e:
@@ -129,8 +1156,98 @@ def perform_diarization(audio_path: str) -> Any:
         # Return None as fallback
         return None
 
+class SpeakerTurnIndex:
+    """
+    Sorted, array-backed index of diarization turns.
+
+    Turns are stored as parallel NumPy arrays ordered by start time, with a
+    running maximum of the end times so the first turn that could overlap
+    a segment is found with a binary search. Each speaker also gets a
+    cumulative coverage curve (seconds covered by that speaker's turns up
+    to a given time, counting overlapping turns once), so a segment's
+    overlap with every speaker is two lookups per speaker, however many
+    turns the segment spans.
+    """
+
+    def __init__(self, starts, ends, label_ids, labels: List[str]):
+        order = np.argsort(starts, kind="stable")
+        self.starts = np.asarray(starts, dtype=np.float64)[order]
+        self.ends = np.asarray(ends, dtype=np.float64)[order]
+        self.label_ids = np.asarray(label_ids, dtype=np.int64)[order]
+        self.labels = list(labels)
+        # Monotonic, so it can be binary-searched for the first turn that
+        # could still be running at a given time
+        self.max_ends = np.maximum.accumulate(self.ends) if len(self.ends) else self.ends
+        self.coverage = [self._coverage(self.label_ids == label) for label in range(len(self.labels))]
+
+    def _coverage(self, mask) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Breakpoints of one speaker's coverage curve, whether any of its
+        turns runs after each one and the seconds covered up to each one
+        """
+        points = np.concatenate([self.starts[mask], self.ends[mask]])
+        deltas = np.concatenate([np.ones(mask.sum()), -np.ones(mask.sum())])
+        order = np.argsort(points, kind="stable")
+        points, deltas = points[order], deltas[order]
+        # Overlapping turns of one speaker count once: coverage is the time
+        # in their union
+        running = np.minimum(np.cumsum(deltas), 1.0)
+        covered = np.concatenate([[0.0], np.cumsum(running[:-1] * np.diff(points))])
+        return points, running, covered
+
+    def _covered(self, label: int, times) -> np.ndarray:
+        """Seconds covered by label's turns before each of times"""
+        points, running, covered = self.coverage[label]
+        if len(points) == 0:
+            return np.zeros(len(times))
+        k = np.searchsorted(points, times, side="right") - 1
+        before = k < 0
+        k = np.clip(k, 0, None)
+        return np.where(before, 0.0, covered[k] + running[k] * (times - points[k]))
+
+    @classmethod
+    def from_diarization(cls, diarization) -> "SpeakerTurnIndex":
+        """Build the index from a pyannote Annotation (or anything with itertracks)"""
+        starts, ends, label_ids = [], [], []
+        label_lookup: Dict[str, int] = {}
+        for turn, _, speaker in diarization.itertracks(yield_label=True):
+            starts.append(turn.start)
+            ends.append(turn.end)
+            label_ids.append(label_lookup.setdefault(speaker, len(label_lookup)))
+        return cls(starts, ends, label_ids, list(label_lookup))
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def assign(self, segment_starts, segment_ends) -> List[Optional[str]]:
+        """Return the speaker with the most overlap for each segment, or None"""
+        segment_starts = np.asarray(segment_starts, dtype=np.float64)
+        segment_ends = np.asarray(segment_ends, dtype=np.float64)
+        if len(self) == 0:
+            return [None] * len(segment_starts)
+
+        # Everything before lo ends before the segment starts and everything
+        # from hi starts after it ends. The turn at lo is the first one still
+        # running at the segment's start, so when lo < hi it is the earliest
+        # turn that overlaps or touches the segment.
+        lo = np.searchsorted(self.max_ends, segment_starts, side="left")
+        hi = np.searchsorted(self.starts, segment_ends, side="right")
+        touching = (lo < hi) & (segment_ends >= segment_starts)
+
+        totals = np.stack([
+            self._covered(label, segment_ends) - self._covered(label, segment_starts)
+            for label in range(len(self.labels))
+        ], axis=1)
+        best = totals.argmax(axis=1)
+        overlapping = totals.max(axis=1) > 0
+        # Zero-length segments, or turns that only touch the segment, fall
+        # back to the earliest touching turn
+        first = self.label_ids[np.minimum(lo, len(self) - 1)]
+        chosen = np.where(overlapping, best, first)
+        return [self.labels[label] if hit else None for label, hit in zip(chosen.tolist(), touching.tolist())]
+
 def combine_transcription_with_diarization(whisper_result: Dict[str, Any], diarization) -> Dict[str, Any]:
-    """Combine Whisper transcription with speaker diarization using the user's approach"""
+    """Combine Whisper transcription with speaker diarization, assigning each segment its dominant speaker"""
     try:
         # If no diarization result, create simple output with a single speaker
         if diarization is None:
@@ -150,51 +1267,40 @@ def combine_transcription_with_diarization(whisper_result: Dict[str, Any], diari
                 "speakers": ["SPEAKER_0"]
             }
         
-        # Combine Whisper and diarization using user's approach
+        if not isinstance(diarization, SpeakerTurnIndex):
+            diarization = SpeakerTurnIndex.from_diarization(diarization)
+        
+        segments = whisper_result["segments"]
+        assigned = diarization.assign(
+            [segment["start"] for segment in segments],
+            [segment["end"] for segment in segments]
+        )
+        
         final_output = []
-        unique_speakers = set()
+        unique_speakers: Dict[str, None] = {}  # insertion-ordered set
         
-        for segment in whisper_result["segments"]:
-            segment_start = segment["start"]
-            segment_end = segment["end"]
-            text = segment["text"].strip()
-            
-            # Find which speaker is speaking during this segment
-            speaker_found = False
-            for turn, _, speaker in diarization.itertracks(yield_label=True):
-                # If overlap between whisper segment and diarized turn
-                if turn.end < segment_start or turn.start > segment_end:
-                    continue
-                
-                unique_speakers.add(speaker)
-                final_output.append({
-                    "speaker": speaker,
-                    "text": text,
-                    "start": segment_start,
-                    "end": segment_end
-                })
-                speaker_found = True
-                break  # Take only first matching speaker
-            
+        for segment, speaker in zip(segments, assigned):
             # If no speaker found for this segment, assign unknown speaker
-            if not speaker_found:
-                final_output.append({
-                    "speaker": "SPEAKER_UNKNOWN",
-                    "text": text,
-                    "start": segment_start,
-                    "end": segment_end
-                })
-                unique_speakers.add("SPEAKER_UNKNOWN")
+            if speaker is None:
+                speaker = "SPEAKER_UNKNOWN"
+            unique_speakers[speaker] = None
+            final_output.append({
+                "speaker": speaker,
+                "text": segment["text"].strip(),
+                "start": segment["start"],
+                "end": segment["end"]
+            })
         
         # Prepare the full transcript
         full_text = whisper_result.get("text", "")
         
         # Print nicely for debugging
-        print("Final transcript with speakers:", file=sys.stderr)
-        for entry in final_output:
-            formatted_start = format_timestamp(entry["start"])
-            formatted_end = format_timestamp(entry["end"])
-            print(f"{entry['speaker']} [{formatted_start} - {formatted_end}]: {entry['text']}", file=sys.stderr)
+        if DEBUG_OUTPUT:
+            print("Final transcript with speakers:", file=sys.stderr)
+            for entry in final_output:
+                formatted_start = format_timestamp(entry["start"])
+                formatted_end = format_timestamp(entry["end"])
+                print(f"{entry['speaker']} [{formatted_start} - {formatted_end}]: {entry['text']}", file=sys.stderr)
         
         return {
             "text": full_text,
@@ -210,75 +1316,2174 @@ def combine_transcription_with_diarization(whisper_result: Dict[str, Any], diari
             "error": f"Failed to combine transcription with diarization: {str(e)}"
         }
 
-def process_url(url: str) -> Dict[str, Any]:
-    """Process audio from a URL"""
-    try:
-        # Create a temporary file
-        with tempfile.NamedTemporaryFile(suffix=".mp3", delete=False) as temp_file:
-            temp_path = temp_file.name
-        
-        # Download the file
-        print(f"Downloading audio from URL: {url}", file=sys.stderr)
-        command = ["curl", "-L", "--max-time", "30", "-o", temp_path, url]
-        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        stdout, stderr = process.communicate()
-        
-        if process.returncode != 0:
-            raise Exception(f"Failed to download URL: {stderr.decode()}")
-        
-        # Process the downloaded file
-        result = process_audio_file(temp_path)
-        
-        # Clean up
-        try:
-            os.unlink(temp_path)
-        except:
-            pass
-        
+def to_columnar(result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Result with its segments stored column by column: "segments" holds
+    start, end, speaker and text arrays, and each speaker entry is an index
+    into "speakers". Every other field is kept as it is.
+    """
+    segments = result.get("segments")
+    if segments is None:
+        return {**result, "format": "columnar"}
+    speakers = list(result.get("speakers") or [])
+    speaker_ids = {speaker: index for index, speaker in enumerate(speakers)}
+    speaker_column = []
+    for segment in segments:
+        speaker = segment.get("speaker")
+        if speaker not in speaker_ids:
+            speaker_ids[speaker] = len(speakers)
+            speakers.append(speaker)
+        speaker_column.append(speaker_ids[speaker])
+    return {
+        **result,
+        "format": "columnar",
+        "speakers": speakers,
+        "segments": {
+            "start": [segment["start"] for segment in segments],
+            "end": [segment["end"] for segment in segments],
+            "speaker": speaker_column,
+            "text": [segment["text"] for segment in segments]
+        }
+    }
+
+def from_columnar(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Undo to_columnar"""
+    if result.get("format") != "columnar":
         return result
+    expanded = {key: value for key, value in result.items() if key != "format"}
+    columns = result.get("segments")
+    if columns is not None:
+        speakers = result["speakers"]
+        expanded["segments"] = [
+            {"speaker": speakers[speaker], "text": text, "start": start, "end": end}
+            for start, end, speaker, text in zip(columns["start"], columns["end"], columns["speaker"], columns["text"])
+        ]
+    return expanded
+
+def encode_result(message: Dict[str, Any], result_format: str = "json") -> bytes:
+    """
+    Serialize a result (or a message wrapping one under "result") in one
+    of RESULT_FORMATS. msgpack needs the optional msgpack package.
+    """
+    if result_format == "json":
+        return json.dumps(message).encode("utf-8")
+    if "result" in message:
+        message = {**message, "result": to_columnar(message["result"])}
+    else:
+        message = to_columnar(message)
+    if result_format == "columnar":
+        return json.dumps(message, separators=(",", ":")).encode("utf-8")
+    if result_format == "msgpack":
+        import msgpack
+        return msgpack.packb(message, use_bin_type=True)
+    raise ValueError(f"Unknown result format '{result_format}'; expected one of {', '.join(RESULT_FORMATS)}")
+
+SegmentCallback = Callable[[Dict[str, Any]], None]
+
+def frame_energies(audio: np.ndarray, frame_length: int) -> np.ndarray:
+    """Mean squared amplitude of consecutive non-overlapping frames"""
+    n_frames = len(audio) // frame_length
+    frames = audio[:n_frames * frame_length].reshape(n_frames, frame_length)
+    # einsum avoids materialising a squared copy of the whole recording
+    return np.einsum("ij,ij->i", frames, frames) / frame_length
+
+def plan_chunks(
+    audio: np.ndarray,
+    chunk_seconds: float = CHUNK_SECONDS,
+    overlap_seconds: float = CHUNK_OVERLAP_SECONDS,
+    sample_rate: int = SAMPLE_RATE
+) -> List[Dict[str, int]]:
+    """
+    Split audio into overlapping windows that are cut at quiet points.
+
+    Each boundary is moved to the lowest-energy 20 ms frame within
+    CHUNK_SEARCH_SECONDS of its nominal position. A chunk owns the "core"
+    between its two boundaries and is decoded with overlap_seconds of
+    extra context on each side, so words at the seam are heard in full by
+    at least one chunk. All positions are sample offsets.
+    """
+    total = len(audio)
+    chunk_length = int(chunk_seconds * sample_rate)
+    if total <= chunk_length:
+        return [{"start": 0, "end": total, "core_start": 0, "core_end": total}]
+
+    frame_length = sample_rate // 50
+    energies = frame_energies(audio, frame_length)
+    search = int(CHUNK_SEARCH_SECONDS * sample_rate) // frame_length
+
+    boundaries = [0]
+    nominal = chunk_length
+    while nominal < total - chunk_length // 4:
+        centre = nominal // frame_length
+        lo = max(centre - search, boundaries[-1] // frame_length + 1)
+        hi = min(centre + search, len(energies))
+        if hi > lo:
+            boundary = (lo + int(np.argmin(energies[lo:hi]))) * frame_length
+        else:
+            boundary = nominal
+        boundaries.append(boundary)
+        nominal = boundary + chunk_length
+    boundaries.append(total)
+
+    overlap = int(overlap_seconds * sample_rate)
+    return [
+        {
+            "start": max(0, core_start - overlap),
+            "end": min(total, core_end + overlap),
+            "core_start": core_start,
+            "core_end": core_end
+        }
+        for core_start, core_end in zip(boundaries[:-1], boundaries[1:])
+    ]
+
+def frame_zero_crossings(audio: np.ndarray, frame_length: int) -> np.ndarray:
+    """Fraction of sign changes between neighbouring samples in each frame"""
+    n_frames = len(audio) // frame_length
+    signs = np.signbit(audio[:n_frames * frame_length]).reshape(n_frames, frame_length)
+    return np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / frame_length
+
+class SpeechTimeline:
+    """
+    Speech regions of a recording and the mapping between the original
+    timeline and the trimmed one that only contains those regions.
+
+    Regions are sample offsets into the original audio. The trimmed audio
+    is the regions laid end to end, so a trimmed time falls in region k
+    when it is past the k-th cumulative offset.
+    """
+
+    def __init__(self, starts, ends, total_samples: int, sample_rate: int = SAMPLE_RATE):
+        self.starts = np.asarray(starts, dtype=np.int64)
+        self.ends = np.asarray(ends, dtype=np.int64)
+        self.total_samples = total_samples
+        self.sample_rate = sample_rate
+        lengths = self.ends - self.starts
+        self.offsets = np.concatenate(([0], np.cumsum(lengths)[:-1])) if len(lengths) else lengths
+        self.speech_samples = int(lengths.sum())
+
+    @property
+    def trimmed_ratio(self) -> float:
+        return 1 - self.speech_samples / self.total_samples if self.total_samples else 0.0
+
+    def trim(self, audio: np.ndarray) -> np.ndarray:
+        """The speech regions of audio, concatenated"""
+        return np.concatenate([audio[start:end] for start, end in zip(self.starts, self.ends)])
+
+    def to_original(self, times, end: bool = False) -> np.ndarray:
+        """
+        Map trimmed-timeline seconds back to the original timeline. A time
+        on the seam between two regions maps to the start of the later
+        region, or with end=True to the end of the earlier one.
+        """
+        samples = np.asarray(times, dtype=np.float64) * self.sample_rate
+        region = np.searchsorted(self.offsets, samples, side="left" if end else "right") - 1
+        region = np.clip(region, 0, len(self.starts) - 1)
+        within = np.clip(samples - self.offsets[region], 0, self.ends[region] - self.starts[region])
+        return (self.starts[region] + within) / self.sample_rate
+
+    def remap_segment(self, segment: Dict[str, Any]) -> Dict[str, Any]:
+        """A copy of a Whisper segment with original-timeline timestamps"""
+        start, end = self.to_original([segment["start"]]), self.to_original([segment["end"]], end=True)
+        return {**segment, "start": round(float(start[0]), 3), "end": round(float(end[0]), 3)}
+
+    def remap_whisper(self, whisper_result: Dict[str, Any]) -> Dict[str, Any]:
+        """Whisper result with every segment moved back to the original timeline"""
+        segments = whisper_result.get("segments", [])
+        starts = self.to_original([segment["start"] for segment in segments])
+        ends = self.to_original([segment["end"] for segment in segments], end=True)
+        remapped = [
+            {**segment, "start": round(float(start), 3), "end": round(float(end), 3)}
+            for segment, start, end in zip(segments, starts, ends)
+        ]
+        return {**whisper_result, "segments": remapped}
+
+    def remap_turns(self, index: SpeakerTurnIndex) -> SpeakerTurnIndex:
+        """Diarization turns moved back to the original timeline"""
+        return SpeakerTurnIndex(
+            self.to_original(index.starts),
+            self.to_original(index.ends, end=True),
+            index.label_ids,
+            index.labels
+        )
+
+    def summary(self) -> Dict[str, Any]:
+        """The "vad" block reported with the result"""
+        original_seconds = self.total_samples / self.sample_rate
+        speech_seconds = self.speech_samples / self.sample_rate
+        return {
+            "regions": len(self.starts),
+            "original_seconds": round(original_seconds, 3),
+            "speech_seconds": round(speech_seconds, 3),
+            "trimmed_seconds": round(original_seconds - speech_seconds, 3),
+            "trimmed_ratio": round(self.trimmed_ratio, 4),
+            # Both models' work grows with the length of their input
+            "estimated_speedup": round(original_seconds / speech_seconds, 3) if speech_seconds else None
+        }
+
+def detect_speech(audio: np.ndarray, sample_rate: int = SAMPLE_RATE) -> SpeechTimeline:
+    """
+    Find speech regions with a frame energy and zero-crossing-rate VAD.
+
+    The threshold adapts to the recording: a frame is speech when its
+    energy is VAD_MARGIN_DB above the noise floor (the 10th percentile of
+    frame energies), or half that with a high zero-crossing rate. Regions
+    shorter than VAD_MIN_SPEECH_SECONDS are dropped, the rest are padded
+    by VAD_PADDING_SECONDS, and gaps shorter than VAD_MIN_SILENCE_SECONDS
+    are kept as part of the speech around them.
+    """
+    frame_length = int(VAD_FRAME_SECONDS * sample_rate)
+    n_frames = len(audio) // frame_length
+    if n_frames == 0:
+        return SpeechTimeline([0], [len(audio)], len(audio), sample_rate)
+
+    energy_db = 10 * np.log10(frame_energies(audio, frame_length) + 1e-10)
+    zcr = frame_zero_crossings(audio, frame_length)
+    floor = np.percentile(energy_db, 10)
+    speech = (energy_db > floor + VAD_MARGIN_DB) | ((energy_db > floor + VAD_MARGIN_DB / 2) & (zcr > VAD_ZCR_THRESHOLD))
+
+    # Run boundaries of the speech mask, as frame indices
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], speech.astype(np.int8), [0]))))
+    starts, ends = edges[0::2], edges[1::2]
+    keep = ends - starts >= max(1, int(VAD_MIN_SPEECH_SECONDS / VAD_FRAME_SECONDS))
+    starts, ends = starts[keep], ends[keep]
+    if len(starts) == 0:
+        # Nothing clearly above the floor; let the models see everything
+        return SpeechTimeline([0], [len(audio)], len(audio), sample_rate)
+
+    pad = int(VAD_PADDING_SECONDS / VAD_FRAME_SECONDS)
+    starts = np.maximum(starts - pad, 0)
+    ends = np.minimum(ends + pad, n_frames)
+    # Merge regions separated by less than the minimum silence
+    separate = starts[1:] - ends[:-1] >= int(VAD_MIN_SILENCE_SECONDS / VAD_FRAME_SECONDS)
+    starts = starts[np.concatenate(([True], separate))]
+    ends = ends[np.concatenate((separate, [True]))]
+
+    sample_ends = ends * frame_length
+    # The partial frame at the end belongs to the last region if it reaches it
+    sample_ends[sample_ends == n_frames * frame_length] = len(audio)
+    return SpeechTimeline(starts * frame_length, sample_ends, len(audio), sample_rate)
+
+def _normalize_text(text: str) -> str:
+    return " ".join(text.lower().split())
+
+def merge_chunk_segments(
+    chunk: Dict[str, int],
+    segments: List[Dict[str, Any]],
+    previous: Optional[Dict[str, Any]],
+    sample_rate: int = SAMPLE_RATE
+) -> List[Dict[str, Any]]:
+    """
+    Shift a chunk's segments to global time and keep the ones it owns.
+
+    A segment belongs to the chunk whose core contains its midpoint, which
+    drops the copies transcribed in the overlap by both neighbours. A
+    segment that still repeats the previous kept segment's text across the
+    seam is dropped as well.
+    """
+    offset = chunk["start"] / sample_rate
+    core_start = chunk["core_start"] / sample_rate
+    core_end = chunk["core_end"] / sample_rate
+
+    kept = []
+    for segment in segments:
+        start = segment["start"] + offset
+        end = segment["end"] + offset
+        midpoint = (start + end) / 2
+        if midpoint < core_start or midpoint >= core_end:
+            continue
+        text = segment["text"]
+        if (
+            previous is not None
+            and start < previous["end"]
+            and _normalize_text(text) == _normalize_text(previous["text"])
+        ):
+            continue
+        previous = {"start": start, "end": end, "text": text}
+        kept.append(previous)
+    return kept
+
+# Set in each chunk worker process by _init_chunk_worker and _attach_chunk_audio
+_in_chunk_worker = False
+_chunk_memory: Optional[shared_memory.SharedMemory] = None
+_chunk_audio: Optional[np.ndarray] = None
+# Model loads not yet reported to the parent: model -> (started, seconds)
+_chunk_loads: Dict[str, Tuple[float, float]] = {}
+
+def _load_chunk_model(model: str) -> None:
+    """Load model in a chunk worker, noting the load for the next chunk result"""
+    if model in _whisper_models:
+        return
+    # The pool outlives the job, so a worker keeps only the model in use
+    _whisper_models.clear()
+    started = time.time()
+    get_whisper_model(model)
+    _chunk_loads[model] = (started, time.time() - started)
+
+def _init_chunk_worker(model: str, threads: int) -> None:
+    """Process pool initializer: load the model once per worker"""
+    global _in_chunk_worker
+    # Loads are reported with the chunk results, so the parent records
+    # them once rather than every worker emitting its own span
+    _current_metrics.set(None)
+    _in_chunk_worker = True
+    torch.set_num_threads(intra_op_threads(threads))
+    _load_chunk_model(model)
+
+def _attach_chunk_audio(memory_name: str, samples: int) -> np.ndarray:
+    """The job's shared audio, attached on the worker's first chunk of each job"""
+    global _chunk_memory, _chunk_audio
+    if _chunk_memory is None or _chunk_memory.name != memory_name:
+        _chunk_audio = None
+        if _chunk_memory is not None:
+            _chunk_memory.close()
+        _chunk_memory = shared_memory.SharedMemory(name=memory_name)
+        _chunk_audio = np.ndarray((samples,), dtype=np.float32, buffer=_chunk_memory.buf)
+    return _chunk_audio
+
+def _window_segments(audio: np.ndarray, model: str) -> List[Dict[str, Any]]:
+    """Whisper segments for one chunk window; timestamps are window-relative"""
+    result = transcribe_with_whisper(audio, model)
+    return [
+        {"start": segment["start"], "end": segment["end"], "text": segment["text"]}
+        for segment in result.get("segments", [])
+    ]
+
+def _transcribe_chunk(
+    memory_name: str, samples: int, start: int, end: int, model: str
+) -> Tuple[List[Dict[str, Any]], Dict[str, Tuple[float, float]]]:
+    """
+    Transcribe one window of a job's shared audio in a chunk worker. Also
+    returns the model loads since the last call.
+    """
+    _load_chunk_model(model)
+    segments = _window_segments(_attach_chunk_audio(memory_name, samples)[start:end], model)
+    loads = dict(_chunk_loads)
+    _chunk_loads.clear()
+    return segments, loads
+
+def _transcribe_window(audio: np.ndarray, model: str) -> Tuple[List[Dict[str, Any]], Dict[str, Tuple[float, float]]]:
+    """In-process counterpart of _transcribe_chunk; loads are recorded as they happen"""
+    return _window_segments(audio, model), {}
+
+class _DeferredFuture(Future):
+    """A Future whose call runs in the thread that first asks for its result"""
+
+    def __init__(self, fn: Callable[..., Any], *args: Any):
+        super().__init__()
+        self._call = (fn, args)
+
+    def result(self, timeout: Optional[float] = None) -> Any:
+        if not self.running() and not self.done() and self.set_running_or_notify_cancel():
+            fn, args = self._call
+            try:
+                self.set_result(fn(*args))
+            except Exception as e:
+                self.set_exception(e)
+        return super().result(timeout)
+
+# The chunk worker pool is kept for the life of the process (warm, pooled
+# and batch runs transcribe many recordings): ((workers, threads per
+# worker), executor), and the model its workers last loaded
+_chunk_pool: Optional[Tuple[Tuple[int, int], ProcessPoolExecutor]] = None
+_chunk_pool_model: Optional[str] = None
+
+def get_chunk_pool(workers: int, threads_per_worker: int, model: str) -> ProcessPoolExecutor:
+    """The process's chunk worker pool, started again if it has a different shape"""
+    global _chunk_pool, _chunk_pool_model
+    if _chunk_pool is not None:
+        shape, executor = _chunk_pool
+        if shape == (workers, threads_per_worker):
+            return executor
+        drop_chunk_pool()
+    start_method = os.environ.get("TRANSCRIBE_MP_START_METHOD", "forkserver")
+    if start_method not in multiprocessing.get_all_start_methods():
+        start_method = "spawn"
+    if start_method == "fork" and threading.active_count() > 1:
+        # e.g. batch mode's prefetch thread, which may be inside ffmpeg
+        # or holding its queue's lock
+        print("Warning: not forking chunk workers while other threads run; using forkserver", file=sys.stderr)
+        start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    context = multiprocessing.get_context(start_method)
+    if start_method == "forkserver":
+        # The server imports whisper (and with it torch) once, so the
+        # workers forked from it don't each import them again
+        context.set_forkserver_preload(["whisper"])
+    executor = ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=context,
+        initializer=_init_chunk_worker,
+        initargs=(model, threads_per_worker)
+    )
+    _chunk_pool = ((workers, threads_per_worker), executor)
+    _chunk_pool_model = model
+    return executor
+
+def drop_chunk_pool() -> None:
+    """Stop the chunk worker pool, e.g. after one of its workers died"""
+    global _chunk_pool, _chunk_pool_model
+    if _chunk_pool is not None:
+        _chunk_pool[1].shutdown(wait=True, cancel_futures=True)
+    _chunk_pool = None
+    _chunk_pool_model = None
+
+def chunk_worker_count(n_chunks: int, threads: int) -> int:
+    """Number of chunk worker processes, each holding its own copy of the model"""
+    if CHUNK_WORKERS:
+        return max(1, min(CHUNK_WORKERS, n_chunks))
+    # Keep at least two intra-op threads per worker; more processes than
+    # that mostly multiply model memory without adding throughput
+    by_threads = threads // 2
+    if PROFILE_CHUNK_WORKERS:
+        return max(1, min(PROFILE_CHUNK_WORKERS, n_chunks, by_threads))
+    return max(1, min(n_chunks, by_threads, 4))
+
+def model_ladder(model: str) -> List[str]:
+    """model followed by the cheaper MODEL_LADDER tiers, keeping its quantization"""
+    name, _, precision = model.partition(":")
+    ladder_name = _ladder_name(name)
+    if ladder_name is None:
+        return [model]
+    suffix = f":{precision}" if precision else ""
+    return [model] + [f"{cheaper}{suffix}" for cheaper in MODEL_LADDER[MODEL_LADDER.index(ladder_name) + 1:]]
+
+class DeadlinePlan:
+    """
+    The model tier chosen for a job with a time budget, why it was chosen,
+    and any switches to cheaper tiers made while the job ran.
+    """
+
+    def __init__(self, requested: str, model: str, diarization: bool, budget: float,
+                 estimated_seconds: float, reason: str, streamed: bool = False):
+        self.started = time.time()
+        self.requested = requested
+        self.initial_model = model
+        self.model = model
+        self.diarization = diarization
+        self.diarization_skipped = diarization_enabled() and not diarization
+        self.budget = budget
+        self.estimated_seconds = estimated_seconds
+        self.reason = reason
+        # Streamed chunks each start the budget over, like an inactivity timeout
+        self.streamed = streamed
+        self.downgrades: List[Dict[str, Any]] = []
+
+    @property
+    def whisper_deadline(self) -> float:
+        """Time by which transcription should be done to leave room for the rest"""
+        return self.started + self.budget * DEADLINE_SAFETY
+
+    @property
+    def degraded(self) -> bool:
+        """Whether the job ran with less than was asked for"""
+        return self.model != self.requested or self.diarization_skipped
+
+    def downgrade(self, model: str, reason: str, at_chunk: int) -> None:
+        self.downgrades.append({"from": self.model, "to": model, "at_chunk": at_chunk, "reason": reason})
+        self.model = model
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "requested_model": self.requested,
+            "model": self.initial_model,
+            "final_model": self.model,
+            "diarization": self.diarization,
+            "budget_seconds": round(self.budget, 3),
+            "estimated_seconds": round(self.estimated_seconds, 3),
+            "elapsed_seconds": round(time.time() - self.started, 3),
+            "reason": self.reason,
+            "downgrades": self.downgrades
+        }
+
+def estimate_job_seconds(model: str, audio_seconds: float, diarize: bool, workers: int = 1,
+                         transcribed_seconds: float = 0.0) -> float:
+    """
+    Expected wall-clock seconds for Whisper (and diarization, which runs
+    alongside it) on audio_seconds of audio, of which transcribed_seconds
+    need no Whisper run, including model loads that have not happened yet.
+    """
+    store = get_rtf_store()
+    if workers > 1:
+        rtf = store.measured("rtf", f"{model}@chunked")
+        if rtf is None:
+            rtf = store.rtf(model) / (workers * CHUNK_PARALLEL_EFFICIENCY)
+        # Chunk workers hold their own copies of the model
+        loaded = _chunk_pool is not None and _chunk_pool[0][0] == workers and _chunk_pool_model == model
+    else:
+        rtf = store.rtf(model)
+        loaded = model in _whisper_models
+    seconds = rtf * max(0.0, audio_seconds - transcribed_seconds) + (0.0 if loaded else store.load_seconds(model))
+    if diarize:
+        diarization_seconds = store.rtf("diarization") * audio_seconds
+        if _diarization_pipeline is None:
+            diarization_seconds += store.load_seconds("diarization")
+        seconds = max(seconds, diarization_seconds)
+    return seconds
+
+def plan_for_deadline(budget: float, audio_seconds: float, model: str, chunked: bool, streamed: bool = False,
+                      transcribed_seconds: float = 0.0, diarized: bool = False) -> DeadlinePlan:
+    """
+    Pick the most accurate tier that should finish within budget seconds:
+    the requested model or a cheaper one from MODEL_LADDER, with diarization
+    if possible. Falls back to the cheapest tier without diarization when
+    nothing fits.
+
+    When a chunked run streams its segments, the budget is the longest the
+    run may go without output, as with the service's inactivity timeout.
+    transcribed_seconds of the audio and, when diarized, the diarization
+    were restored from a checkpoint and cost nothing.
+    """
+    diarize = diarization_enabled()
+    workers = 1
+    whisper_seconds = max(0.0, audio_seconds - transcribed_seconds)
+    if chunked:
+        whisper_threads, _ = stage_thread_budgets(diarize)
+        workers = chunk_worker_count(max(1, round(whisper_seconds / CHUNK_SECONDS)), whisper_threads)
+    streamed = streamed and chunked
+    target = budget * DEADLINE_SAFETY
+    ladder = model_ladder(model)
+
+    def estimate_for(candidate: str, with_diarization: bool) -> float:
+        diarize_here = with_diarization and not diarized
+        if not streamed:
+            return estimate_job_seconds(candidate, audio_seconds, diarize_here, workers, transcribed_seconds)
+        # Output starts once the first wave of chunks is done, and the
+        # result follows the last chunk once diarization has caught up
+        first_wave = estimate_job_seconds(candidate, min(whisper_seconds, CHUNK_SECONDS * workers), False, workers)
+        whisper = estimate_job_seconds(candidate, audio_seconds, False, workers, transcribed_seconds)
+        both = estimate_job_seconds(candidate, audio_seconds, diarize_here, workers, transcribed_seconds)
+        return max(first_wave, both - whisper)
+
+    requested_estimate = estimate_for(model, diarize)
+    for with_diarization in ([True, False] if diarize else [False]):
+        for candidate in ladder:
+            estimate = estimate_for(candidate, with_diarization)
+            if estimate <= target:
+                break
+        else:
+            continue
+        if candidate == model and with_diarization == diarize:
+            reason = f"{model} is estimated at {estimate:.1f}s, within the {budget:.1f}s budget"
+        else:
+            skipped = "" if with_diarization == diarize else " without diarization"
+            reason = (
+                f"{model} is estimated at {requested_estimate:.1f}s, over the {budget:.1f}s budget; "
+                f"{candidate}{skipped} is estimated at {estimate:.1f}s"
+            )
+        return DeadlinePlan(model, candidate, with_diarization, budget, estimate, reason, streamed)
+
+    cheapest = ladder[-1]
+    estimate = estimate_for(cheapest, False)
+    reason = (
+        f"no tier fits the {budget:.1f}s budget ({model} is estimated at {requested_estimate:.1f}s); "
+        f"using {cheapest} without diarization, estimated at {estimate:.1f}s"
+    )
+    return DeadlinePlan(model, cheapest, False, budget, estimate, reason, streamed)
+
+class ChunkedTranscriber:
+    """
+    Transcribe a long recording as overlapping chunks, in the chunk worker
+    pool or, with a single worker, in this process with its loaded model.
+    """
+
+    SUBMIT_AHEAD = 2
+
+    def __init__(self, audio: np.ndarray, threads: int, model: Optional[str] = None,
+                 plan: Optional[DeadlinePlan] = None, checkpoint: Optional[JobCheckpoint] = None):
+        self.model = model or resolve_model()
+        self.plan = plan
+        self.checkpoint = checkpoint
+        self.audio = audio
+        self.audio_seconds = len(audio) / SAMPLE_RATE
+        self.chunks = plan_chunks(audio)
+        self.futures: List[Any] = [None] * len(self.chunks)
+        self.chunk_models = [self.model] * len(self.chunks)
+        self.restored = set()
+        for j in range(len(self.chunks)):
+            self._restore(j)
+        pending = len(self.chunks) - len(self.restored)
+        if self.restored:
+            print(f"Resuming: {len(self.restored)}/{len(self.chunks)} chunks already transcribed", file=sys.stderr)
+        self.workers = chunk_worker_count(max(1, pending), threads)
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self.memory: Optional[shared_memory.SharedMemory] = None
+        self.loads: Dict[str, Tuple[float, float]] = {}
+        if self.workers == 1:
+            print(f"Transcribing {len(self.chunks)} chunks in this process", file=sys.stderr)
+        else:
+            threads_per_worker = max(1, threads // self.workers)
+            # Workers attach to the audio by name when they pick up a chunk
+            self.memory = shared_memory.SharedMemory(create=True, size=max(1, audio.nbytes))
+            np.ndarray(audio.shape, dtype=np.float32, buffer=self.memory.buf)[:] = audio
+            print(
+                f"Transcribing {len(self.chunks)} chunks with {self.workers} workers "
+                f"({threads_per_worker} threads each)",
+                file=sys.stderr
+            )
+            self.executor = get_chunk_pool(self.workers, threads_per_worker, self.model)
+        first_pending = next((j for j, future in enumerate(self.futures) if future is None), len(self.chunks))
+        self._submit_through(len(self.chunks) if plan is None else first_pending + self.SUBMIT_AHEAD * self.workers)
+        self.started = time.time()
+        # Pace is measured from here: (time, samples done, chunks done)
+        self.pace_from = (self.started, 0, 0)
+
+    def _restore(self, j: int) -> bool:
+        """Take chunk j from the checkpoint if it was finished with the current model"""
+        if self.checkpoint is None:
+            return False
+        chunk = self.chunks[j]
+        segments = self.checkpoint.load_window(self.model, chunk["start"], chunk["end"])
+        if segments is None:
+            return False
+        self.futures[j] = Future()
+        self.futures[j].set_result((segments, {}))
+        self.chunk_models[j] = self.model
+        self.restored.add(j)
+        return True
+
+    def _submit_through(self, count: int) -> None:
+        """Make sure the first count chunks have been submitted, with the current model"""
+        for j in range(min(count, len(self.chunks))):
+            if self.futures[j] is None and not self._restore(j):
+                self.futures[j] = self._submit(self.chunks[j])
+                self.chunk_models[j] = self.model
+
+    def _submit(self, chunk: Dict[str, int]) -> Future:
+        global _chunk_pool_model
+        if self.executor is None:
+            # Runs when collect() reaches it, so queued chunks can still switch model
+            return _DeferredFuture(_transcribe_window, self.audio[chunk["start"]:chunk["end"]], self.model)
+        _chunk_pool_model = self.model
+        return self.executor.submit(
+            _transcribe_chunk, self.memory.name, len(self.audio), chunk["start"], chunk["end"], self.model
+        )
+
+    def _keep_pace(self, index: int) -> None:
+        """After chunk index, switch the remaining chunks to a cheaper model if the run is behind"""
+        since, samples_before, chunks_before = self.pace_from
+        # Wait for a full wave of workers so the pace reflects steady state
+        if index + 1 - chunks_before < self.workers or index + 1 >= len(self.chunks):
+            return
+        now = time.time()
+        done = self.chunks[index]["core_end"]
+        if self.plan.streamed:
+            # Each chunk's segments start the budget over, so what has to
+            # fit is the time a worker spends on one chunk
+            projected = (now - since) / (index + 1 - chunks_before) * self.workers
+            available = self.plan.budget * DEADLINE_SAFETY
+            behind = f"projected {projected:.1f}s per chunk with {self.model}, {available:.1f}s allowed"
+        else:
+            remaining = self.chunks[-1]["core_end"] - done
+            projected = (now - since) / (done - samples_before) * remaining
+            available = self.plan.whisper_deadline - now
+            behind = (
+                f"projected {projected:.1f}s for the remaining audio with {self.model}, "
+                f"{max(0.0, available):.1f}s left"
+            )
+        if projected <= available:
+            return
+
+        cheaper = model_ladder(self.model)[1:]
+        if not cheaper:
+            return
+        store = get_rtf_store()
+        choice = cheaper[-1]
+        for candidate in cheaper:
+            if projected * store.rtf(candidate) / store.rtf(self.model) + store.load_seconds(candidate) <= available:
+                choice = candidate
+                break
+
+        # Queued chunks that no worker has picked up yet switch too; the
+        # ones already running finish with the current model
+        switched = [j for j in range(index + 1, len(self.chunks)) if self.futures[j] is None or self.futures[j].cancel()]
+        if not switched:
+            return
+        print(f"Behind schedule: {behind}; switching {len(switched)} chunks to {choice}", file=sys.stderr)
+        self.plan.downgrade(choice, behind, index + 1)
+        self.model = choice
+        for j in switched:
+            self.futures[j] = None
+        self.pace_from = (now, done, index + 1)
+
+    def _note_loads(self, loads: Dict[str, Tuple[float, float]]) -> None:
+        """Keep the first start and the longest duration of each model's loads"""
+        for model, (started, seconds) in loads.items():
+            if model in self.loads:
+                first, longest = self.loads[model]
+                started, seconds = min(first, started), max(longest, seconds)
+            self.loads[model] = (started, seconds)
+
+    def collect(self, on_segment: Optional[SegmentCallback] = None) -> Dict[str, Any]:
+        """Wait for the chunks in order and return a Whisper-style merged result"""
+        segments: List[Dict[str, Any]] = []
+        try:
+            for index, chunk in enumerate(self.chunks):
+                self._submit_through(index + 1 + self.SUBMIT_AHEAD * self.workers)
+                chunk_segments, loads = self.futures[index].result()
+                self._note_loads(loads)
+                if index in self.restored:
+                    # Restored chunks take no time, so the pace is measured
+                    # from the next chunk that is actually transcribed
+                    self.pace_from = (time.time(), chunk["core_end"], index + 1)
+                elif self.checkpoint is not None:
+                    self.checkpoint.save_window(self.chunk_models[index], chunk["start"], chunk["end"], chunk_segments)
+                kept = merge_chunk_segments(chunk, chunk_segments, segments[-1] if segments else None)
+                for segment in kept:
+                    segment["id"] = len(segments)
+                    segments.append(segment)
+                    if on_segment is not None:
+                        on_segment(segment)
+                print(f"Chunk {index + 1}/{len(self.chunks)} complete", file=sys.stderr)
+                if self.plan is not None:
+                    self._keep_pace(index)
+        except BrokenProcessPool:
+            drop_chunk_pool()
+            raise
+        finally:
+            # The pool stays up for the next job; this one's queued chunks
+            # are dropped and the running ones finish before the audio goes
+            submitted = [future for future in self.futures if future is not None]
+            for future in submitted:
+                future.cancel()
+            if self.executor is not None:
+                wait_for_futures(submitted)
+            if self.memory is not None:
+                self.memory.close()
+                self.memory.unlink()
+        metrics = _current_metrics.get()
+        if metrics is not None:
+            for model, (started, seconds) in self.loads.items():
+                metrics.record("model_load", started, seconds, model=model)
+        # In-process chunks already measured the model's own real-time factor
+        measured = self.executor is not None and not self.restored and self.audio_seconds >= 10
+        if measured and (self.plan is None or not self.plan.downgrades):
+            get_rtf_store().observe("rtf", f"{self.model}@chunked", (time.time() - self.started) / self.audio_seconds)
+        return {
+            "text": "".join(segment["text"] for segment in segments),
+            "segments": segments,
+            "language": "en"
+        }
+
+def _run_stage(name: str, func, audio: np.ndarray, threads: int):
+    """Run one pipeline stage with its own torch intra-op thread budget, recording it as a span"""
+    # With torch's OpenMP backend the thread count applies to the calling
+    # thread, so each stage keeps to its own budget
+    torch.set_num_threads(intra_op_threads(threads))
+    with stage_span(name, len(audio) / SAMPLE_RATE):
+        return func(audio)
+
+def _transcribe_checkpointed(audio: np.ndarray, model: str, checkpoint: JobCheckpoint) -> Dict[str, Any]:
+    """Whole-recording Whisper run saved to (or taken from) the checkpoint as a single window"""
+    segments = checkpoint.load_window(model, 0, len(audio))
+    if segments is not None:
+        print("Resuming: transcription already done", file=sys.stderr)
+        return {
+            "text": "".join(segment["text"] for segment in segments),
+            "segments": [{"id": i, **segment} for i, segment in enumerate(segments)],
+            "language": "en"
+        }
+    result = transcribe_with_whisper(audio, model)
+    checkpoint.save_window(model, 0, len(audio), result.get("segments", []))
+    return result
+
+def run_transcription_stages(
+    audio: np.ndarray,
+    chunked: Optional[bool] = None,
+    on_segment: Optional[SegmentCallback] = None,
+    model: Optional[str] = None,
+    plan: Optional[DeadlinePlan] = None,
+    checkpoint: Optional[JobCheckpoint] = None
+) -> Tuple[Dict[str, Any], Any]:
+    """
+    Run Whisper and diarization on the same decoded audio, side by side.
+
+    The stages are independent until they are combined, so wall-clock time
+    is roughly the slower of the two rather than their sum. A diarization
+    failure still yields None (single-speaker fallback); a Whisper failure
+    is raised as before. The "transcribe" and "diarize" spans show how far
+    the two overlapped.
+
+    chunked=None chunks recordings longer than CHUNK_THRESHOLD_SECONDS;
+    on_segment receives each chunked segment as soon as it is final.
+    model selects the Whisper model (see resolve_model). A DeadlinePlan
+    can turn diarization off and lets chunked runs switch to cheaper
+    models when they fall behind. With a JobCheckpoint, finished Whisper
+    windows and the diarization turns are saved as they complete, and
+    whatever a previous attempt saved is used instead of running again.
+    """
+    diarize = plan is None or plan.diarization
+    run_diarization = diarize and diarization_enabled()
+    whisper_threads, diarization_threads = stage_thread_budgets(run_diarization)
+
+    if chunked is None:
+        chunked = len(audio) / SAMPLE_RATE > CHUNK_THRESHOLD_SECONDS
+    if chunked:
+        # Submit the first chunks before the diarization thread exists
+        transcriber = ChunkedTranscriber(audio, whisper_threads, model, plan, checkpoint)
+        whisper_stage = lambda _audio: transcriber.collect(on_segment)
+    elif checkpoint is None:
+        whisper_stage = lambda audio: transcribe_with_whisper(audio, model)
+    else:
+        whisper_stage = lambda audio: _transcribe_checkpointed(audio, model or resolve_model(), checkpoint)
+
+    def diarization_stage(audio: np.ndarray) -> Any:
+        if checkpoint is None:
+            return perform_diarization(audio)
+        turns = checkpoint.load_diarization()
+        if turns is not None:
+            print("Resuming: diarization already done", file=sys.stderr)
+            return turns
+        diarization = perform_diarization(audio)
+        if diarization is not None:
+            turns = SpeakerTurnIndex.from_diarization(diarization)
+            checkpoint.save_diarization(turns)
+        return turns
+
+    if not run_diarization:
+        whisper_result = _run_stage("transcribe", whisper_stage, audio, whisper_threads)
+        diarization_result = diarization_stage(audio) if diarize else None
+    else:
+        executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="stage")
+        try:
+            # copy_context() carries the job's metrics over to the stage thread
+            diarization_future = executor.submit(
+                contextvars.copy_context().run,
+                _run_stage, "diarize", diarization_stage, audio, diarization_threads
+            )
+            whisper_result = _run_stage("transcribe", whisper_stage, audio, whisper_threads)
+            diarization_result = diarization_future.result()
+        finally:
+            executor.shutdown(wait=False)
+
+    return whisper_result, diarization_result
+
+class HTTPConnectionPool:
+    """
+    Keeps idle HTTP(S) connections per host so that several downloads in
+    one process (warm worker, batch runs) reuse them instead of opening a
+    new connection each time.
+    """
+
+    def __init__(self, max_idle_per_host: int = 4):
+        self.max_idle_per_host = max_idle_per_host
+        self._idle: Dict[Tuple[str, str, Optional[int]], List[http.client.HTTPConnection]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _connect(key, timeout: float) -> http.client.HTTPConnection:
+        scheme, host, port = key
+        connection_class = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        return connection_class(host, port, timeout=timeout)
+
+    def _acquire(self, key, timeout: float) -> Tuple[http.client.HTTPConnection, bool]:
+        """Return (connection, reused)"""
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                connection = idle.pop()
+                connection.timeout = timeout
+                if connection.sock is not None:
+                    connection.sock.settimeout(timeout)
+                return connection, True
+        return self._connect(key, timeout), False
+
+    def release(
+        self,
+        key,
+        connection: http.client.HTTPConnection,
+        response: http.client.HTTPResponse,
+        reuse: bool = True
+    ) -> None:
+        """
+        Return a connection to the pool once its response is done with. A
+        response with more than RELEASE_DRAIN_BYTES left unread (such as an
+        oversized download that was aborted), or reuse=False, closes the
+        connection instead.
+        """
+        if reuse and not response.isclosed():
+            # read1() can reach the end of a body without marking the
+            # response closed; a read past the end does so
+            response.read(RELEASE_DRAIN_BYTES)
+            reuse = response.isclosed()
+        if not reuse or response.will_close:
+            response.close()
+            connection.close()
+            return
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle_per_host:
+                idle.append(connection)
+                return
+        connection.close()
+
+    def open(self, url: str, timeout: Optional[float] = None):
+        """
+        GET url, following redirects. Returns (response, release) where
+        release() must be called once the body has been consumed, or
+        release(False) when it is abandoned.
+        """
+        timeout = timeout or DOWNLOAD_IDLE_TIMEOUT
+        for _ in range(MAX_REDIRECTS + 1):
+            parts = urlsplit(url)
+            if parts.scheme not in ("http", "https"):
+                raise ValueError(f"Unsupported URL scheme: {parts.scheme or '(none)'}")
+            key = (parts.scheme, parts.hostname, parts.port)
+            target = parts.path or "/"
+            if parts.query:
+                target += "?" + parts.query
+
+            connection, reused = self._acquire(key, timeout)
+            headers = {"User-Agent": "WebAudioTranscriber"}
+            try:
+                connection.request("GET", target, headers=headers)
+                response = connection.getresponse()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                connection.close()
+                if not reused:
+                    raise
+                # The server closed the pooled connection while it was idle
+                connection = self._connect(key, timeout)
+                connection.request("GET", target, headers=headers)
+                response = connection.getresponse()
+
+            if response.status in (301, 302, 303, 307, 308) and response.getheader("Location"):
+                url = urljoin(url, response.getheader("Location"))
+                self.release(key, connection, response)
+                continue
+            if response.status != 200:
+                self.release(key, connection, response)
+                raise RuntimeError(f"Failed to download URL: HTTP {response.status} {response.reason}")
+            return response, lambda reuse=True: self.release(key, connection, response, reuse)
+        raise RuntimeError(f"Failed to download URL: more than {MAX_REDIRECTS} redirects")
+
+_http_pool = HTTPConnectionPool()
+
+def sniff_audio_format(head: bytes) -> Optional[str]:
+    """Guess the ffmpeg demuxer for a stream from its first bytes"""
+    if head[:4] == b"RIFF" and head[8:12] == b"WAVE":
+        return "wav"
+    if head[:4] == b"OggS":
+        return "ogg"
+    if head[:4] == b"fLaC":
+        return "flac"
+    if head[:4] == b"FORM" and head[8:12] in (b"AIFF", b"AIFC"):
+        return "aiff"
+    if head[:4] == b"\x1a\x45\xdf\xa3":
+        return "matroska"  # also covers webm
+    if head[4:8] == b"ftyp":
+        return "mp4"
+    if head[:3] == b"ID3":
+        return "mp3"
+    if len(head) >= 2 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0:
+        # Frame sync: layer bits 00 mean AAC in ADTS framing, anything else MPEG audio
+        return "aac" if head[1] & 0x06 == 0 else "mp3"
+    return None
+
+# MP4/MOV files often keep their index at the end, which ffmpeg cannot
+# reach through a pipe; these are spooled to a file first
+SEEKABLE_FORMATS = {"mp4"}
+
+def stream_url_audio(url: str) -> Tuple[np.ndarray, str]:
+    """
+    Download url and decode it as it arrives.
+
+    Bytes are piped into ffmpeg while they are received and hashed on the
+    way through. Downloads larger than MAX_DOWNLOAD_BYTES are aborted, as
+    is any read that stalls for DOWNLOAD_IDLE_TIMEOUT seconds. Returns the
+    decoded audio and the SHA-256 of the downloaded bytes.
+    """
+    started = time.time()
+    response, release = _http_pool.open(url)
+    digest = hashlib.sha256()
+    received = 0
+
+    def read_block() -> bytes:
+        nonlocal received
+        block = response.read1(1 << 16)
+        received += len(block)
+        if received > MAX_DOWNLOAD_BYTES:
+            raise RuntimeError(f"Download exceeds the {MAX_DOWNLOAD_BYTES} byte limit")
+        digest.update(block)
+        return block
+
+    try:
+        # Collect enough of the body to recognise the container
+        head = b""
+        while len(head) < 64:
+            block = read_block()
+            if not block:
+                break
+            head += block
+        input_format = sniff_audio_format(head)
+        print(f"Streaming audio from URL: {url} (format: {input_format or 'unknown'})", file=sys.stderr)
+
+        if input_format in SEEKABLE_FORMATS:
+            with tempfile.NamedTemporaryFile(suffix=f".{input_format}", delete=False) as temp_file:
+                temp_path = temp_file.name
+                temp_file.write(head)
+                for block in iter(read_block, b""):
+                    temp_file.write(block)
+            try:
+                decode_started = time.time()
+                audio = decode_audio(temp_path)
+                record_stage("decode", decode_started, len(audio) / SAMPLE_RATE)
+            finally:
+                os.unlink(temp_path)
+        else:
+            def feed(stdin):
+                stdin.write(head)
+                for block in iter(read_block, b""):
+                    stdin.write(block)
+            audio = decode_audio("pipe:0", input_format=input_format, feed=feed)
+    except BaseException:
+        release(False)
+        raise
+    release()
+    # For piped formats this span includes the decode that overlapped the download
+    record_stage("download", started, len(audio) / SAMPLE_RATE)
+
+    print(f"Downloaded {received} bytes, decoded {len(audio) / SAMPLE_RATE:.1f}s of audio", file=sys.stderr)
+    return audio, digest.hexdigest()
+
+def process_url(url: str, **options) -> Dict[str, Any]:
+    """Process audio from a URL; options are passed on to process_decoded_audio"""
+    try:
+        with job_metrics() as metrics:
+            start_time = time.time()
+            audio, content_hash = stream_url_audio(url)
+            
+            cached, cache_key = lookup_cached_result(content_hash, options.get("model"), options.get("vad"))
+            if cached is not None:
+                print(f"Cache hit, returned in {time.time() - start_time:.3f} seconds", file=sys.stderr)
+                metrics.audio_seconds = len(audio) / SAMPLE_RATE
+                return {**cached, "metrics": metrics.to_dict()}
+            
+            # A retry has to download the audio again to know its hash, so
+            # only the model work is checkpointed
+            checkpoint = open_job_checkpoint(content_hash) if len(audio) / SAMPLE_RATE >= CHECKPOINT_MIN_SECONDS else None
+            return process_decoded_audio(audio, cache_key, start_time=start_time, checkpoint=checkpoint, **options)
     except Exception as e:
         print(f"Error processing URL: {e}", file=sys.stderr)
         return {"text": "", "error": str(e)}
 
-def process_audio_file(file_path: str) -> Dict[str, Any]:
-    """Process an audio file for transcription and diarization"""
-    try:
-        start_time = time.time()
+def lookup_cached_result(
+    content_hash: str,
+    model: Optional[str] = None,
+    vad: Optional[bool] = None
+) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """Return (cached result or None, cache key or None if caching is disabled)"""
+    cache = get_result_cache()
+    if cache is None:
+        return None, None
+    cache_key = cache.key(content_hash, transcription_settings(model, vad))
+    return cache.get(cache_key), cache_key
+
+def process_decoded_audio(
+    audio: np.ndarray,
+    cache_key: Optional[str] = None,
+    chunked: Optional[bool] = None,
+    on_segment: Optional[SegmentCallback] = None,
+    start_time: Optional[float] = None,
+    model: Optional[str] = None,
+    vad: Optional[bool] = None,
+    deadline: Optional[float] = None,
+    checkpoint: Optional[JobCheckpoint] = None
+) -> Dict[str, Any]:
+    """
+    Transcribe and diarize decoded audio, storing the result under cache_key.
+
+    With a deadline (seconds from start_time), the model tier and whether
+    to diarize are chosen to fit the remaining time, and chunked runs drop
+    to a cheaper tier if they fall behind. When chunked segments are
+    streamed to on_segment, each one starts the deadline over.
+    The result's "tier" block records the choice and the reasons; results
+    that used less than the requested tier are not cached.
+
+    With vad (default: VAD_ENABLED), long silences are cut out before
+    either model runs and all timestamps are mapped back to the original
+    timeline before the two results are combined; the result then has a
+    "vad" block with the trimmed share of the recording.
+
+    With a checkpoint (see JobCheckpoint), the work done so far is saved as
+    it finishes and work saved by a previous attempt is reused. The
+    checkpoint is removed once the job yields a complete result.
+
+    The returned result carries a "metrics" block with the job's stage
+    spans; the cached copy does not.
+    """
+    start_time = start_time or time.time()
+    audio_seconds = len(audio) / SAMPLE_RATE
+    use_vad = VAD_ENABLED if vad is None else vad
+    
+    with job_metrics() as metrics:
+        metrics.audio_seconds = audio_seconds
+        
+        timeline = None
+        if use_vad:
+            with stage_span("vad", audio_seconds):
+                timeline = detect_speech(audio)
+            vad_summary = timeline.summary()
+            print(
+                f"VAD: {vad_summary['speech_seconds']:.1f}s of speech in {vad_summary['regions']} regions, "
+                f"{vad_summary['trimmed_ratio']:.0%} trimmed",
+                file=sys.stderr
+            )
+            if timeline.trimmed_ratio < VAD_MIN_TRIM_RATIO:
+                timeline = None
+        
+        model_audio = audio
+        stage_on_segment = on_segment
+        if checkpoint is not None:
+            checkpoint.variant = "full" if timeline is None else "vad"
+        if timeline is not None:
+            model_audio = timeline.trim(audio)
+            if on_segment is not None:
+                stage_on_segment = lambda segment: on_segment(timeline.remap_segment(segment))
+        
+        plan = None
+        if deadline:
+            model_seconds = len(model_audio) / SAMPLE_RATE
+            if chunked is None:
+                chunked = model_seconds > CHUNK_THRESHOLD_SECONDS
+            requested = model or resolve_model()
+            transcribed_seconds, diarized = 0.0, False
+            if checkpoint is not None:
+                windows = plan_chunks(model_audio) if chunked else [
+                    {"start": 0, "end": len(model_audio), "core_start": 0, "core_end": len(model_audio)}
+                ]
+                transcribed_seconds = sum(
+                    window["core_end"] - window["core_start"] for window in windows
+                    if checkpoint.has_window(requested, window["start"], window["end"])
+                ) / SAMPLE_RATE
+                diarized = checkpoint.has_diarization()
+            plan = plan_for_deadline(
+                deadline - (time.time() - start_time), model_seconds, requested, chunked,
+                streamed=on_segment is not None, transcribed_seconds=transcribed_seconds, diarized=diarized
+            )
+            model = plan.model
+            print(f"Deadline plan: {plan.reason}", file=sys.stderr)
         
-        # Transcribe with Whisper
-        whisper_result = transcribe_with_whisper(file_path)
+        # Transcribe with Whisper and perform diarization concurrently
+        whisper_result, diarization_result = run_transcription_stages(
+            model_audio, chunked, stage_on_segment, model, plan, checkpoint
+        )
         
-        # Perform diarization
-        diarization_result = perform_diarization(file_path)
+        if timeline is not None:
+            whisper_result = timeline.remap_whisper(whisper_result)
+            if diarization_result is not None:
+                if not isinstance(diarization_result, SpeakerTurnIndex):
+                    diarization_result = SpeakerTurnIndex.from_diarization(diarization_result)
+                diarization_result = timeline.remap_turns(diarization_result)
         
         # Combine results
-        result = combine_transcription_with_diarization(whisper_result, diarization_result)
+        with stage_span("merge", audio_seconds):
+            result = combine_transcription_with_diarization(whisper_result, diarization_result)
+        if use_vad:
+            result["vad"] = {"applied": timeline is not None, **vad_summary}
+        if plan is not None:
+            result["tier"] = plan.to_dict()
+        
+        # Don't cache errors, a single-speaker fallback caused by a
+        # diarization failure that may not happen next time, or a result
+        # that a tight deadline made worse than requested
+        diarization_failed = diarization_enabled() and diarization_result is None and (plan is None or plan.diarization)
+        degraded = plan is not None and plan.degraded
+        complete = "error" not in result and not diarization_failed and not degraded
+        cache = get_result_cache()
+        if cache is not None and cache_key is not None and complete:
+            try:
+                cache.put(cache_key, result)
+            except OSError as e:
+                print(f"Warning: could not write result cache: {e}", file=sys.stderr)
+        # An incomplete result keeps its checkpoint, so a retry only redoes
+        # the part that was missing
+        if checkpoint is not None and complete:
+            checkpoint.remove()
         
         # Calculate processing time
         processing_time = time.time() - start_time
-        print(f"Total processing time: {processing_time:.2f} seconds", file=sys.stderr)
+        stage_summary = ", ".join(f"{span['stage']} {span['duration']:.2f}s" for span in metrics.spans)
+        print(f"Total processing time: {processing_time:.2f} seconds ({stage_summary})", file=sys.stderr)
         
-        return result
+        result["metrics"] = metrics.to_dict()
+    return result
+
+def process_audio_file(
+    file_path: str,
+    chunked: Optional[bool] = None,
+    on_segment: Optional[SegmentCallback] = None,
+    model: Optional[str] = None,
+    vad: Optional[bool] = None,
+    deadline: Optional[float] = None
+) -> Dict[str, Any]:
+    """Process an audio file for transcription and diarization"""
+    try:
+        with job_metrics() as metrics:
+            start_time = time.time()
+            
+            content_hash = hash_file(file_path) if CACHE_ENABLED or CHECKPOINT_ENABLED else None
+            # Return a previous result for the same audio and settings without
+            # decoding or loading any model
+            cached, cache_key = lookup_cached_result(content_hash, model, vad) if CACHE_ENABLED else (None, None)
+            if cached is not None:
+                print(f"Cache hit, returned in {time.time() - start_time:.3f} seconds", file=sys.stderr)
+                return {**cached, "metrics": metrics.to_dict()}
+            
+            # A previous attempt at a long recording left its decoded samples
+            # behind; otherwise decode once and share the samples between
+            # both models
+            checkpoint = open_job_checkpoint(content_hash)
+            audio = checkpoint.load_audio() if checkpoint is not None else None
+            if audio is not None:
+                print(f"Resuming: reusing {len(audio) / SAMPLE_RATE:.1f}s of checkpointed audio", file=sys.stderr)
+            else:
+                audio, _ = load_audio(file_path)
+                if checkpoint is not None and len(audio) / SAMPLE_RATE >= CHECKPOINT_MIN_SECONDS:
+                    checkpoint.save_audio(audio)
+                else:
+                    checkpoint = None
+            
+            return process_decoded_audio(audio, cache_key, chunked, on_segment, start_time, model, vad, deadline, checkpoint)
     except Exception as e:
         print(f"Error processing audio file: {e}", file=sys.stderr)
         return {"text": "", "error": str(e)}
 
+def preload_models(model: Optional[str] = None) -> None:
+    """Load the Whisper model and, when possible, the diarization pipeline"""
+    get_whisper_model(model)
+    if diarization_enabled():
+        try:
+            get_diarization_pipeline()
+        except Exception as e:
+            # Jobs will fall back to a single speaker, as in one-shot mode
+            print(f"Error loading diarization pipeline: {e}", file=sys.stderr)
+
+def handle_job(
+    job: Dict[str, Any],
+    on_segment: Optional[SegmentCallback] = None,
+    default_model: Optional[str] = None
+) -> Dict[str, Any]:
+    """Run one transcription job described by a serve-mode request"""
+    try:
+        if job.get("model") or job.get("quantize"):
+            model = resolve_model(job.get("model"), job.get("quantize"))
+        else:
+            model = default_model
+    except ValueError as e:
+        return {"text": "", "error": str(e)}
+    options = {
+        "chunked": job.get("chunked"),
+        "on_segment": on_segment,
+        "model": model,
+        "vad": job.get("vad"),
+        "deadline": job.get("deadline")
+    }
+    if job.get("url"):
+        return process_url(job["url"], **options)
+    if job.get("path"):
+        return process_audio_file(job["path"], **options)
+    return {"text": "", "error": "Job must specify 'path' or 'url'"}
+
+def _pool_worker_main(request_fd: int, reply_fd: int, threads: int, model: Optional[str]) -> None:
+    """
+    Job loop of a forked pool worker: read one request per line, run it,
+    and write reply lines tagged S (segment) or R (final reply)
+    """
+    global TRANSCRIBE_THREADS, CHUNK_WORKERS
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    TRANSCRIBE_THREADS = threads
+    # Long jobs are chunked in-process: pool_worker_count budgets one copy
+    # of the models per worker, and chunk workers would each load another
+    CHUNK_WORKERS = 1
+    torch.set_num_threads(intra_op_threads(threads))
+    replies = os.fdopen(reply_fd, "w")
+
+    def send(tag: str, message: Dict[str, Any], result_format: str = "json") -> None:
+        replies.write(tag + encode_result(message, result_format).decode("utf-8") + "\n")
+        replies.flush()
+
+    with os.fdopen(request_fd, "r") as requests:
+        for line in requests:
+            request = json.loads(line)
+            request_id = request.get("id")
+            on_segment = None
+            if request.get("stream"):
+                on_segment = lambda segment: send("S", {"id": request_id, "type": "segment", **segment})
+            job_start = time.time()
+            try:
+                result = handle_job(request, on_segment, model)
+            except Exception as e:
+                result = {"text": "", "error": f"Unexpected error: {str(e)}"}
+            send("R", {
+                "id": request_id,
+                "type": "result",
+                "result": result,
+                "elapsed": round(time.time() - job_start, 3),
+                "queue_wait": request.get("queue_wait"),
+                "worker": os.getpid()
+            }, request.get("format", "json"))
+
+def _spawner_main(control: socket.socket, threads: int, model: Optional[str]) -> None:
+    """
+    Fork, kill and reap the workers of a WorkerPool on its behalf. Requests
+    on control are "spawn" and "kill <pid>"; replies are "spawned <pid>",
+    carrying the worker's request and reply pipe ends, and "exited <pid>
+    <wait status>".
+    """
+    workers = set()
+    while True:
+        readable, _, _ = select.select([control], [], [], 0.1)
+        while workers:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if pid == 0:
+                break
+            workers.discard(pid)
+            control.send(f"exited {pid} {status}".encode())
+        if not readable:
+            continue
+        message = control.recv(64)
+        if not message:
+            break  # the pool is closed
+        op, _, arg = message.decode().partition(" ")
+        if op == "spawn":
+            request_read, request_write = os.pipe()
+            reply_read, reply_write = os.pipe()
+            pid = os.fork()
+            if pid == 0:
+                control.close()
+                os.close(request_write)
+                os.close(reply_read)
+                status = 0
+                try:
+                    _pool_worker_main(request_read, reply_write, threads, model)
+                except BaseException:
+                    traceback.print_exc()
+                    status = 1
+                finally:
+                    os._exit(status)
+            os.close(request_read)
+            os.close(reply_write)
+            socket.send_fds(control, [f"spawned {pid}".encode()], [request_write, reply_read])
+            os.close(request_write)
+            os.close(reply_read)
+            workers.add(pid)
+        elif op == "kill" and int(arg) in workers:
+            # Only a worker that has not been reaped, so a reused pid is safe
+            os.kill(int(arg), signal.SIGKILL)
+    for pid in workers:
+        os.waitpid(pid, 0)
+
+def pool_worker_count(requested: int = 0) -> int:
+    """
+    Number of serve-mode workers: requested, or when that is 0, as many as
+    both the cores (MIN_WORKER_THREADS each) and the free memory
+    (WORKER_JOB_MEMORY_MB each) allow. Call it once the models are loaded,
+    so the shared weights are no longer counted as free memory.
+    """
+    if requested > 0:
+        return requested
+    by_cores = max(1, (TRANSCRIBE_THREADS or available_cpus()) // MIN_WORKER_THREADS)
+    memory = available_memory_mb()
+    by_memory = max(1, int(memory // WORKER_JOB_MEMORY_MB)) if memory is not None else by_cores
+    return min(by_cores, by_memory)
+
+class WorkerPool:
+    """
+    Serve-mode workers forked from a parent that has already loaded the
+    models, so they share the weights copy-on-write instead of each
+    loading its own copy.
+
+    submit() queues a transcription request, or rejects it when every
+    worker is busy and max_queue requests are already waiting. A
+    dispatcher thread hands each request to the next idle worker over a
+    pipe, and one thread per worker forwards its replies through
+    write_line. cancel() drops a queued request or kills the worker
+    running it. A worker that dies during a job (or is cancelled) fails
+    that job and is replaced; one that dies idle is not, and when none are
+    left the process exits so that its owner can restart it.
+
+    Workers are forked by a spawner process (see _spawner_main), itself
+    forked before the pool starts any threads, so that no worker is ever
+    forked from a parent with threads running.
+    """
+
+    def __init__(self, workers: int, max_queue: int, write_line: Callable[[str], None], model: Optional[str]):
+        self.write_line = write_line
+        self.model = model
+        self.max_queue = max_queue
+        self.jobs: collections.deque = collections.deque()
+        self.idle: collections.deque = collections.deque()
+        self.lock = threading.Lock()
+        self.ready = threading.Condition(self.lock)
+        self.closing = False
+        self.workers: Dict[int, Dict[str, Any]] = {}
+        self.forwarders: Dict[int, threading.Thread] = {}
+        self.counts = {
+            "submitted": 0, "completed": 0, "rejected": 0, "failed": 0, "cancelled": 0,
+            "respawned": 0, "max_queue_depth": 0
+        }
+        self.waits: collections.deque = collections.deque(maxlen=1000)
+
+        self.threads = max(1, (TRANSCRIBE_THREADS or available_cpus()) // workers)
+        self.control, spawner_control = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        self.spawner = os.fork()
+        if self.spawner == 0:
+            self.control.close()
+            status = 0
+            try:
+                _spawner_main(spawner_control, self.threads, self.model)
+            except BaseException:
+                traceback.print_exc()
+                status = 1
+            finally:
+                os._exit(status)
+        spawner_control.close()
+        self.spawned: queue.Queue = queue.Queue()
+        self.exited = threading.Condition()
+        self.exit_statuses: Dict[int, int] = {}
+        self.supervisor = threading.Thread(target=self._supervise, daemon=True)
+        self.supervisor.start()
+        for _ in range(workers):
+            self._spawn()
+        for pid in self.workers:
+            self._start_forwarder(pid)
+        self.dispatcher = threading.Thread(target=self._dispatch, daemon=True)
+        self.dispatcher.start()
+
+    def _spawn(self) -> int:
+        """Have the spawner fork a worker, and mark it idle"""
+        self.control.send(b"spawn")
+        pid, request_fd, reply_fd = self.spawned.get()
+        self.workers[pid] = {
+            "requests": os.fdopen(request_fd, "w"),
+            "replies": os.fdopen(reply_fd, "r"),
+            "job": None,
+            "cancelled": False,
+            "exiting": False
+        }
+        self.idle.append(pid)
+        return pid
+
+    def _supervise(self) -> None:
+        """Hand the spawner's new workers to _spawn and their exit statuses to _forward"""
+        while True:
+            message, fds, _, _ = socket.recv_fds(self.control, 64, 2)
+            if not message:
+                break
+            op, pid, *rest = message.decode().split()
+            if op == "spawned":
+                self.spawned.put((int(pid), fds[0], fds[1]))
+            else:
+                with self.exited:
+                    self.exit_statuses[int(pid)] = int(rest[0])
+                    self.exited.notify_all()
+        if not self.closing:
+            print("Pool worker spawner exited", file=sys.stderr)
+            os._exit(1)
+
+    def _start_forwarder(self, pid: int) -> None:
+        thread = threading.Thread(target=self._forward, args=(pid,), daemon=True)
+        self.forwarders[pid] = thread
+        thread.start()
+
+    def submit(self, request: Dict[str, Any]) -> bool:
+        """Queue a transcription request; False when the queue is full"""
+        with self.lock:
+            # Running and waiting jobs are counted together, so a burst that
+            # the dispatcher has not handed out yet still fits in idle workers
+            busy = sum(1 for worker in self.workers.values() if worker["job"] is not None)
+            if busy + len(self.jobs) >= len(self.workers) + self.max_queue:
+                self.counts["rejected"] += 1
+                return False
+            self.jobs.append((request, time.time()))
+            self.counts["submitted"] += 1
+            self.counts["max_queue_depth"] = max(self.counts["max_queue_depth"], len(self.jobs))
+            self.ready.notify()
+        return True
+
+    def cancel(self, job_id: Any) -> bool:
+        """
+        Drop a queued request, or kill the worker running it (a replacement
+        is forked). False when the job is not in the pool.
+        """
+        with self.lock:
+            for item in self.jobs:
+                if item[0].get("id") == job_id:
+                    self.jobs.remove(item)
+                    self.counts["cancelled"] += 1
+                    return True
+            for pid, worker in self.workers.items():
+                if worker["job"] == job_id and not worker["cancelled"] and not worker["exiting"]:
+                    worker["cancelled"] = True
+                    self.counts["cancelled"] += 1
+                    self.control.send(f"kill {pid}".encode())
+                    return True
+        return False
+
+    def _dispatch(self) -> None:
+        while True:
+            with self.ready:
+                while not (self.jobs and self.idle) and not (self.closing and not self.jobs):
+                    self.ready.wait()
+                if not self.jobs:
+                    return
+                request, queued_at = self.jobs.popleft()
+                pid = self.idle.popleft()
+                wait = round(time.time() - queued_at, 3)
+                worker = self.workers[pid]
+                worker["job"] = request.get("id")
+                self.waits.append(wait)
+            self.write_line(json.dumps({"id": request.get("id"), "type": "started", "worker": pid, "queue_wait": wait}))
+            try:
+                worker["requests"].write(json.dumps({**request, "queue_wait": wait}) + "\n")
+                worker["requests"].flush()
+            except (OSError, ValueError):
+                pass  # the worker died; _forward reports its job as failed
+
+    def _forward(self, pid: int) -> None:
+        worker = self.workers[pid]
+        for line in worker["replies"]:
+            tag, payload = line[:1], line[1:].rstrip("\n")
+            if tag == "R":
+                with self.lock:
+                    if worker["cancelled"]:
+                        continue  # finished just as it was cancelled; the kill is on its way
+                    worker["job"] = None
+                    self.counts["completed"] += 1
+                    self.idle.append(pid)
+                    self.ready.notify()
+            self.write_line(payload)
+
+        # From here on the pid may be reaped, so cancel() must not signal it
+        with self.lock:
+            worker["exiting"] = True
+        with contextlib.suppress(OSError):
+            worker["requests"].close()
+        worker["replies"].close()
+        with self.exited:
+            while pid not in self.exit_statuses:
+                self.exited.wait()
+            exit_code = os.waitstatus_to_exitcode(self.exit_statuses.pop(pid))
+        reason = f"was killed by signal {-exit_code}" if exit_code < 0 else f"exited with status {exit_code}"
+        with self.lock:
+            del self.workers[pid]
+            del self.forwarders[pid]
+            if pid in self.idle:
+                self.idle.remove(pid)
+            job = worker["job"]
+            if job is not None and not worker["cancelled"]:
+                self.counts["failed"] += 1
+            replacement = None
+            if job is not None and not self.closing:
+                replacement = self._spawn()
+                self.counts["respawned"] += 1
+                self._start_forwarder(replacement)
+                self.ready.notify()
+            alive = len(self.workers)
+            if not self.closing:
+                print(f"Pool worker {pid} {reason}; {alive} left", file=sys.stderr)
+        if job is not None:
+            error = "Job cancelled" if worker["cancelled"] else f"Worker {pid} {reason}"
+            self.write_line(json.dumps({"id": job, "type": "error", "error": error}))
+        if alive == 0 and not self.closing:
+            os._exit(1)
+
+    def stats(self) -> Dict[str, Any]:
+        """Worker, queue depth and queue wait statistics"""
+        with self.lock:
+            waits = sorted(self.waits)
+            return {
+                "workers": len(self.workers),
+                "busy": sum(1 for worker in self.workers.values() if worker["job"] is not None),
+                "queue_depth": len(self.jobs),
+                "queue_size": self.max_queue,
+                **self.counts,
+                "wait_p50": waits[len(waits) // 2] if waits else None,
+                "wait_p95": waits[min(len(waits) - 1, int(len(waits) * 0.95))] if waits else None,
+                "wait_max": waits[-1] if waits else None
+            }
+
+    def close(self) -> None:
+        """Finish the queued and running jobs, then stop the workers"""
+        with self.lock:
+            self.closing = True
+            self.ready.notify()
+        self.dispatcher.join()
+        with self.lock:
+            workers = list(self.workers.values())
+            forwarders = list(self.forwarders.values())
+        for worker in workers:
+            worker["requests"].close()
+        for thread in forwarders:
+            thread.join()
+        # The spawner exits once it has no workers and sees the socket close
+        self.control.shutdown(socket.SHUT_WR)
+        os.waitpid(self.spawner, 0)
+        self.supervisor.join()
+        self.control.close()
+
+def serve_pool(model: Optional[str] = None, workers: int = 0, queue_size: int = 0) -> None:
+    """
+    serve() with jobs spread over a WorkerPool. The protocol is the same,
+    except that results can arrive out of order, a "started" message with
+    the job's queue wait is sent when a worker picks it up, a full queue
+    is answered with an error straight away, health replies include the
+    pool's statistics, and {"id": ..., "op": "cancel"} drops that job from
+    the queue or kills (and replaces) the worker running it. Models are always preloaded, since that is
+    what the workers share.
+    """
+    protocol_out = sys.stdout
+    sys.stdout = sys.stderr
+    write_lock = threading.Lock()
+
+    def write_line(line: str) -> None:
+        with write_lock:
+            protocol_out.write(line + "\n")
+            protocol_out.flush()
+
+    def reply(message: Dict[str, Any]) -> None:
+        write_line(json.dumps(message))
+
+    def handle_sigterm(signum, frame):
+        raise SystemExit(0)  # the finally below drains the pool first
+
+    started_at = time.time()
+    # A parent that never starts torch's OpenMP thread team can fork
+    # safely; each worker sets its own thread budget
+    torch.set_num_threads(1)
+    preload_models(model)
+    workers = pool_worker_count(workers)
+    # Keep the collector from touching (and so copying) the shared objects
+    gc.collect()
+    gc.freeze()
+    pool = WorkerPool(workers, queue_size or 2 * workers, write_line, model)
+    signal.signal(signal.SIGTERM, handle_sigterm)
+    reply({
+        "type": "ready",
+        "pid": os.getpid(),
+        "model": model or resolve_model(),
+        "diarization": _diarization_pipeline is not None,
+        "load_time": round(time.time() - started_at, 3),
+        "workers": workers,
+        "queue_size": pool.max_queue
+    })
+
+    try:
+        for line in sys.stdin:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                request = json.loads(line)
+            except ValueError as e:
+                reply({"type": "error", "error": f"Invalid request: {e}"})
+                continue
+
+            request_id = request.get("id")
+            op = request.get("op", "transcribe")
+
+            if op == "health":
+                cache = get_result_cache()
+                pool_stats = pool.stats()
+                reply({
+                    "id": request_id,
+                    "type": "health",
+                    "status": "ok",
+                    "ready": True,
+                    "pid": os.getpid(),
+                    "uptime": round(time.time() - started_at, 3),
+                    "jobs_completed": pool_stats["completed"],
+                    "models_loaded": sorted(_whisper_models),
+                    "diarization": _diarization_pipeline is not None,
+                    "cache": cache.stats() if cache is not None else None,
+                    "pool": pool_stats
+                })
+            elif op == "cancel":
+                reply({"id": request_id, "type": "cancel", "cancelled": pool.cancel(request_id)})
+            elif op == "shutdown":
+                pool.close()
+                reply({"id": request_id, "type": "shutdown"})
+                return
+            elif op == "transcribe":
+                result_format = request.get("format", "json")
+                if result_format not in ("json", "columnar"):
+                    reply({"id": request_id, "type": "error", "error": f"Unsupported result format: {result_format}"})
+                elif not pool.submit(request):
+                    reply({
+                        "id": request_id,
+                        "type": "error",
+                        "error": f"Transcription queue is full ({pool.max_queue} jobs waiting)",
+                        "busy": True
+                    })
+            else:
+                reply({"id": request_id, "type": "error", "error": f"Unknown op: {op}"})
+    finally:
+        if not pool.closing:
+            pool.close()
+
+def serve(preload: bool = True, model: Optional[str] = None) -> None:
+    """
+    Long-lived worker speaking JSON lines over stdin/stdout.
+
+    Requests:  {"id": ..., "op": "transcribe", "path": ...} (or "url";
+               optional "chunked", "vad", "stream", "model", "quantize" and
+               "deadline" as on the command line, and "format": "columnar"
+               for a columnar result)
+               {"id": ..., "op": "health"}
+               {"id": ..., "op": "shutdown"}
+    Replies carry the same id and a "type" of ready, segment, result,
+    health, shutdown or error. Logs keep going to stderr. model is the
+    resolved model key used (and preloaded) for jobs that don't pick one.
+    """
+    # Keep stdout for protocol messages only; anything printed by the
+    # libraries ends up in the stderr log instead
+    protocol_out = sys.stdout
+    sys.stdout = sys.stderr
+
+    def reply(message: Dict[str, Any], result_format: str = "json") -> None:
+        protocol_out.write(encode_result(message, result_format).decode("utf-8") + "\n")
+        protocol_out.flush()
+
+    state = {"busy": False, "stopping": False}
+
+    def handle_sigterm(signum, frame):
+        # Let a running job finish; exit straight away when idle
+        state["stopping"] = True
+        if not state["busy"]:
+            raise SystemExit(0)
+
+    signal.signal(signal.SIGTERM, handle_sigterm)
+
+    started_at = time.time()
+    jobs_completed = 0
+    if preload:
+        preload_models(model)
+    reply({
+        "type": "ready",
+        "pid": os.getpid(),
+        "model": model or resolve_model(),
+        "diarization": _diarization_pipeline is not None,
+        "load_time": round(time.time() - started_at, 3)
+    })
+
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            reply({"type": "error", "error": f"Invalid request: {e}"})
+            continue
+
+        request_id = request.get("id")
+        op = request.get("op", "transcribe")
+
+        if op == "health":
+            cache = get_result_cache()
+            reply({
+                "id": request_id,
+                "type": "health",
+                "status": "ok",
+                "ready": True,
+                "pid": os.getpid(),
+                "uptime": round(time.time() - started_at, 3),
+                "jobs_completed": jobs_completed,
+                "models_loaded": sorted(_whisper_models),
+                "diarization": _diarization_pipeline is not None,
+                "cache": cache.stats() if cache is not None else None
+            })
+        elif op == "shutdown":
+            reply({"id": request_id, "type": "shutdown"})
+            break
+        elif op == "transcribe":
+            result_format = request.get("format", "json")
+            if result_format not in ("json", "columnar"):
+                # Replies are JSON lines, so binary formats can't be used here
+                reply({"id": request_id, "type": "error", "error": f"Unsupported result format: {result_format}"})
+                continue
+            state["busy"] = True
+            job_start = time.time()
+            on_segment = None
+            if request.get("stream"):
+                on_segment = lambda segment: reply({"id": request_id, "type": "segment", **segment})
+            try:
+                result = handle_job(request, on_segment, model)
+            except Exception as e:
+                result = {"text": "", "error": f"Unexpected error: {str(e)}"}
+            finally:
+                state["busy"] = False
+            jobs_completed += 1
+            reply({
+                "id": request_id,
+                "type": "result",
+                "result": result,
+                "elapsed": round(time.time() - job_start, 3)
+            }, result_format)
+        else:
+            reply({"id": request_id, "type": "error", "error": f"Unknown op: {op}"})
+
+        if state["stopping"]:
+            break
+
+    print("Transcription worker shutting down", file=sys.stderr)
+
+AUDIO_EXTENSIONS = {".aac", ".aiff", ".aif", ".flac", ".m4a", ".mp3", ".mp4", ".ogg", ".opus", ".wav", ".webm", ".wma"}
+
+def read_batch_items(source: str) -> List[Dict[str, Any]]:
+    """
+    Expand a batch source into jobs: a directory (every audio file in it,
+    recursively), a glob pattern, or a JSONL manifest whose lines carry a
+    "path" or "url" and an optional "id". A manifest line that can't be
+    used becomes a job with an "invalid" message, reported as that item's
+    error, so one bad line doesn't stop the batch.
+    """
+    if os.path.isdir(source):
+        paths = sorted(
+            os.path.join(root, name)
+            for root, _, names in os.walk(source)
+            for name in names
+            if os.path.splitext(name)[1].lower() in AUDIO_EXTENSIONS
+        )
+    elif source.endswith(".jsonl") and os.path.isfile(source):
+        items = []
+        with open(source, "r", encoding="utf-8") as f:
+            for line_number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except ValueError as e:
+                    items.append({"id": f"{source}:{line_number}", "invalid": f"{source}:{line_number}: invalid JSON: {e}"})
+                    continue
+                if not isinstance(entry, dict) or (not entry.get("path") and not entry.get("url")):
+                    items.append({"id": f"{source}:{line_number}", "invalid": f"{source}:{line_number}: entry needs a 'path' or 'url'"})
+                    continue
+                entry.setdefault("id", entry.get("path") or entry.get("url"))
+                items.append(entry)
+        return items
+    else:
+        paths = sorted(glob.glob(source, recursive=True))
+    return [{"id": path, "path": path} for path in paths]
+
+def completed_batch_ids(output_path: str) -> set:
+    """Ids already transcribed successfully in a previous (possibly interrupted) run"""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # a line cut short when the previous run was killed
+            if record.get("status") == "ok":
+                done.add(record.get("id"))
+    return done
+
+def _prefetch_batch(
+    items: List[Dict[str, Any]],
+    ready: "queue.Queue",
+    model: Optional[str] = None,
+    vad: Optional[bool] = None
+) -> None:
+    """Decode upcoming batch items on a background thread while the current one is inferred"""
+    for item in items:
+        prepared = {"item": item, "audio": None, "cache_key": None, "cached": None, "error": None}
+        started = time.time()
+        try:
+            if item.get("invalid"):
+                prepared["error"] = item["invalid"]
+            elif item.get("url"):
+                audio, content_hash = stream_url_audio(item["url"])
+                prepared["cached"], prepared["cache_key"] = lookup_cached_result(content_hash, model, vad)
+                prepared["audio"] = audio
+            else:
+                if CACHE_ENABLED:
+                    prepared["cached"], prepared["cache_key"] = lookup_cached_result(hash_file(item["path"]), model, vad)
+                if prepared["cached"] is None:
+                    prepared["audio"], _ = load_audio(item["path"])
+        except Exception as e:
+            prepared["error"] = str(e)
+        prepared["decode_time"] = time.time() - started
+        ready.put(prepared)
+    ready.put(None)
+
+def run_batch(
+    source: str,
+    output_path: str,
+    prefetch: int = 2,
+    chunked: Optional[bool] = None,
+    model: Optional[str] = None,
+    vad: Optional[bool] = None
+) -> Dict[str, Any]:
+    """
+    Transcribe every item of a batch source with models loaded once.
+
+    Results are appended to output_path as JSON lines with a per-item
+    status; items already recorded as "ok" there are skipped, so an
+    interrupted run can simply be started again.
+    """
+    items = read_batch_items(source)
+    done = completed_batch_ids(output_path)
+    pending = [item for item in items if item["id"] not in done]
+    print(f"Batch: {len(items)} items, {len(items) - len(pending)} already done, {len(pending)} to process", file=sys.stderr)
+
+    summary = {"items": len(items), "skipped": len(items) - len(pending), "ok": 0, "errors": 0, "audio_seconds": 0.0}
+    started = time.time()
+    if pending:
+        preload_models(model)
+
+    ready: "queue.Queue" = queue.Queue(maxsize=max(1, prefetch))
+    threading.Thread(target=_prefetch_batch, args=(pending, ready, model, vad), name="batch-prefetch", daemon=True).start()
+
+    with open(output_path, "a", encoding="utf-8") as output:
+        while True:
+            prepared = ready.get()
+            if prepared is None:
+                break
+            item = prepared["item"]
+            item_started = time.time()
+            record = {key: item[key] for key in ("id", "path", "url") if item.get(key)}
+
+            result = prepared["cached"]
+            if result is None and prepared["error"] is None:
+                try:
+                    result = process_decoded_audio(prepared["audio"], prepared["cache_key"], chunked, model=model, vad=vad)
+                except Exception as e:
+                    prepared["error"] = str(e)
+                    print(f"Error processing {item['id']}: {e}", file=sys.stderr)
+
+            if prepared["error"] is None and result is not None and "error" not in result:
+                record["status"] = "ok"
+                record["result"] = result
+                summary["ok"] += 1
+            else:
+                record["status"] = "error"
+                record["error"] = prepared["error"] or (result or {}).get("error", "Unknown error")
+                summary["errors"] += 1
+
+            if prepared["audio"] is not None:
+                record["audio_seconds"] = round(len(prepared["audio"]) / SAMPLE_RATE, 3)
+                summary["audio_seconds"] += len(prepared["audio"]) / SAMPLE_RATE
+            record["cached"] = prepared["cached"] is not None
+            record["decode_time"] = round(prepared["decode_time"], 3)
+            record["elapsed"] = round(time.time() - item_started, 3)
+
+            output.write(json.dumps(record) + "\n")
+            output.flush()
+
+    wall_seconds = time.time() - started
+    summary["wall_seconds"] = round(wall_seconds, 3)
+    summary["audio_seconds"] = round(summary["audio_seconds"], 3)
+    # Audio-hours per wall-hour is the same ratio as audio seconds per wall second
+    summary["audio_hours_per_wall_hour"] = round(summary["audio_seconds"] / wall_seconds, 3) if wall_seconds else 0.0
+    print(
+        f"Batch complete: {summary['ok']} ok, {summary['errors']} errors, {summary['skipped']} skipped; "
+        f"{summary['audio_seconds'] / 3600:.2f} audio-hours in {wall_seconds / 3600:.2f} wall-hours "
+        f"({summary['audio_hours_per_wall_hour']:.2f} audio-hours per wall-hour)",
+        file=sys.stderr
+    )
+    return summary
+
+# Imported by the script or its stages, in the order a transcription job needs them
+PROFILED_MODULES = ["transcribe_audio", "numpy", "torch", "whisper", "pyannote.audio"]
+
+def profile_imports(top: int = 15) -> Dict[str, Any]:
+    """
+    Measure cold-start import cost with `python -X importtime`.
+
+    Each module in PROFILED_MODULES is imported in turn by a fresh
+    interpreter. Reports the cumulative time of each (excluding anything
+    an earlier one already imported) and the `top` slowest modules by
+    self time.
+    """
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    modules = [module for module in PROFILED_MODULES if module == "transcribe_audio" or _package_available(module)]
+    code = "import sys; sys.path.insert(0, sys.argv[1])\n" + "\n".join(f"import {module}" for module in modules)
+    started = time.time()
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code, script_dir],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True
+    )
+    wall_seconds = time.time() - started
+
+    # Lines look like "import time:  self [us] | cumulative | imported package",
+    # with the package name indented by nesting depth
+    entries = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        name = fields[2].rstrip()
+        entries.append({
+            "module": name.strip(),
+            "depth": (len(name) - len(name.lstrip())) // 2,
+            "self_seconds": int(fields[0]) / 1e6,
+            "cumulative_seconds": int(fields[1]) / 1e6
+        })
+
+    top_level = {entry["module"]: entry["cumulative_seconds"] for entry in entries if entry["depth"] == 0}
+    # Dotted names are imported package by package, so their cost is spread
+    # over the parents' top-level entries as well
+    stages = {}
+    for module in modules:
+        parts = module.split(".")
+        stages[module] = round(sum(top_level.get(".".join(parts[:i + 1]), 0.0) for i in range(len(parts))), 4)
+
+    slowest = sorted(entries, key=lambda entry: entry["self_seconds"], reverse=True)[:top]
+    return {
+        "python": sys.version.split()[0],
+        "wall_seconds": round(wall_seconds, 4),
+        "import_seconds": round(sum(top_level.values()), 4),
+        "modules": stages,
+        "slowest": [
+            {"module": entry["module"], "self_seconds": round(entry["self_seconds"], 4),
+             "cumulative_seconds": round(entry["cumulative_seconds"], 4)}
+            for entry in slowest
+        ],
+        "error": completed.stderr.strip().splitlines()[-1] if completed.returncode != 0 else None
+    }
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    """Parse command-line arguments"""
+    parser = argparse.ArgumentParser(description="Transcribe audio with speaker diarization")
+    parser.add_argument("input", nargs="?", help="Audio file to transcribe")
+    parser.add_argument("--url", help="Download and transcribe audio from a URL")
+    parser.add_argument("--serve", action="store_true", help="Run as a long-lived JSON-lines worker")
+    parser.add_argument("--no-preload", action="store_true", help="With --serve, load models on the first job")
+    parser.add_argument("--workers", type=int, default=SERVE_WORKERS,
+                        help="With --serve, worker processes sharing the loaded models "
+                             "(0 = size from cores and memory; default: TRANSCRIBE_SERVE_WORKERS or 1)")
+    parser.add_argument("--queue-size", type=int, default=SERVE_QUEUE_SIZE,
+                        help="With --serve and several workers, jobs that may wait before new ones are rejected "
+                             "(default: twice the worker count)")
+    parser.add_argument("--cache-stats", action="store_true", help="Print result cache statistics and exit")
+    parser.add_argument("--profile-imports", action="store_true",
+                        help="Report the import cost of the script and its heavy dependencies, then exit")
+    parser.add_argument("--batch", metavar="SOURCE",
+                        help="Transcribe a directory, glob pattern or JSONL manifest with one model load")
+    parser.add_argument("--output", help="With --batch, JSONL file to append results to (default: batch_results.jsonl)")
+    parser.add_argument("--prefetch", type=int, default=2, help="With --batch, number of items to decode ahead")
+    parser.add_argument("--model",
+                        help=f"Whisper model or tier: tiny, base, small, medium, large, "
+                             f"default ({WHISPER_MODEL}) or best ({WHISPER_BEST_MODEL})")
+    parser.add_argument("--quantize", choices=QUANTIZE_MODES,
+                        help=f"Run Whisper with int8 weights on CPU (default: {WHISPER_QUANTIZE})")
+    parser.add_argument("--stream", action="store_true",
+                        help="Write NDJSON: one line per finished segment, then the result")
+    parser.add_argument("--result-format", choices=RESULT_FORMATS, default="json",
+                        help="Layout of the result: one object per segment (json), segment columns as "
+                             "compact JSON (columnar) or as MessagePack (msgpack)")
+    parser.add_argument("--verbose", action="store_true",
+                        help="Print every merged segment to stderr (default: TRANSCRIBE_DEBUG)")
+    parser.add_argument("--metrics-file", metavar="PATH",
+                        help="Also write the job's stage metrics to this file")
+    parser.add_argument("--metrics-format", choices=["json", "prometheus"], default="json",
+                        help="Format of --metrics-file (default: json)")
+    chunking = parser.add_mutually_exclusive_group()
+    chunking.add_argument("--chunked", dest="chunked", action="store_true", default=None,
+                          help="Always transcribe in parallel chunks")
+    chunking.add_argument("--no-chunked", dest="chunked", action="store_false",
+                          help="Never split the recording into chunks")
+    parser.add_argument("--deadline", type=float, metavar="SECONDS",
+                        help="Time budget, counted from when the script started: pick the model tier "
+                             "and diarization setting that fit in it. With --stream, each streamed "
+                             "chunk starts it over, like an inactivity timeout")
+    vad = parser.add_mutually_exclusive_group()
+    vad.add_argument("--vad", dest="vad", action="store_true", default=None,
+                     help="Cut long silences out before inference (default: TRANSCRIBE_VAD)")
+    vad.add_argument("--no-vad", dest="vad", action="store_false",
+                     help="Send the whole recording to the models")
+    return parser.parse_args(argv)
+
 def main():
     """Main function to handle command-line arguments and process audio"""
-    if len(sys.argv) < 2:
+    args = parse_args(sys.argv[1:])
+    
+    if args.profile_imports:
+        print(json.dumps(profile_imports(), indent=2))
+        return
+    
+    check_required_packages()
+    
+    if args.verbose:
+        global DEBUG_OUTPUT
+        DEBUG_OUTPUT = True
+    if args.result_format == "msgpack" and (args.stream or not _package_available("msgpack")):
+        reason = "cannot be combined with --stream" if args.stream else "requires the msgpack package"
+        print(json.dumps({"error": f"--result-format msgpack {reason}"}))
+        sys.exit(1)
+    
+    try:
+        model = resolve_model(args.model, args.quantize)
+    except ValueError as e:
+        print(json.dumps({"error": str(e)}))
+        sys.exit(1)
+    
+    if args.cache_stats:
+        cache = get_result_cache()
+        print(json.dumps(cache.stats() if cache is not None else {"enabled": False}))
+        return
+    
+    # Long-lived worker mode: keep models loaded between jobs
+    if args.serve:
+        if args.workers == 1:
+            serve(preload=not args.no_preload, model=model)
+        else:
+            serve_pool(model=model, workers=args.workers, queue_size=args.queue_size)
+        return
+    
+    if args.batch:
+        summary = run_batch(args.batch, args.output or "batch_results.jsonl", args.prefetch, args.chunked, model, args.vad)
+        print(json.dumps(summary))
+        return
+    
+    if not args.url and not args.input:
         print(json.dumps({"error": "No input file or URL specified"}))
         sys.exit(1)
     
-    # Check for --url flag
-    if sys.argv[1] == "--url" and len(sys.argv) >= 3:
-        url = sys.argv[2]
-        result = process_url(url)
-    else:
-        file_path = sys.argv[1]
-        result = process_audio_file(file_path)
+    on_segment = None
+    if args.stream:
+        on_segment = lambda segment: print(json.dumps({"type": "segment", **segment}), flush=True)
+    
+    deadline = args.deadline
+    if deadline:
+        # Startup and argument handling already used part of the budget
+        deadline -= time.time() - PROCESS_STARTED
+    
+    with job_metrics() as metrics:
+        if args.url:
+            result = process_url(
+                args.url, chunked=args.chunked, on_segment=on_segment, model=model, vad=args.vad, deadline=deadline
+            )
+        else:
+            result = process_audio_file(
+                args.input, chunked=args.chunked, on_segment=on_segment, model=model, vad=args.vad, deadline=deadline
+            )
+        
+        # Serialization happens after the result's own metrics block is
+        # filled in, so its span only reaches the metrics channel and file
+        with stage_span("serialize"):
+            output = encode_result({"type": "result", "result": result} if args.stream else result, args.result_format)
+    
+    # Print the result (MessagePack is written without a trailing newline)
+    sys.stdout.flush()
+    sys.stdout.buffer.write(output if args.result_format == "msgpack" else output + b"\n")
+    sys.stdout.flush()
     
-    # Print the result as JSON
-    print(json.dumps(result))
+    job = metrics.to_dict()
+    emit_metrics_event({"type": "job", **job})
+    if args.metrics_file:
+        with open(args.metrics_file, "w", encoding="utf-8") as f:
+            if args.metrics_format == "prometheus":
+                f.write(metrics_to_prometheus(job))
+            else:
+                json.dump(job, f, indent=2)
 
 if __name__ == "__main__":
     try: